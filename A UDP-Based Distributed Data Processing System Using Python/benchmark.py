@@ -0,0 +1,361 @@
+import argparse
+import heapq
+import itertools
+import json
+import multiprocessing
+import random
+import selectors
+import socket
+import sys
+import threading
+import time
+try:
+    import resource
+except ImportError:  # Windows: no peak RSS
+    resource = None
+import client
+import events
+import integrity
+import protocol
+import server
+import transport
+
+# Loopback benchmarks for the UDP hot paths.
+#
+#   python benchmark.py io    messages/sec for one recvfrom/sendto per message
+#                             vs. DatagramReader draining and BATCH coalescing
+#   python benchmark.py job   end-to-end small-chunk jobs with batch I/O off and on
+#   python benchmark.py integrity
+#                             seal/open cost per message for each integrity mode, and
+#                             end-to-end jobs with each mode and with sealing off
+#   python benchmark.py sweep headless coordinator + worker processes over a grid of
+#                             dataset size, chunk size, worker count, wire format,
+#                             packet loss and delay (through LossyProxy)
+#
+# Results are printed as JSON lines so runs can be diffed; sweep also writes
+# them to --output.
+
+
+def _blast(port: int, count: int, size: int, ready):
+    """Sender process: fire `count` datagrams of `size` bytes at the receiver"""
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    payload = bytes(size)
+    ready.wait()
+    for _ in range(count):
+        sock.sendto(payload, ('127.0.0.1', port))
+    sock.close()
+
+
+def receive_rate(batched: bool, count: int, size: int) -> dict:
+    """Datagrams/sec received from a separate sender process"""
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 1 << 22)
+    sock.bind(('127.0.0.1', 0))
+    sock.settimeout(0.5)
+    reader = transport.DatagramReader(sock)
+    ready = multiprocessing.Event()
+    sender = multiprocessing.Process(target=_blast, args=(sock.getsockname()[1], count, size, ready))
+    sender.start()
+    received = wakeups = 0
+    start = last = None
+    ready.set()
+    while received < count:
+        try:
+            if batched:
+                datagrams = reader.read()
+            else:
+                datagrams = [sock.recvfrom(65536)]
+        except socket.timeout:
+            break  # The sender finished and the rest were dropped
+        last = time.perf_counter()
+        start = start or last
+        received += len(datagrams)
+        wakeups += 1
+    sender.join()
+    sock.close()
+    elapsed = (last - start) if received > 1 else 0.0
+    return {'bench': 'receive', 'batched': batched, 'size': size, 'sent': count, 'received': received,
+            'wakeups': wakeups, 'messages_per_sec': round(received / elapsed) if elapsed else None}
+
+
+def send_rate(batched: bool, count: int) -> dict:
+    """RESULT messages/sec sent one per sendto vs. coalesced into BATCH datagrams"""
+    sink = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sink.bind(('127.0.0.1', 0))
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    addr = sink.getsockname()
+    result = {'sum': 500500, 'count': 1000, 'min': 1, 'max': 1000}
+    messages = [protocol.encode_result(chunk_id, result, protocol.FORMAT_BINARY, credits=8, recv_time=0.0001,
+                                       compute_time=0.0002) for chunk_id in range(count)]
+    syscalls = 0
+    start = time.perf_counter()
+    if batched:
+        for offset in range(0, count, 8):  # A read's worth of results at a time, as the worker flushes them
+            for datagram in protocol.pack_batches(messages[offset:offset + 8]):
+                sock.sendto(datagram, addr)
+                syscalls += 1
+    else:
+        for message in messages:
+            sock.sendto(message, addr)
+            syscalls += 1
+    elapsed = time.perf_counter() - start
+    sock.close()
+    sink.close()
+    return {'bench': 'send', 'batched': batched, 'messages': count, 'syscalls': syscalls,
+            'messages_per_sec': round(count / elapsed)}
+
+
+def seal_rate(mode: str, size: int, count: int) -> dict:
+    """Microseconds to seal and to open one message of `size` bytes"""
+    session = integrity.Session(mode, integrity.new_key())
+    message = bytes(size)
+    start = time.perf_counter()
+    for _ in range(count):
+        sealed = session.seal(message)
+    sealing = time.perf_counter() - start
+    start = time.perf_counter()
+    for _ in range(count):
+        session.open(sealed)
+    opening = time.perf_counter() - start
+    return {'bench': 'seal', 'mode': mode, 'size': size, 'overhead_bytes': len(sealed) - size,
+            'seal_us': round(sealing / count * 1e6, 2), 'open_us': round(opening / count * 1e6, 2),
+            'open_mb_per_sec': round(size * count / opening / 1e6)}
+
+
+def run_job(batch_io: bool, size: int, workers: int, chunk: int, engine: str, seal: str = integrity.SUPPORTED_MODES[0],
+            timeout: float = 120.0) -> dict:
+    """One in-process job with small chunks, so per-message costs dominate; a job still running after timeout seconds fails"""
+    sink = events.LogSink()
+    coordinator = server.ENGINES[engine](sink, '127.0.0.1', 0)
+    coordinator.batch_io = batch_io
+    coordinator.integrity_modes = [] if seal == 'none' else [seal]
+    coordinator.min_workers = workers
+    coordinator.min_chunk_size = coordinator.probe_chunk_size = coordinator.max_fragmented_chunk_size = chunk
+    threading.Thread(target=coordinator.listen_for_messages, daemon=True).start()
+    nodes = []
+    for _ in range(workers):
+        worker = client.Worker(events.EventSink(), port=0, batch_io=batch_io)
+        worker.coordinator_addr = coordinator.socket.getsockname()
+        worker.start_connect()
+        nodes.append(worker)
+    job = coordinator.start_processing(size)
+    finished = job.join(timeout)
+    for worker in nodes:
+        worker.is_running = False
+    summary = job.summary or {}
+    processing_time = summary.get('processing_time') or 0.0
+    return {'bench': 'job', 'engine': engine, 'batch_io': batch_io, 'integrity': seal, 'size': size, 'workers': workers,
+            'completed': bool(finished and job.summary), 'error': job.error if finished else f"timed out after {timeout} s",
+            'chunks': coordinator.task_counter, 'retransmits': coordinator.retransmits,
+            'seconds': round(processing_time, 3),
+            'tasks_per_sec': round(coordinator.task_counter / processing_time) if processing_time else None}
+
+
+class LossyProxy:
+    """UDP relay between workers and the coordinator that drops and delays datagrams.
+
+    Workers talk to the proxy's port; each worker gets its own upstream socket,
+    so the coordinator still sees one address per worker."""
+
+    def __init__(self, coordinator_addr, loss: float = 0.0, delay: float = 0.0, jitter: float = 0.0, seed: int = 0):
+        self.coordinator_addr = coordinator_addr
+        self.loss = loss
+        self.delay = delay  # Seconds added in each direction
+        self.jitter = jitter
+        self.random = random.Random(seed)
+        self.listen = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.listen.bind(('127.0.0.1', 0))
+        self.address = self.listen.getsockname()
+        self.upstream = {}  # worker address -> socket facing the coordinator
+        self.downstream = {}  # socket -> worker address
+        self.queue = []  # (due, sequence, socket, datagram, destination)
+        self.sequence = itertools.count()
+        self.selector = selectors.DefaultSelector()
+        self.selector.register(self.listen, selectors.EVENT_READ)
+        self.dropped = 0
+        self.forwarded = 0
+
+    def relay(self, sock, data: bytes, destination):
+        if self.random.random() < self.loss:
+            self.dropped += 1
+            return
+        delay = self.delay + self.random.uniform(0, self.jitter) if self.delay or self.jitter else 0.0
+        if not delay:
+            sock.sendto(data, destination)
+            self.forwarded += 1
+            return
+        heapq.heappush(self.queue, (time.monotonic() + delay, next(self.sequence), sock, data, destination))
+
+    def serve_forever(self):
+        while True:
+            timeout = max(0.0, self.queue[0][0] - time.monotonic()) if self.queue else None
+            for key, _ in self.selector.select(timeout):
+                sock = key.fileobj
+                try:
+                    data, addr = sock.recvfrom(65536)
+                except OSError:
+                    continue
+                if sock is self.listen:
+                    upstream = self.upstream.get(addr)
+                    if upstream is None:
+                        upstream = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+                        upstream.bind(('127.0.0.1', 0))
+                        self.upstream[addr] = upstream
+                        self.downstream[upstream] = addr
+                        self.selector.register(upstream, selectors.EVENT_READ)
+                    self.relay(upstream, data, self.coordinator_addr)
+                else:
+                    self.relay(self.listen, data, self.downstream[sock])
+            now = time.monotonic()
+            while self.queue and self.queue[0][0] <= now:
+                _, _, sock, data, destination = heapq.heappop(self.queue)
+                sock.sendto(data, destination)
+                self.forwarded += 1
+
+
+def _run_proxy(coordinator_addr, loss: float, delay: float, seed: int, ready):
+    proxy = LossyProxy(coordinator_addr, loss, delay, delay / 2, seed)
+    ready.put(proxy.address)
+    proxy.serve_forever()
+
+
+def _run_worker(coordinator_addr, formats, batch_io: bool):
+    """Worker process: serve tasks until terminated"""
+    worker = client.Worker(events.EventSink(), port=0, batch_io=batch_io, formats=formats)
+    worker.coordinator_addr = tuple(coordinator_addr)
+    worker.run()
+
+
+def peak_rss_mb(who) -> float:
+    """Peak resident set size of this process or of its waited-for children"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(who).ru_maxrss
+    return round(peak / (1 << 20) if sys.platform == 'darwin' else peak / 1024, 1)  # Bytes on macOS, KiB elsewhere
+
+
+def run_point(config: dict) -> dict:
+    """One sweep point: a headless coordinator, worker processes and optionally a lossy proxy"""
+    random.seed(config['seed'])  # Same dataset for the same point
+    sink = events.LogSink()
+    coordinator = server.ENGINES[config['engine']](sink, '127.0.0.1', 0)
+    coordinator.min_workers = config['workers']
+    if config['chunk']:
+        coordinator.min_chunk_size = coordinator.probe_chunk_size = coordinator.max_fragmented_chunk_size = config['chunk']
+    threading.Thread(target=coordinator.listen_for_messages, daemon=True).start()
+    target = coordinator.socket.getsockname()
+    processes = []
+    if config['loss'] or config['delay']:
+        ready = multiprocessing.Queue()
+        proxy = multiprocessing.Process(target=_run_proxy, args=(target, config['loss'], config['delay'], config['seed'], ready),
+                                        daemon=True)
+        proxy.start()
+        processes.append(proxy)
+        target = ready.get(timeout=10)
+    formats = [config['format']]
+    for _ in range(config['workers']):
+        worker = multiprocessing.Process(target=_run_worker, args=(target, formats, True), daemon=True)
+        worker.start()
+        processes.append(worker)
+    job = coordinator.start_processing(config['size'])
+    finished = job.join(config['timeout'])
+    for process in processes:
+        process.terminate()
+        process.join()
+    summary = job.summary or {}
+    latency = coordinator.metrics.histograms['task_latency_seconds']
+    p50, p99 = latency.quantile(0.5), latency.quantile(0.99)
+    return dict(config, bench='sweep', completed=bool(finished and job.summary), error=job.error,
+                elements_per_sec=round(summary.get('throughput', 0)), seconds=round(summary.get('processing_time', 0), 3),
+                chunks=coordinator.task_counter,
+                p50_latency_ms=round(p50 * 1000, 3) if p50 is not None else None,
+                p99_latency_ms=round(p99 * 1000, 3) if p99 is not None else None,
+                retransmits=coordinator.retransmits, fragment_retransmits=coordinator.transport.retransmits,
+                datagrams_dropped=coordinator.datagrams_dropped,
+                coordinator_peak_rss_mb=peak_rss_mb(resource.RUSAGE_SELF) if resource else None,
+                worker_peak_rss_mb=peak_rss_mb(resource.RUSAGE_CHILDREN) if resource else None)
+
+
+def _run_point_child(config: dict, results):
+    results.put(run_point(config))
+
+
+def sweep(grid: dict, engine: str, seed: int, timeout: float) -> list:
+    """Run every point of the grid, each in a fresh process so peak RSS is its own"""
+    runs = []
+    keys = list(grid)
+    for values in itertools.product(*(grid[key] for key in keys)):
+        config = dict(zip(keys, values), engine=engine, seed=seed, timeout=timeout)
+        results = multiprocessing.Queue()
+        child = multiprocessing.Process(target=_run_point_child, args=(config, results))
+        child.start()
+        try:
+            run = results.get(timeout=timeout + 30)
+        except Exception:  # queue.Empty: the point hung or crashed
+            run = dict(config, bench='sweep', completed=False, error='no result')
+        child.join(5)
+        if child.is_alive():
+            child.terminate()
+        print(json.dumps(run), flush=True)
+        runs.append(run)
+    return runs
+
+
+def _list(kind):
+    return lambda text: [kind(value) for value in text.split(',')]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="UDP hot-path benchmarks")
+    sub = parser.add_subparsers(dest="command", required=True)
+    io = sub.add_parser("io", help="raw receive and send message rates")
+    io.add_argument("--count", type=int, default=200000)
+    io.add_argument("--size", type=int, default=128, help="datagram size for the receive benchmark")
+    job = sub.add_parser("job", help="end-to-end jobs with small chunks")
+    job.add_argument("--size", type=int, default=1000000)
+    job.add_argument("--workers", type=int, default=4)
+    job.add_argument("--chunk", type=int, default=256, help="elements per task")
+    job.add_argument("--engine", default="asyncio", choices=list(server.ENGINES))
+    job.add_argument("--timeout", type=float, default=120.0, help="seconds allowed per job")
+    seal = sub.add_parser("integrity", help="cost of sealing messages, per message and end to end")
+    seal.add_argument("--count", type=int, default=20000, help="messages per seal/open measurement")
+    seal.add_argument("--message-sizes", type=_list(int), default=[128, 1024, 64000], help="comma-separated message sizes in bytes")
+    seal.add_argument("--size", type=int, default=1000000)
+    seal.add_argument("--workers", type=int, default=4)
+    seal.add_argument("--chunk", type=int, default=4096, help="elements per task")
+    seal.add_argument("--engine", default="asyncio", choices=list(server.ENGINES))
+    seal.add_argument("--timeout", type=float, default=120.0, help="seconds allowed per job")
+    grid = sub.add_parser("sweep", help="headless coordinator and worker processes over a parameter grid")
+    grid.add_argument("--sizes", type=_list(int), default=[100000, 1000000], help="comma-separated dataset sizes")
+    grid.add_argument("--chunks", type=_list(int), default=[0, 4096], help="elements per task (0: adaptive)")
+    grid.add_argument("--workers", type=_list(int), default=[1, 2, 4])
+    grid.add_argument("--formats", type=_list(str), default=protocol.SUPPORTED_FORMATS)
+    grid.add_argument("--loss", type=_list(float), default=[0.0], help="datagram loss probability per direction")
+    grid.add_argument("--delay", type=_list(float), default=[0.0], help="seconds added per direction (with up to half that as jitter)")
+    grid.add_argument("--engine", default="asyncio", choices=list(server.ENGINES))
+    grid.add_argument("--seed", type=int, default=1)
+    grid.add_argument("--timeout", type=float, default=120.0, help="seconds allowed per point")
+    grid.add_argument("--output", default="benchmark.json")
+    args = parser.parse_args()
+    if args.command == "sweep":
+        runs = sweep({'size': args.sizes, 'chunk': args.chunks, 'workers': args.workers, 'format': args.formats,
+                      'loss': args.loss, 'delay': args.delay}, args.engine, args.seed, args.timeout)
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(runs, f, indent=1)
+        return
+    if args.command == "integrity":
+        runs = [seal_rate(mode, size, args.count) for mode in integrity.SUPPORTED_MODES for size in args.message_sizes]
+        runs += [run_job(True, args.size, args.workers, args.chunk, args.engine, mode, args.timeout)
+                 for mode in ['none'] + integrity.SUPPORTED_MODES]
+    elif args.command == "io":
+        runs = [receive_rate(batched, args.count, args.size) for batched in (False, True)]
+        runs += [send_rate(batched, args.count) for batched in (False, True)]
+    else:
+        runs = [run_job(batch_io, args.size, args.workers, args.chunk, args.engine, timeout=args.timeout)
+                for batch_io in (False, True)]
+    for run in runs:
+        print(json.dumps(run))
+
+
+if __name__ == "__main__":
+    main()
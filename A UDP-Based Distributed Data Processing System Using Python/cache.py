@@ -0,0 +1,98 @@
+import hashlib
+import json
+import os
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional
+
+# Result caches.
+#
+# ResultCache lives on the coordinator and maps (operation, parameters, chunk
+# content digest) to the chunk's mergeable partial, so a chunk whose result is
+# already known is folded straight into its job and never dispatched. Entries
+# are evicted least-recently-used first and can be persisted to a JSON file
+# between runs. Content-addressed keys only match when chunk boundaries do, so
+# the coordinator carves fixed-size chunks while a cache is configured.
+#
+# IdempotencyCache lives on the worker and remembers the last few results by
+# task, so a TASK retransmitted after a lost RESULT is answered without
+# recomputing it.
+
+CACHE_FILE_VERSION = 1
+
+
+def chunk_key(operation: str, params: Optional[Dict[str, Any]], data) -> str:
+    """Content-addressed key of an operation over a chunk (an array or a typed memoryview)"""
+    view = memoryview(data)
+    digest = hashlib.blake2b(view, digest_size=16).hexdigest()  # Hashes the raw bytes, no copy
+    params_text = json.dumps(params or {}, sort_keys=True, separators=(',', ':'))
+    return f"{operation}|{params_text}|{view.format}|{len(view)}|{digest}"
+
+
+class ResultCache:
+    """LRU map from chunk keys to partial results, optionally persisted to `path`"""
+
+    def __init__(self, capacity: int = 4096, path: Optional[str] = None):
+        self.capacity = max(1, capacity)
+        self.path = path
+        self.entries: OrderedDict = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.dirty = False  # Changed since the last save()
+
+    def get(self, key: str) -> Optional[dict]:
+        result = self.entries.get(key)
+        if result is None:
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return result
+
+    def put(self, key: str, result: dict):
+        self.entries[key] = result
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.capacity:
+            self.entries.popitem(last=False)
+        self.dirty = True
+
+    def load(self) -> int:
+        """Read persisted entries, oldest first; returns how many were loaded"""
+        if not self.path or not os.path.exists(self.path):
+            return 0
+        with open(self.path, 'r', encoding='utf-8') as f:
+            state = json.load(f)
+        if state.get('version') != CACHE_FILE_VERSION:
+            raise ValueError(f"Unsupported cache file version {state.get('version')}")
+        for key, result in state['entries']:
+            self.put(key, result)
+        self.dirty = False
+        return len(self.entries)
+
+    def save(self):
+        """Write the entries to `path`, replacing the old file only once the new one is complete"""
+        if not self.path or not self.dirty:
+            return
+        temp = f"{self.path}.tmp"
+        with open(temp, 'w', encoding='utf-8') as f:
+            json.dump({'version': CACHE_FILE_VERSION, 'entries': list(self.entries.items())}, f, separators=(',', ':'))
+        os.replace(temp, self.path)
+        self.dirty = False
+
+
+class IdempotencyCache:
+    """The last `capacity` results by task, for answering duplicate TASKs"""
+
+    def __init__(self, capacity: int = 256):
+        self.capacity = capacity
+        self.entries: OrderedDict = OrderedDict()
+
+    def get(self, key: Hashable) -> Optional[dict]:
+        return self.entries.get(key)
+
+    def put(self, key: Hashable, result: dict):
+        self.entries[key] = result
+        while len(self.entries) > self.capacity:
+            self.entries.popitem(last=False)
+
+    def clear(self):
+        self.entries.clear()
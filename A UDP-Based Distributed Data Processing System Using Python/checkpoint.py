@@ -0,0 +1,148 @@
+import json
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+# Job checkpoints.
+#
+# A checkpoint is an append-only JSON-lines log. Its first line describes the
+# job (operation, parameters, dataset length and type, and where the data came
+# from: the seed of generated data, or the path, size and modification time of
+# a dataset file, so an edited file is not resumed); every later line records the
+# dataset spans completed since the previous line together with the job's
+# running accumulator at that moment. Spans rather than chunk ids are logged
+# because chunk sizes adapt to the workers of each run. A coordinator that
+# restarts with the same checkpoint skips every logged span and starts from the
+# last accumulator, so only the missing chunks are dispatched again. Chunks
+# completed after the last record are simply recomputed. A torn last line (the
+# process died mid-write) is ignored. The log is compacted into a single record
+# every `compact_every` records and deleted once the job completes.
+
+CHECKPOINT_VERSION = 1
+
+Span = Tuple[int, int]  # (offset, length) of completed elements
+
+
+def merge_spans(spans: List[Span]) -> List[Span]:
+    """Sort spans and coalesce the adjacent or overlapping ones"""
+    merged: List[Span] = []
+    for offset, length in sorted(spans):
+        if merged and offset <= merged[-1][0] + merged[-1][1]:
+            start, previous = merged[-1]
+            merged[-1] = (start, max(previous, offset + length - start))
+        else:
+            merged.append((offset, length))
+    return merged
+
+
+class JobCheckpoint:
+    """Progress log of one job at `path`"""
+
+    def __init__(self, path: str, interval: float = 5.0, compact_every: int = 64):
+        self.path = path
+        self.interval = interval  # Seconds between records
+        self.compact_every = compact_every
+        self.lock = threading.Lock()
+        self.header: Optional[Dict[str, Any]] = None  # Description of the job the log belongs to
+        self.spans: List[Span] = []  # Every span logged so far, merged
+        self.accumulator: Optional[dict] = None
+        self.completed_count = 0
+        self.records = 0  # Progress lines since the header
+        self.last_write = 0.0
+        self.file = None
+
+    def load(self) -> bool:
+        """Read an existing log; returns False if there is none"""
+        if not os.path.exists(self.path):
+            return False
+        with open(self.path, 'r', encoding='utf-8') as f:
+            lines = f.read().split('\n')
+        if not lines[-1]:
+            lines.pop()
+        entries = []
+        for index, line in enumerate(lines):
+            try:
+                entries.append(json.loads(line))
+            except ValueError:
+                if index == len(lines) - 1:
+                    break  # Torn write of the last record
+                raise ValueError(f"Corrupt checkpoint {self.path} at line {index + 1}")
+        if not entries or entries[0].get('version') != CHECKPOINT_VERSION:
+            raise ValueError(f"Unsupported checkpoint {self.path}")
+        self.header = entries[0]['job']
+        spans = []
+        for entry in entries[1:]:
+            spans.extend(tuple(span) for span in entry['spans'])
+            self.accumulator = entry['accumulator']
+            self.completed_count = entry['chunks']
+        self.spans = merge_spans(spans)
+        self.records = len(entries) - 1
+        return True
+
+    def start(self, header: Dict[str, Any]):
+        """Open the log for appending, writing a fresh header unless resuming the same job"""
+        header = json.loads(json.dumps(header))  # Compare in the form the log stores
+        if self.header is not None and self.header != header:
+            raise ValueError(f"Checkpoint {self.path} belongs to a different job")
+        self.header = header
+        self.compact()  # Also drops a torn last line
+        self.last_write = time.time()
+
+    def due(self, now: float) -> bool:
+        return now - self.last_write >= self.interval
+
+    def append(self, spans: List[Span], accumulator: Optional[dict], completed_count: int):
+        """Record newly completed spans and the accumulator that includes them"""
+        with self.lock:
+            if self.file is None:
+                return
+            self.spans = merge_spans(self.spans + spans)
+            self.accumulator = accumulator
+            self.completed_count = completed_count
+            self.last_write = time.time()
+            if self.records + 1 >= self.compact_every:
+                self._rewrite()
+                return
+            self._write_line({'spans': spans, 'accumulator': accumulator, 'chunks': completed_count})
+            self.records += 1
+
+    def compact(self):
+        """Rewrite the log as its header plus one record holding everything logged so far"""
+        with self.lock:
+            self._rewrite()
+
+    def remove(self):
+        """Delete the log once its job has completed"""
+        with self.lock:
+            self._close()
+            if os.path.exists(self.path):
+                os.remove(self.path)
+
+    def close(self):
+        with self.lock:
+            self._close()
+
+    def _rewrite(self):
+        self._close()
+        temp = f"{self.path}.tmp"
+        with open(temp, 'w', encoding='utf-8') as f:
+            f.write(json.dumps({'version': CHECKPOINT_VERSION, 'job': self.header}) + '\n')
+            if self.spans:
+                f.write(json.dumps({'spans': self.spans, 'accumulator': self.accumulator,
+                                    'chunks': self.completed_count}) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp, self.path)  # The old log stays intact until the new one is complete
+        self.records = 1 if self.spans else 0
+        self.file = open(self.path, 'a', encoding='utf-8')
+
+    def _write_line(self, entry: dict):
+        self.file.write(json.dumps(entry) + '\n')
+        self.file.flush()
+        os.fsync(self.file.fileno())
+
+    def _close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
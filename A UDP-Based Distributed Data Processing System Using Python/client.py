@@ -1,90 +1,268 @@
+import argparse
+import itertools
 import socket
 import json
+import logging
 import sys
 import time
 import threading
-import customtkinter as ctk
-from tkinter import ttk, scrolledtext
-from tkinter import messagebox
-from typing import Tuple
+from typing import Optional, Tuple
+try:
+    import customtkinter as ctk
+    from tkinter import ttk, scrolledtext
+    from tkinter import messagebox
+except ImportError:  # Headless nodes run without Tk
+    ctk = None
+import cache
+import compression
+import compute
+import discovery
+import events
+import integrity
+import operations
+import protocol
+import transport
 
 class Worker:
-    def __init__(self, gui, port=10000):
+    def __init__(self, events: events.EventSink, port=10000, max_credits=8, backend=None, processes=1, batch_io=True,
+                 formats=None):
         self.host = ''  # Bind to all interfaces
         self.port = port
-        self.coordinator_addr = None  # Will be set via GUI
-        self.gui = gui
+        self.coordinator_addr = None  # Set via the GUI or command line, or discovered when left unset
+        self.cluster = None  # Only coordinators announcing this cluster name are discovered
+        self.discovery_timeout = 30.0  # Seconds to wait for an announcement
+        self.events = events
         self.socket = None
         self.is_running = False
+        self.wire_format = protocol.FORMAT_JSON  # Negotiated at registration
+        self.formats = list(formats or protocol.SUPPORTED_FORMATS)  # Offered at registration, preferred first
+        self.credits = 1  # Tasks we can buffer, advertised to the coordinator
+        self.backend = compute.select_backend(backend)
+        self.processes = max(1, processes)
+        self.engine = None  # Process pool when running on more than one core
+        self.batch_io = batch_io  # Drain queued datagrams per wakeup into reused buffers
+        self.batching = False  # Coordinator accepts BATCH datagrams (negotiated at registration)
+        self.leaving = False  # Sent LEAVE; finishing in-flight tasks until the coordinator confirms
+        self.left = threading.Event()  # Set when the coordinator confirms with LEFT
+        self.heartbeat_interval = 1.0  # Seconds; advertised so the coordinator's failure detector can calibrate
+        self.outbox = []  # Results produced while handling one read, sent together by flush_results()
+        self.sequence = itertools.count(1)  # Numbers RESULTs, task errors and heartbeats so the coordinator can spot lost datagrams
+        self.results = cache.IdempotencyCache()  # (job_id, chunk_id, length) -> result, for retransmitted TASKs
+        self.integrity_modes = list(integrity.SUPPORTED_MODES)  # Seal modes offered at registration
+        self.secret = integrity.secret_from_env()  # Shared cluster secret, if the coordinator requires one
+        self.nonce = integrity.new_nonce()  # Our half of the session key; renewed for every registration
+        self.session: Optional[integrity.Session] = None  # Negotiated seal for traffic with the coordinator
+        self.last_sealed = 0.0  # When the coordinator last sent something that passed the seal
+        self.rejoin_quiet = 10.0  # Seconds of that before an unsealed REJOIN is believed (a restarted coordinator cannot seal)
         try:
             self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-            self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 65536)  # Increase receive buffer
+            self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 1 << 20)  # Increase receive buffer (kernel may clamp)
             self.socket.settimeout(5.0)
             self.socket.bind((self.host, port))
-            self.gui.log_message(f"Worker initialized on port {port}")
+            self.transport = transport.FragmentTransport(self.socket)
+            self.reader = transport.DatagramReader(self.socket)
+            # Each buffered task occupies at most one datagram or one fragment window of the receive buffer
+            rcvbuf = self.socket.getsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF)
+            self.credits = max(1, min(max_credits, rcvbuf // protocol.MAX_DATAGRAM))
+            if self.processes > 1:
+                # Tasks leave the socket buffer as soon as they are staged, so keep every core fed
+                self.engine = compute.ProcessPoolEngine(self.processes, self.backend.name)
+                self.credits = max(self.credits, 2 * self.processes)
+            self.events.log_message(f"Worker initialized on port {port} ({self.credits} task credits, {self.backend.name} backend, "
+                                 f"{self.processes} processes)")
         except OSError as e:
-            self.gui.log_message(f"Error: Port {port} already in use. Try another port.")
-    
-    def process_task(self, data: list) -> dict:
-        """Process a data chunk and compute statistics"""
-        if not data:
-            return {'sum': 0, 'count': 0, 'min': 0, 'max': 0}
-        total = sum(data)
-        count = len(data)
-        return {
-            'sum': total,
-            'count': count,
-            'min': min(data),
-            'max': max(data)
+            self.events.log_message(f"Error: Port {port} already in use. Try another port.")
+    
+    def process_task(self, data, operation: str = 'sum_and_stats', params: dict = None) -> dict:
+        """Run an operation over a data chunk and return its mergeable partial"""
+        return self.backend.run(operation, data, params)
+    
+    def send_result(self, job_id: int, chunk_id: int, result: dict, recv_time: float, compute_time: float, defer: bool = False,
+                    codec_stats: Optional[dict] = None):
+        """Send a RESULT back to the coordinator; deferred results wait for flush_results()"""
+        response = self.seal(protocol.encode_result(chunk_id, result, self.wire_format, job_id, credits=self.credits,
+                                                    recv_time=recv_time, compute_time=compute_time, seq=next(self.sequence),
+                                                    **(codec_stats or {})))
+        if defer:
+            self.outbox.append(response)
+        else:
+            self.transport.send(response, self.coordinator_addr)
+        self.events.log_message(f"Sent result for task {job_id}/{chunk_id} (receive {recv_time * 1000:.1f} ms, compute {compute_time * 1000:.1f} ms)")
+        self.events.add_result(chunk_id, result)
+    
+    def send_task_error(self, job_id: int, chunk_id: int, error):
+        """Tell the coordinator a task cannot be computed, so it fails the job instead of resending the task"""
+        self.events.log_message(f"Error processing task {job_id}/{chunk_id}: {error}")
+        message = {'type': 'TASK_ERROR', 'job_id': job_id, 'chunk_id': chunk_id, 'error': str(error), 'seq': next(self.sequence)}
+        self.transport.send(self.seal(json.dumps(message).encode('utf-8')), self.coordinator_addr)
+    
+    def flush_results(self):
+        """Send deferred results, coalesced into as few datagrams as fit"""
+        outbox, self.outbox = self.outbox, []
+        for datagram in protocol.pack_batches(outbox):
+            self.transport.send(datagram, self.coordinator_addr)
+    
+    def submit_task(self, job_id: int, chunk_id: int, chunk_data, operation: str, params: dict, recv_time: float,
+                    codec_stats: Optional[dict] = None):
+        """Hand a task to the process pool; its result is sent whenever it completes"""
+        if not isinstance(chunk_data, compute.StagedChunk):
+            chunk_data = self.engine.stage(chunk_data)  # JSON tasks arrive as lists
+        key = (job_id, chunk_id, len(chunk_data))
+        
+        def done(result, compute_time, error):
+            if error is not None:
+                self.send_task_error(job_id, chunk_id, error)
+                return
+            self.results.put(key, result)
+            self.send_result(job_id, chunk_id, result, recv_time, compute_time, codec_stats=codec_stats)
+        self.engine.submit(chunk_data, operation, params, done)
+    
+    def discard(self, chunk_data):
+        """Free a task payload the decode hook staged into shared memory but that is not submitted"""
+        if isinstance(chunk_data, compute.StagedChunk):
+            self.engine.release(chunk_data)
+    
+    def seal(self, message: bytes) -> bytes:
+        """Seal a message for the coordinator, if the session negotiated a seal"""
+        session = self.session
+        return session.seal(message) if session is not None else message
+    
+    def register_message(self) -> bytes:
+        """REGISTER advertising this worker's capabilities"""
+        message = {
+            'type': 'REGISTER',
+            'wire_version': protocol.WIRE_VERSION,
+            'formats': self.formats,
+            'fragments': True,
+            'credits': self.credits,
+            'cores': self.processes,
+            'operations': operations.SUPPORTED_OPERATIONS,
+            'batch': self.batch_io,
+            'codecs': compression.SUPPORTED_CODECS,
+            'heartbeat_interval': self.heartbeat_interval,
+            'integrity': self.integrity_modes,
+            'nonce': self.nonce
         }
+        if self.secret:
+            message['proof'] = integrity.proof(self.secret, 'register', self.nonce)  # The coordinator may require it
+        return json.dumps(message).encode('utf-8')
+    
+    def start_registration(self) -> bytes:
+        """REGISTER for a new session; messages are unsealed until its ACK arrives"""
+        self.session = None
+        self.nonce = integrity.new_nonce()
+        return self.register_message()
+    
+    def accept_session(self, message: dict) -> Optional[integrity.Session]:
+        """The seal an ACK sets up; raises ValueError if the coordinator cannot be trusted"""
+        mode = message.get('integrity')
+        if self.secret is not None:
+            nonce = message.get('nonce')
+            if mode not in integrity.KEYED_MODES or not isinstance(nonce, str):
+                raise ValueError("coordinator did not authenticate")
+            key = integrity.derive_key(self.secret, self.nonce, nonce)
+            if not integrity.check_proof(key, message.get('proof'), 'ack', self.nonce, nonce):
+                raise ValueError("coordinator failed authentication")
+            return integrity.Session(mode, key)
+        if mode in integrity.KEYED_MODES:
+            return integrity.Session(mode, bytes.fromhex(message.get('key') or ''))
+        if mode == 'crc32':
+            return integrity.Session(mode)
+        return None
+    
+    def on_ack(self, message: dict) -> bool:
+        """Adopt the settings the coordinator negotiated; False (ignored) unless the ACK answers our REGISTER and can be trusted"""
+        if message.get('worker_nonce') != self.nonce:
+            self.events.log_message("Ignored an ACK that does not answer our REGISTER")
+            return False
+        try:
+            self.session = self.accept_session(message)
+        except ValueError as e:
+            self.events.log_message(f"Error: Ignored an ACK: {e}")
+            return False
+        self.last_sealed = time.time()
+        self.wire_format = message.get('format', protocol.FORMAT_JSON)
+        self.batching = self.batch_io and bool(message.get('batch'))
+        self.results.clear()  # Task ids restart with a new registration
+        self.events.log_message(f"Registered with coordinator ({self.wire_format} format, "
+                                f"{self.session.mode if self.session else 'unsealed'})")
+        self.events.update_status("Connected")
+        return True
+    
+    def on_error(self, message: dict):
+        """The coordinator refused us (e.g. an incompatible wire version); stop"""
+        if message.get('worker_nonce') != self.nonce:
+            self.events.log_message("Ignored an ERROR that does not answer our REGISTER")
+            return
+        self.events.log_message(f"Error: Coordinator rejected registration: {message.get('message')}")
+        self.events.update_status("Disconnected")
+        self.is_running = False
     
     def send_heartbeat(self):
         """Send periodic heartbeat to coordinator"""
         while self.is_running and self.coordinator_addr:
             try:
                 if self.socket:
-                    message = json.dumps({'type': 'HEARTBEAT'}).encode('utf-8')
+                    message = self.seal(json.dumps({'type': 'HEARTBEAT', 'seq': next(self.sequence)}).encode('utf-8'))
                     self.socket.sendto(message, self.coordinator_addr)
-                    self.gui.log_message(f"Sent heartbeat to coordinator {self.coordinator_addr}")
-                time.sleep(5)
+                    self.events.log_message(f"Sent heartbeat to coordinator {self.coordinator_addr}")
+                time.sleep(self.heartbeat_interval)
             except Exception as e:
-                self.gui.log_message(f"Error sending heartbeat: {e}")
+                self.events.log_message(f"Error sending heartbeat: {e}")
     
     def run(self):
         """Main worker loop"""
         if not self.socket:
-            self.gui.log_message("Cannot run worker: Socket not initialized")
+            self.events.log_message("Cannot run worker: Socket not initialized")
             return
         if not self.coordinator_addr:
-            self.gui.log_message("Error: Coordinator IP not set")
-            messagebox.showerror("Error", "Please enter a valid Coordinator IP")
+            self.events.log_message("No coordinator address; waiting for a coordinator announcement...")
+            self.events.update_status("Discovering")
+            self.coordinator_addr = discovery.discover(self.discovery_timeout, self.cluster)
+            if not self.coordinator_addr:
+                self.events.log_message(f"Error: No coordinator announced itself within {self.discovery_timeout:.0f} seconds")
+                self.events.update_status("Disconnected")
+                return
+            self.events.log_message(f"Discovered coordinator at {self.coordinator_addr[0]}:{self.coordinator_addr[1]}")
+        try:
+            # Datagrams are matched against the address they come from, so resolve a host name once
+            self.coordinator_addr = (socket.gethostbyname(self.coordinator_addr[0]), self.coordinator_addr[1])
+        except OSError as e:
+            self.events.log_message(f"Error: Cannot resolve coordinator {self.coordinator_addr[0]}: {e}")
+            self.events.update_status("Disconnected")
             return
         self.is_running = True
         
         # Register with coordinator
         attempts = 0
         max_attempts = 5
+        register = self.start_registration()  # Retries reuse the nonce, so any of their ACKs matches
         while attempts < max_attempts and self.is_running:
             try:
-                register_msg = json.dumps({'type': 'REGISTER'}).encode('utf-8')
-                self.socket.sendto(register_msg, self.coordinator_addr)
-                self.gui.log_message(f"Attempting to register with coordinator {self.coordinator_addr} (Attempt {attempts + 1}/{max_attempts})")
+                self.socket.sendto(register, self.coordinator_addr)
+                self.events.log_message(f"Attempting to register with coordinator {self.coordinator_addr} (Attempt {attempts + 1}/{max_attempts})")
                 data, addr = self.socket.recvfrom(65536)
-                message = json.loads(data.decode('utf-8'))
+                if addr != self.coordinator_addr:
+                    continue
+                message = protocol.decode_message(data)
                 if message.get('type') == 'ACK':
-                    self.gui.log_message("Registered with coordinator")
-                    self.gui.update_status("Connected")
-                    break
+                    if self.on_ack(message):
+                        break
+                    attempts += 1  # Not an answer we can use; ask again
+                elif message.get('type') == 'ERROR':
+                    self.on_error(message)
+                    if not self.is_running:
+                        return
             except socket.timeout:
                 attempts += 1
-                self.gui.log_message(f"Registration attempt {attempts}/{max_attempts} failed. Retrying...")
+                self.events.log_message(f"Registration attempt {attempts}/{max_attempts} failed. Retrying...")
                 time.sleep(2)
             except Exception as e:
-                self.gui.log_message(f"Error during registration: {e}")
+                self.events.log_message(f"Error during registration: {e}")
                 return
         if attempts >= max_attempts:
-            self.gui.log_message("Error: Failed to register with coordinator")
-            self.gui.update_status("Disconnected")
+            self.events.log_message("Error: Failed to register with coordinator")
+            self.events.update_status("Disconnected")
             self.is_running = False
             return
         
@@ -93,45 +271,141 @@ class Worker:
         heartbeat_thread.start()
         
         # Main loop for receiving tasks
+        self.socket.settimeout(0.2)  # Short timeout so the transport timers keep running
         while self.is_running:
             try:
-                data, addr = self.socket.recvfrom(65536)
-                message = json.loads(data.decode('utf-8'))
-                if message.get('type') == 'TASK':
-                    chunk_id = message.get('chunk_id')
-                    chunk_data = message.get('data')
-                    self.gui.log_message(f"Received task {chunk_id} with {len(chunk_data)} elements")
-                    self.gui.add_task(chunk_id, len(chunk_data))
-                    result = self.process_task(chunk_data)
-                    response = json.dumps({
-                        'type': 'RESULT',
-                        'chunk_id': chunk_id,
-                        'result': result
-                    }).encode('utf-8')
-                    self.socket.sendto(response, self.coordinator_addr)
-                    self.gui.log_message(f"Sent result for task {chunk_id}")
-                    self.gui.add_result(chunk_id, result)
-                elif message.get('type') == 'ACK':
-                    self.gui.log_message("Received registration acknowledgment")
+                self.transport.poll()
+                if self.batch_io:
+                    datagrams = self.reader.read()  # Everything queued, in reused buffers
+                else:
+                    datagrams = [self.socket.recvfrom(65536)]
+                for data, addr in datagrams:
+                    self.handle_datagram(data, addr)
+                self.flush_results()
             except socket.timeout:
                 continue
             except Exception as e:
-                self.gui.log_message(f"Error processing message: {e}")
+                self.events.log_message(f"Error processing message: {e}")
+    
+    def handle_datagram(self, data: bytes, addr: Tuple[str, int]):
+        """Feed a datagram through the fragment layer and handle every message it completes"""
+        if addr != self.coordinator_addr:
+            return  # Only our coordinator sends us anything
+        data = self.transport.handle(data, addr)
+        if data is None:
+            return
+        for message in protocol.split_batch(data):
+            try:
+                self.handle_message(message)
+            except Exception as e:
+                self.events.log_message(f"Error processing message: {e}")
+    
+    def handle_message(self, data: bytes):
+        """Handle one message; its buffer is reused after the current read, so tasks are computed or staged now"""
+        decode_start = time.perf_counter()
+        sealed = integrity.is_sealed(data)
+        if sealed:
+            data = self.session.open(data) if self.session is not None else None
+            if data is None:
+                self.events.log_message("Dropped a message that failed its integrity check")
+                return
+            self.last_sealed = time.time()
+        message = protocol.decode_message(data, self.engine or self.backend)
+        recv_time = self.transport.last_reassembly_time + time.perf_counter() - decode_start
+        msg_type = message.get('type')
+        # ACKs are bound to our REGISTER instead; a restarted coordinator's REJOIN cannot be sealed,
+        # so it is believed once the session has gone quiet
+        if self.session is not None and not sealed and msg_type != 'ACK' and not (
+                msg_type == 'REJOIN' and time.time() - self.last_sealed > self.rejoin_quiet):
+            self.events.log_message(f"Dropped an unsealed {str(msg_type).lower()}")
+            self.discard(message.get('data'))
+            return
+        if message.get('type') == 'TASK':
+            job_id = message.get('job_id', 0)
+            chunk_id = message.get('chunk_id')
+            chunk_data = message.get('data')
+            operation = message.get('operation', 'sum_and_stats')
+            params = message.get('params')
+            # Compressed payloads: report the decode cost so the coordinator can tune (it counts the bytes saved itself)
+            codec_stats = {'codec_time': message['codec_time']} if 'codec' in message else None
+            self.events.log_message(f"Received task {job_id}/{chunk_id} with {len(chunk_data)} elements")
+            self.events.add_task(chunk_id, len(chunk_data))
+            result = self.results.get((job_id, chunk_id, len(chunk_data)))
+            if result is not None:
+                # Our RESULT was lost and the coordinator retransmitted the task
+                self.events.log_message(f"Task {job_id}/{chunk_id} already computed, resending its result")
+                self.send_result(job_id, chunk_id, result, recv_time, 0.0, defer=self.batching)
+                self.discard(chunk_data)
+                return
+            if self.engine:
+                self.submit_task(job_id, chunk_id, chunk_data, operation, params, recv_time, codec_stats)
+                return
+            compute_start = time.perf_counter()
+            try:
+                result = self.process_task(chunk_data, operation, params)
+            except Exception as e:
+                self.send_task_error(job_id, chunk_id, e)
+                return
+            compute_time = time.perf_counter() - compute_start
+            self.results.put((job_id, chunk_id, len(chunk_data)), result)
+            self.send_result(job_id, chunk_id, result, recv_time, compute_time, self.batching, codec_stats)
+        elif message.get('type') == 'ACK':
+            self.on_ack(message)
+        elif message.get('type') == 'ERROR':
+            self.on_error(message)
+        elif message.get('type') == 'LEFT':
+            self.events.log_message("Coordinator released us; shutting down")
+            self.events.update_status("Disconnected")
+            self.left.set()
+            self.is_running = False
+        elif message.get('type') == 'REJOIN' and not self.leaving:
+            # The coordinator evicted us (or restarted); heartbeats keep prompting until the ACK arrives
+            self.events.log_message("Coordinator dropped our registration, registering again")
+            self.events.update_status("Rejoining")
+            self.socket.sendto(self.start_registration(), self.coordinator_addr)
+    
+    def leave(self, timeout: float = 30.0) -> bool:
+        """Leave gracefully: stop taking tasks, finish the in-flight ones, then stop once the coordinator confirms"""
+        if not self.is_running:
+            return True
+        self.leaving = True
+        self.events.log_message("Leaving: finishing in-flight tasks")
+        self.events.update_status("Leaving")
+        deadline = time.time() + timeout
+        while not self.left.is_set() and time.time() < deadline:
+            try:
+                self.socket.sendto(self.seal(json.dumps({'type': 'LEAVE'}).encode('utf-8')), self.coordinator_addr)
+            except OSError as e:
+                self.events.log_message(f"Error sending LEAVE: {e}")
+            self.left.wait(1.0)  # Repeated in case the LEAVE or the LEFT is lost
+        if not self.left.is_set():
+            self.events.log_message("Coordinator did not confirm LEAVE; stopping anyway")
+        self.is_running = False
+        return self.left.is_set()
     
     def start_connect(self):
         """Start the worker loop in a thread"""
         if not self.is_running:
-            threading.Thread(target=self.run, daemon=True).start()
+            self.leaving = False
+            self.left.clear()
+            thread = threading.Thread(target=self.run, daemon=True)
+            thread.start()
+            return thread
 
 class WorkerGUI:
-    def __init__(self, root, port):
+    MAX_LOG_LINES = 1000  # Older log lines and task rows are dropped
+    MAX_TASK_ROWS = 500
+    
+    def __init__(self, root, port, processes=1):
         self.root = root
         self.root.title(f"Distributed Data Processing - Worker {port}")
         self.root.geometry("700x500")
         # Create widgets first
         self.create_widgets()
-        # Initialize worker after widgets are set up
-        self.worker = Worker(self, port=port)
+        # Initialize worker after widgets are set up; its events reach the widgets through the Tk thread
+        self.events = events.QueueSink(self)
+        self.worker = Worker(self.events, port=port, processes=processes)
+        self.events.pump(self.root)
     
     def create_widgets(self):
         """Create GUI widgets"""
@@ -144,7 +418,7 @@ class WorkerGUI:
         self.coord_frame.pack(pady=5, padx=5, fill="x")
         self.coord_label = ctk.CTkLabel(self.coord_frame, text="Coordinator IP:")
         self.coord_label.pack(side="left", padx=5)
-        self.coord_entry = ctk.CTkEntry(self.coord_frame, placeholder_text="Enter Coordinator IP", width=150)
+        self.coord_entry = ctk.CTkEntry(self.coord_frame, placeholder_text="Blank to discover", width=150)
         self.coord_entry.pack(side="left", padx=5)
         
         # Control frame
@@ -157,6 +431,9 @@ class WorkerGUI:
         self.connect_button = ctk.CTkButton(self.control_frame, text="Connect", command=self.start_connect)
         self.connect_button.pack(side="left", padx=5)
         
+        self.leave_button = ctk.CTkButton(self.control_frame, text="Leave", command=self.leave)
+        self.leave_button.pack(side="left", padx=5)
+        
         # Status log
         self.log_label = ctk.CTkLabel(self.main_frame, text="Status Log:")
         self.log_label.pack(pady=5)
@@ -182,15 +459,17 @@ class WorkerGUI:
         self.tasks_tree.heading("Max", text="Max")
         self.tasks_tree.pack(fill="both", expand=True)
         
+        self.task_items = {}  # task_id -> tree item, oldest first
         self.task_count = 0
         self.completed_tasks = 0
     
     def log_message(self, message: str):
         """Add message to status log"""
-        self.log_text.configure(state="normal")
-        self.log_text.insert("end", f"{time.strftime('%H:%M:%S')}: {message}\n")
-        self.log_text.see("end")
-        self.log_text.configure(state="disabled")
+        self.log_lines([f"{time.strftime('%H:%M:%S')}: {message}"])
+    
+    def log_lines(self, lines: list):
+        """Append a frame's worth of timestamped log lines"""
+        events.append_lines(self.log_text, lines, self.MAX_LOG_LINES)
     
     def update_status(self, status: str):
         """Update status label"""
@@ -198,17 +477,31 @@ class WorkerGUI:
     
     def add_task(self, task_id: int, data_size: int):
         """Add task to table"""
-        self.task_count += 1
-        self.tasks_tree.insert("", "end", values=(task_id, data_size, "-", "-", "-", "-"))
+        self.add_tasks([(task_id, data_size)])
+    
+    def add_tasks(self, rows: list):
+        """Add a frame's worth of tasks, keeping the newest MAX_TASK_ROWS rows"""
+        self.task_count += len(rows)
+        for task_id, data_size in rows:
+            if task_id in self.task_items:  # Re-sent after a timeout
+                self.tasks_tree.delete(self.task_items.pop(task_id))
+            self.task_items[task_id] = self.tasks_tree.insert("", "end", values=(task_id, data_size, "-", "-", "-", "-"))
+        while len(self.task_items) > self.MAX_TASK_ROWS:
+            self.tasks_tree.delete(self.task_items.pop(next(iter(self.task_items))))
         self.update_task_progress()
     
     def add_result(self, task_id: int, result: dict):
         """Update task with result in table"""
-        self.completed_tasks += 1
-        for item in self.tasks_tree.get_children():
-            if self.tasks_tree.item(item, "values")[0] == str(task_id):
-                self.tasks_tree.item(item, values=(task_id, self.tasks_tree.item(item, "values")[1], result['sum'], result['count'], result['min'], result['max']))
-                break
+        self.add_results([(task_id, result)])
+    
+    def add_results(self, rows: list):
+        """Fill in a frame's worth of results"""
+        self.completed_tasks += len(rows)
+        for task_id, result in rows:
+            item = self.task_items.get(task_id)
+            if item is not None:
+                self.tasks_tree.item(item, values=(task_id, self.tasks_tree.item(item, "values")[1], result.get('sum', '-'), result.get('count', '-'),
+                                                   result.get('min', '-'), result.get('max', '-')))
         self.update_task_progress()
     
     def update_task_progress(self):
@@ -221,19 +514,57 @@ class WorkerGUI:
         """Start the worker loop with coordinator IP from entry"""
         try:
             coord_ip = self.coord_entry.get().strip()
-            if not coord_ip:
-                self.log_message("Error: Coordinator IP cannot be empty")
-                messagebox.showerror("Error", "Please enter a valid Coordinator IP")
-                return
-            self.worker.coordinator_addr = (coord_ip, 9999)  # Coordinator port is fixed at 9999
+            # Coordinator port is fixed at 9999; left blank, the coordinator is discovered
+            self.worker.coordinator_addr = (coord_ip, 9999) if coord_ip else None
             self.worker.start_connect()
         except Exception as e:
             self.log_message(f"Error setting coordinator IP: {e}")
             messagebox.showerror("Error", f"Invalid Coordinator IP: {e}")
 
-if __name__ == "__main__":
+    def leave(self):
+        """Drain and disconnect without blocking the Tk thread"""
+        threading.Thread(target=self.worker.leave, daemon=True).start()
+
+def parse_address(value: str) -> Tuple[str, int]:
+    """host or host:port, defaulting to the coordinator's port 9999"""
+    host, _, port = value.rpartition(':') if ':' in value else (value, '', '9999')
+    return host, int(port)
+
+def run_headless(args) -> int:
+    """Serve tasks without the GUI until interrupted"""
+    logging.basicConfig(level=args.log_level, format="%(asctime)s %(message)s", datefmt="%H:%M:%S")
+    worker = Worker(events.LogSink(), port=args.port, backend=args.backend, processes=args.processes,
+                    batch_io=args.batch_io)
+    worker.coordinator_addr = parse_address(args.coordinator) if args.coordinator else None
+    worker.cluster = args.cluster
+    thread = worker.start_connect()
+    try:
+        while thread.is_alive():
+            thread.join(0.5)
+    except KeyboardInterrupt:
+        worker.leave()  # Ctrl-C drains in-flight tasks before exiting
+        return 0
+    return 0 if worker.left.is_set() else 1  # The loop also ends if the worker could not start or register
+
+def main():
+    parser = argparse.ArgumentParser(description="Distributed data processing worker")
+    parser.add_argument("port", nargs="?", type=int, default=10000)
+    parser.add_argument("processes", nargs="?", type=int, default=1, help="compute processes, e.g. `python client.py 10000 8`")
+    parser.add_argument("--headless", action="store_true", help="run without the GUI")
+    parser.add_argument("--coordinator", help="coordinator address as host[:port] (headless mode; default: discover it)")
+    parser.add_argument("--cluster", help="only discover a coordinator announcing this cluster name")
+    parser.add_argument("--backend", choices=list(compute.BACKENDS))
+    parser.add_argument("--no-batch-io", dest="batch_io", action="store_false",
+                        help="one recvfrom per datagram and no BATCH coalescing")
+    parser.add_argument("--log-level", default="INFO", choices=["DEBUG", "INFO", "WARNING", "ERROR"])
+    args = parser.parse_args()
+    if args.headless or ctk is None:
+        sys.exit(run_headless(args))
     ctk.set_default_color_theme("dark-blue")
-    port = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
     app = ctk.CTk()
-    gui = WorkerGUI(app, port)
-    app.mainloop()
\ No newline at end of file
+    gui = WorkerGUI(app, args.port, args.processes)
+    gui.worker.batch_io = args.batch_io
+    app.mainloop()
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
@@ -0,0 +1,163 @@
+import sys
+import zlib
+from array import array
+from typing import Iterable, List, Optional, Tuple
+
+try:
+    import numpy as np
+except ImportError:  # Pure-Python varint coding still works without NumPy
+    np = None
+
+try:
+    import lz4.block as lz4_block
+except ImportError:  # lz4 is offered only where the package is installed
+    lz4_block = None
+
+# Payload codecs for binary TASK datagrams.
+#
+# The codec id travels in the low bits of the binary header's flags byte, and
+# the payload after the meta block is the codec's output instead of the raw
+# little-endian array. Codecs are negotiated at registration, so each side
+# only ever sees codecs it advertised:
+#   varint  integer arrays as zigzag deltas in LEB128 varints (1..1000 -> ~2 bytes each)
+#   lz4     fast general-purpose block compression (optional `lz4` package)
+#   zlib    general-purpose deflate at its fastest level
+# A payload that does not shrink below min_ratio of its size is sent raw.
+
+CODEC_NONE = 0
+CODEC_ZLIB = 1
+CODEC_LZ4 = 2
+CODEC_VARINT = 3
+CODEC_MASK = 0x0F  # Bits of the flags byte holding the codec id
+CODEC_NAMES = {CODEC_ZLIB: 'zlib', CODEC_LZ4: 'lz4', CODEC_VARINT: 'varint'}
+CODEC_IDS = {name: codec for codec, name in CODEC_NAMES.items()}
+
+# Preference order for negotiation
+SUPPORTED_CODECS = ['varint'] + (['lz4'] if lz4_block is not None else []) + ['zlib']
+INTEGER_TYPECODES = ('i', 'q')
+ZLIB_LEVEL = 1
+_NP_DTYPES = {'i': '<i4', 'q': '<i8', 'd': '<f8'}
+_SWAP = sys.byteorder != 'little'
+
+
+def negotiate_codecs(offered: Optional[Iterable[str]]) -> List[str]:
+    """Codecs both sides support, in our order of preference"""
+    offered = set(offered or ())
+    return [codec for codec in SUPPORTED_CODECS if codec in offered]
+
+
+def pick_codec(codecs: Iterable[str], typecode: str) -> Optional[str]:
+    """The preferred negotiated codec that applies to a payload type"""
+    for codec in codecs:
+        if codec != 'varint' or typecode in INTEGER_TYPECODES:
+            return codec
+    return None
+
+
+def compress(codec: str, payload, typecode: str) -> bytes:
+    """Encode a payload (array or typed memoryview) with a codec"""
+    if codec == 'varint':
+        return _varint_encode(payload, typecode)
+    raw = memoryview(payload).cast('B') if not _SWAP else _little_endian(payload, typecode)
+    if codec == 'zlib':
+        return zlib.compress(raw, ZLIB_LEVEL)
+    if codec == 'lz4' and lz4_block is not None:
+        return lz4_block.compress(raw, store_size=True)
+    raise ValueError(f"Unsupported codec {codec}")
+
+
+def decompress(codec_id: int, body, typecode: str) -> bytes:
+    """Raw little-endian array bytes from a codec's output"""
+    if codec_id == CODEC_VARINT:
+        return _varint_decode(body, typecode)
+    if codec_id == CODEC_ZLIB:
+        return zlib.decompress(body)
+    if codec_id == CODEC_LZ4 and lz4_block is not None:
+        return lz4_block.decompress(body)
+    raise ValueError(f"Unsupported codec id {codec_id}")
+
+
+def encode_payload(payload, typecode: str, codecs: Iterable[str], min_ratio: float = 1.1) -> Tuple[int, object]:
+    """(codec id, body) for a payload, falling back to the raw payload when compression does not pay off"""
+    codec = pick_codec(codecs, typecode)
+    if codec is None:
+        return CODEC_NONE, payload
+    body = compress(codec, payload, typecode)
+    raw_size = memoryview(payload).nbytes
+    if len(body) * min_ratio > raw_size:
+        return CODEC_NONE, payload
+    return CODEC_IDS[codec], body
+
+
+def _little_endian(payload, typecode: str) -> bytes:
+    data = array(typecode, payload)
+    data.byteswap()
+    return data.tobytes()
+
+
+def _wrap64(value: int) -> int:
+    return ((value + (1 << 63)) & ((1 << 64) - 1)) - (1 << 63)
+
+
+def _varint_encode(payload, typecode: str) -> bytes:
+    if np is not None:
+        values = np.asarray(memoryview(payload)).astype(np.int64)
+        deltas = np.diff(values, prepend=np.int64(0))
+        zigzag = ((deltas << 1) ^ (deltas >> 63)).view(np.uint64)
+        # Bytes per value: one per started group of 7 bits
+        lengths = np.ones(len(zigzag), dtype=np.int64)
+        rest = zigzag >> np.uint64(7)
+        while rest.any():
+            lengths += rest > 0
+            rest >>= np.uint64(7)
+        starts = np.cumsum(lengths) - lengths
+        out = np.empty(int(lengths.sum()), dtype=np.uint8)
+        group = 0
+        while True:
+            mask = lengths > group
+            if not mask.any():
+                break
+            septet = (zigzag[mask] >> np.uint64(7 * group)) & np.uint64(0x7F)
+            more = (lengths[mask] > group + 1).astype(np.uint64) << np.uint64(7)
+            out[starts[mask] + group] = (septet | more).astype(np.uint8)
+            group += 1
+        return out.tobytes()
+    out = bytearray()
+    previous = 0
+    for value in payload:
+        delta = _wrap64(value - previous)  # Deltas wrap at 64 bits, as NumPy's do
+        previous = value
+        zigzag = delta << 1 if delta >= 0 else ((-delta) << 1) - 1
+        while zigzag >= 0x80:
+            out.append((zigzag & 0x7F) | 0x80)
+            zigzag >>= 7
+        out.append(zigzag)
+    return bytes(out)
+
+
+def _varint_decode(body, typecode: str) -> bytes:
+    if np is not None:
+        data = np.frombuffer(body, dtype=np.uint8)
+        if not len(data):
+            return b''
+        ends = np.flatnonzero((data & 0x80) == 0)
+        starts = np.concatenate(([0], ends[:-1] + 1))
+        # Position of each byte within its value, for the 7-bit shifts
+        index = np.arange(len(data)) - np.repeat(starts, ends - starts + 1)
+        septets = (data & 0x7F).astype(np.uint64) << (np.uint64(7) * index.astype(np.uint64))
+        zigzag = np.add.reduceat(septets, starts)
+        deltas = (zigzag >> np.uint64(1)).view(np.int64) ^ -(zigzag & np.uint64(1)).view(np.int64)
+        return np.cumsum(deltas).astype(_NP_DTYPES[typecode]).tobytes()
+    values = array(typecode)
+    previous = zigzag = shift = 0
+    for byte in memoryview(body).cast('B'):
+        zigzag |= (byte & 0x7F) << shift
+        if byte & 0x80:
+            shift += 7
+            continue
+        previous = _wrap64(previous + ((zigzag >> 1) ^ -(zigzag & 1)))
+        values.append(previous)
+        zigzag = shift = 0
+    if _SWAP:
+        values.byteswap()
+    return values.tobytes()
@@ -0,0 +1,171 @@
+import atexit
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import Optional
+import sys
+import threading
+import time
+import operations
+
+try:
+    import numpy as np
+except ImportError:  # Pure-Python backend still works without NumPy
+    np = None
+
+# Compute backends used by the worker to decode task payloads and run
+# operations over them. NumPy is preferred when installed; the pure-Python
+# backend is the fallback.
+
+
+class PythonBackend:
+    """Array-module decoding and builtin reductions"""
+    name = 'python'
+
+    def decode(self, payload: memoryview, typecode: str):
+        data = array(typecode)
+        data.frombytes(payload)
+        if sys.byteorder != 'little':
+            data.byteswap()
+        return data
+
+    def run(self, operation: str, data, params: Optional[dict] = None) -> dict:
+        op = operations.get_operation(operation)
+        return op.map(data, op.params(params))
+
+
+class NumpyBackend:
+    """Zero-copy np.frombuffer decoding and vectorized reductions"""
+    name = 'numpy'
+    DTYPES = {'i': '<i4', 'q': '<i8', 'd': '<f8'}
+
+    def decode(self, payload: memoryview, typecode: str):
+        return np.frombuffer(payload, dtype=self.DTYPES[typecode])
+
+    def run(self, operation: str, data, params: Optional[dict] = None) -> dict:
+        op = operations.get_operation(operation)
+        return op.map(np.asarray(data), op.params(params))  # JSON tasks arrive as lists
+
+
+BACKENDS = {'python': PythonBackend, 'numpy': NumpyBackend}
+
+
+def select_backend(name: Optional[str] = None):
+    """Return the requested backend, or the fastest one available"""
+    if name is None:
+        name = 'numpy' if np is not None else 'python'
+    if name == 'numpy' and np is None:
+        raise ValueError("NumPy backend requested but NumPy is not installed")
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown compute backend: {name}")
+    return BACKENDS[name]()
+
+
+# Multi-core execution: the worker's receive loop stages each payload in a
+# shared-memory slot and a process pool computes on it in place.
+
+_child_backend = None
+_child_segments = {}
+
+
+def _init_child(backend_name: Optional[str]):
+    global _child_backend
+    _child_backend = select_backend(backend_name)
+
+
+def _attach(name: str):
+    segment = _child_segments.get(name)
+    if segment is None:
+        # Pool processes share the parent's resource tracker, which already owns the segment
+        segment = shared_memory.SharedMemory(name=name)
+        _child_segments[name] = segment
+    return segment
+
+
+def _run_staged(name: str, nbytes: int, typecode: str, operation: str, params: Optional[dict]):
+    segment = _attach(name)
+    start = time.perf_counter()
+    data = _child_backend.decode(segment.buf[:nbytes], typecode)
+    result = _child_backend.run(operation, data, params)
+    del data
+    return result, time.perf_counter() - start
+
+
+class StagedChunk:
+    """A task payload copied into a shared-memory slot"""
+
+    def __init__(self, segment, nbytes: int, typecode: str):
+        self.segment = segment
+        self.nbytes = nbytes
+        self.typecode = typecode
+
+    def __len__(self):
+        return self.nbytes // array(self.typecode).itemsize
+
+
+class ProcessPoolEngine:
+    """Process pool fed through reusable shared-memory slots"""
+
+    def __init__(self, processes: int, backend_name: Optional[str] = None, min_slot_size: int = 1 << 20):
+        self.processes = processes
+        self.min_slot_size = min_slot_size
+        self.executor = ProcessPoolExecutor(processes, initializer=_init_child, initargs=(backend_name,))
+        self.lock = threading.Lock()
+        self.free_slots = []
+        self.segments = []
+        atexit.register(self.shutdown)
+
+    def decode(self, payload: memoryview, typecode: str) -> StagedChunk:
+        """Protocol decode hook: copy the payload straight into a free slot"""
+        segment = self._acquire(len(payload))
+        segment.buf[:len(payload)] = payload
+        return StagedChunk(segment, len(payload), typecode)
+
+    def stage(self, data) -> StagedChunk:
+        """Stage a decoded sequence (JSON tasks) into a slot"""
+        if not isinstance(data, array):
+            data = array('d' if any(isinstance(v, float) for v in data) else 'q', data)
+        if sys.byteorder != 'little':
+            data = array(data.typecode, data)
+            data.byteswap()
+        return self.decode(memoryview(data).cast('B'), data.typecode)
+
+    def submit(self, chunk: StagedChunk, operation: str, params: Optional[dict], callback):
+        """Run a staged chunk; callback(result, compute_time, error) fires as soon as it completes"""
+        future = self.executor.submit(_run_staged, chunk.segment.name, chunk.nbytes, chunk.typecode, operation, params)
+
+        def done(future):
+            self._release(chunk.segment)
+            try:
+                result, compute_time = future.result()
+            except Exception as e:
+                callback(None, 0.0, e)
+                return
+            callback(result, compute_time, None)
+        future.add_done_callback(done)
+
+    def release(self, chunk: StagedChunk):
+        """Return the slot of a staged chunk that will not be submitted"""
+        self._release(chunk.segment)
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        with self.lock:
+            segments, self.segments, self.free_slots = self.segments, [], []
+        for segment in segments:
+            segment.close()
+            segment.unlink()
+
+    def _acquire(self, nbytes: int):
+        with self.lock:
+            for index, segment in enumerate(self.free_slots):
+                if segment.size >= nbytes:
+                    return self.free_slots.pop(index)
+        segment = shared_memory.SharedMemory(create=True, size=max(nbytes, self.min_slot_size))
+        with self.lock:
+            self.segments.append(segment)
+        return segment
+
+    def _release(self, segment):
+        with self.lock:
+            self.free_slots.append(segment)
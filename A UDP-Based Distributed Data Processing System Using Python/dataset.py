@@ -0,0 +1,120 @@
+import mmap
+import os
+import re
+import sys
+import tempfile
+from array import array
+from typing import Optional
+
+# File-backed datasets for the coordinator.
+#
+# Raw binary files (little-endian int32, int64 or float64) are memory-mapped
+# and sliced into zero-copy memoryviews, so the coordinator never holds more
+# than the chunks currently being encoded. CSV files are parsed once into an
+# anonymous spool file in the same binary layout and mapped the same way.
+
+EXTENSIONS = {'.i32': 'i', '.i64': 'q', '.f64': 'd', '.bin': 'i'}
+DTYPE_NAMES = {'int32': 'i', 'int64': 'q', 'float64': 'd'}
+CSV_EXTENSIONS = ('.csv', '.txt')
+SPOOL_BATCH = 1 << 16  # Values parsed before each write to the spool file
+_FIELD_SEPARATORS = re.compile(rb'[,;\s]+')
+
+
+class MappedDataset:
+    """Read-only typed view of a memory-mapped file"""
+
+    def __init__(self, file, typecode: str, owns_file: bool = False):
+        self.typecode = typecode
+        self.itemsize = array(typecode).itemsize
+        self.file = file
+        self.owns_file = owns_file
+        size = os.fstat(file.fileno()).st_size
+        if size % self.itemsize:
+            raise ValueError(f"File size {size} is not a multiple of the {self.itemsize}-byte element size")
+        self.length = size // self.itemsize
+        self.map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) if size else None
+        self.buffer = memoryview(self.map if size else b'')
+        self.view = self.buffer.cast(typecode)
+
+    def __len__(self):
+        return self.length
+
+    def __getitem__(self, index):
+        if sys.byteorder != 'little' and isinstance(index, slice):
+            data = array(self.typecode, self.view[index])  # The file is little-endian
+            data.byteswap()
+            return data
+        return self.view[index]
+
+    def close(self):
+        try:
+            self.view.release()
+            self.buffer.release()
+            if self.map is not None:
+                self.map.close()
+        except BufferError:
+            return  # A chunk view is still being encoded; the map is freed with its last reference
+        if self.owns_file:
+            self.file.close()
+
+
+def _parse_csv(path: str, typecode: str):
+    """Parse a CSV into an anonymous spool file; returns None if a float shows up in an integer parse"""
+    convert = float if typecode == 'd' else int
+    spool = tempfile.TemporaryFile()
+    batch = array(typecode)
+    with open(path, 'rb') as source:
+        for line_number, line in enumerate(source):
+            fields = [field for field in _FIELD_SEPARATORS.split(line) if field]
+            try:
+                values = [convert(field) for field in fields]
+            except ValueError:
+                if typecode != 'd' and all(_is_number(field) for field in fields):
+                    spool.close()
+                    return None
+                if line_number == 0:
+                    continue  # Header row
+                spool.close()
+                raise ValueError(f"{path}:{line_number + 1}: not a number in {line.strip()[:60]!r}")
+            try:
+                batch.extend(values)
+            except OverflowError:
+                spool.close()
+                raise ValueError(f"{path}:{line_number + 1}: integer out of the int64 range in {line.strip()[:60]!r}")
+            if len(batch) >= SPOOL_BATCH:
+                _spool(spool, batch)
+    _spool(spool, batch)
+    spool.flush()
+    return spool
+
+
+def _is_number(field: bytes) -> bool:
+    try:
+        float(field)
+        return True
+    except ValueError:
+        return False
+
+
+def _spool(spool, batch: array):
+    if sys.byteorder != 'little':
+        batch.byteswap()
+    batch.tofile(spool)
+    del batch[:]
+
+
+def open_dataset(path: str, dtype: Optional[str] = None) -> MappedDataset:
+    """Open a raw binary or CSV dataset; dtype is int32, int64 or float64 (default: from the extension)"""
+    extension = os.path.splitext(path)[1].lower()
+    typecode = DTYPE_NAMES.get(dtype) if dtype else None
+    if dtype and typecode is None:
+        raise ValueError(f"Unknown dtype {dtype}; expected one of {', '.join(DTYPE_NAMES)}")
+    if extension in CSV_EXTENSIONS:
+        spool = _parse_csv(path, typecode or 'q')
+        if spool is None:
+            if typecode:
+                raise ValueError(f"{path} holds floating-point values; use dtype float64")
+            spool = _parse_csv(path, 'd')  # Integers by default, floats once any value needs them
+            typecode = 'd'
+        return MappedDataset(spool, typecode or 'q', owns_file=True)
+    return MappedDataset(open(path, 'rb'), typecode or EXTENSIONS.get(extension, 'i'), owns_file=True)
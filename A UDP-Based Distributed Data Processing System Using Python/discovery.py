@@ -0,0 +1,135 @@
+import json
+import socket
+import struct
+import threading
+import time
+from typing import Optional, Tuple
+import protocol
+
+# Coordinator discovery.
+#
+# A coordinator multicasts a small ANNOUNCE datagram to a well-known group
+# every second; a worker started without a coordinator address listens on the
+# group and registers with the first coordinator it hears, replying to the
+# announcement's source address. Nothing leaves the local network: the TTL
+# keeps announcements on the local subnet, and local_ip() finds this host's
+# LAN address from the routing table and host name instead of probing a public
+# address. Where multicast is filtered, announcements can also be broadcast.
+# A cluster name keeps several coordinators on one network apart.
+
+MCAST_GROUP = '239.255.77.77'  # Administratively scoped: never routed off the site
+MCAST_PORT = 9998
+ANNOUNCE_INTERVAL = 1.0
+
+
+def local_ip(peer: Optional[str] = None) -> str:
+    """This host's LAN address, found without sending anything"""
+    # connect() on a UDP socket only asks the routing table which interface would be used
+    for target in ([peer] if peer else []) + [MCAST_GROUP]:
+        try:
+            with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as s:
+                s.connect((target, MCAST_PORT))
+                ip = s.getsockname()[0]
+            if ip != '0.0.0.0':
+                return ip
+        except OSError:
+            continue  # No route, e.g. an air-gapped host without a default route
+    try:
+        for ip in socket.gethostbyname_ex(socket.gethostname())[2]:
+            if not ip.startswith('127.'):
+                return ip
+    except OSError:
+        pass
+    return '127.0.0.1'
+
+
+def announce_message(port: int, cluster: Optional[str] = None) -> bytes:
+    return json.dumps({'type': 'ANNOUNCE', 'wire_version': protocol.WIRE_VERSION, 'port': port,
+                       'cluster': cluster}).encode('utf-8')
+
+
+def parse_announce(data: bytes) -> Optional[dict]:
+    """The announcement in a datagram, or None if it is not one we can use"""
+    try:
+        message = json.loads(data)
+    except ValueError:
+        return None
+    if not isinstance(message, dict) or message.get('type') != 'ANNOUNCE':
+        return None
+    if message.get('wire_version') != protocol.WIRE_VERSION or not isinstance(message.get('port'), int):
+        return None
+    return message
+
+
+class Announcer:
+    """Announces a coordinator from a daemon thread until stopped"""
+
+    def __init__(self, port: int, host: Optional[str] = None, cluster: Optional[str] = None,
+                 interval: float = ANNOUNCE_INTERVAL, group: str = MCAST_GROUP, mcast_port: int = MCAST_PORT,
+                 ttl: int = 1, broadcast: bool = False):
+        self.message = announce_message(port, cluster)
+        self.interval = interval
+        self.targets = [(group, mcast_port)] + ([('<broadcast>', mcast_port)] if broadcast else [])
+        self.stopped = threading.Event()
+        self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        try:
+            self.socket.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_TTL, ttl)
+            self.socket.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_LOOP, 1)  # Workers on this host hear it too
+            if broadcast:
+                self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
+            if host and host != '0.0.0.0':
+                # Announce from the interface the coordinator serves, so replies come back to it
+                self.socket.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_IF, socket.inet_aton(host))
+                self.socket.bind((host, 0))
+            self.announce()  # Fail now rather than silently in the thread
+        except OSError:
+            self.socket.close()
+            raise
+        threading.Thread(target=self.run, daemon=True).start()
+
+    def announce(self):
+        for target in self.targets:
+            self.socket.sendto(self.message, target)
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            try:
+                self.announce()
+            except OSError:
+                pass  # Interface down for a moment; try again next interval
+
+    def stop(self):
+        self.stopped.set()
+        self.socket.close()
+
+
+def discover(timeout: float = 30.0, cluster: Optional[str] = None, group: str = MCAST_GROUP,
+             mcast_port: int = MCAST_PORT) -> Optional[Tuple[str, int]]:
+    """Wait for a coordinator's announcement; returns its address, or None after timeout seconds"""
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    with sock:
+        # Several workers on one host listen on the same port
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        if hasattr(socket, 'SO_REUSEPORT'):
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+        sock.bind(('', mcast_port))
+        for interface in ('0.0.0.0', local_ip()):
+            try:
+                membership = struct.pack('4s4s', socket.inet_aton(group), socket.inet_aton(interface))
+                sock.setsockopt(socket.IPPROTO_IP, socket.IP_ADD_MEMBERSHIP, membership)
+                break
+            except OSError:
+                continue  # Without a multicast route, name the interface (or rely on broadcasts)
+        deadline = time.time() + timeout
+        while True:
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                return None
+            sock.settimeout(remaining)
+            try:
+                data, addr = sock.recvfrom(2048)
+            except socket.timeout:
+                return None
+            message = parse_announce(data)
+            if message is not None and (cluster is None or message.get('cluster') == cluster):
+                return addr[0], message['port']
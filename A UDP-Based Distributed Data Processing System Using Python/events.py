@@ -0,0 +1,229 @@
+import logging
+import queue
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# Event sinks decouple the coordinator and the workers from any UI.
+#
+# DataCoordinator and Worker report everything through a sink from their
+# network threads. EventSink drops events, LogSink writes them to `logging`
+# for headless daemons, and QueueSink hands them to a Tk GUI through a queue
+# that the Tk thread drains, so the network path never waits on a widget.
+# QueueSink is a UIPump, the once-per-frame queue drain that the lab servers'
+# GUIs use as well.
+
+EVENTS = ('log_message', 'update_workers', 'update_task_progress', 'add_result', 'clear_results',
+          'update_final_result', 'update_running_totals', 'update_status', 'add_task')
+
+logger = logging.getLogger('dataproc')
+
+
+class EventSink:
+    """Sink that ignores every event"""
+
+    def log_message(self, message: str):
+        pass
+
+    def update_workers(self, workers: List[Tuple[str, int]]):
+        pass
+
+    def update_task_progress(self, *args):
+        pass
+
+    def add_result(self, chunk_id: int, result: dict, *args):
+        pass
+
+    def clear_results(self):
+        pass
+
+    def update_final_result(self, result: dict):
+        pass
+
+    def update_running_totals(self, stats: dict):
+        pass
+
+    def update_status(self, status: str):
+        pass
+
+    def add_task(self, task_id: int, data_size: int):
+        pass
+
+
+class LogSink(EventSink):
+    """Sink for headless runs: status to `logging`, per-task chatter at DEBUG"""
+
+    def __init__(self):
+        self.final_result: Optional[Dict[str, Any]] = None
+        self.finished = threading.Event()  # Set once a job's final result arrives
+
+    def log_message(self, message: str):
+        if message.startswith(('Task ', 'Received task', 'Sent result', 'Sent heartbeat', 'Heartbeat from')):
+            logger.debug(message)
+        else:
+            logger.info(message)
+
+    def update_workers(self, workers):
+        logger.info("Workers: %s", ', '.join(f'{host}:{port}' for host, port in workers) or 'none')
+
+    def update_status(self, status):
+        logger.info("Status: %s", status)
+
+    def update_running_totals(self, stats):
+        eta = f"{stats['eta']:.1f} s" if stats['eta'] is not None else "-"
+        logger.info("Job %s: %s/%s elements, %.0f elements/s, ETA %s", stats.get('job_id', '-'), f"{stats['processed']:,}",
+                    f"{stats['total']:,}", stats['throughput'], eta)
+
+    def update_final_result(self, result):
+        self.final_result = result
+        logger.info("Job %s final result (%s, %s elements in %.2f s): %s", result.get('job_id', '-'), result['operation'],
+                    f"{result['total_count']:,}", result['processing_time'], result['result'])
+        self.finished.set()
+
+    def clear_results(self):
+        self.final_result = None
+        self.finished.clear()
+
+
+class UIPump:
+    """Collects UI updates from any thread and renders them once per frame on the Tk thread.
+
+    Items posted under one kind reach that kind's renderer as one list per
+    frame. A renderer that raises is reported through on_error (the module
+    logger by default) once, until it renders successfully again."""
+
+    def __init__(self, interval: int = 50, on_error: Optional[Callable[[str], None]] = None):
+        self.interval = interval  # Milliseconds between frames
+        self.on_error = on_error
+        self.queue = queue.SimpleQueue()
+        self.renderers: Dict[str, Callable[[list], None]] = {}
+        self.failing = set()  # Kinds whose last render failed
+
+    def register(self, kind: str, renderer: Callable[[list], None]):
+        self.renderers[kind] = renderer
+
+    def post(self, kind: str, item=None):
+        self.queue.put((kind, item))
+
+    def drain(self):
+        """Render everything queued as one frame (Tk thread only)"""
+        batches: Dict[str, list] = {}
+        while True:
+            try:
+                kind, item = self.queue.get_nowait()
+            except queue.Empty:
+                break
+            batches.setdefault(kind, []).append(item)
+        for kind, items in batches.items():
+            try:
+                self.renderers[kind](items)
+            except Exception as e:
+                if kind not in self.failing:  # A broken log renderer must not report into itself every frame
+                    self.failing.add(kind)
+                    self.report(kind, e)
+            else:
+                self.failing.discard(kind)
+
+    def report(self, kind: str, error: Exception):
+        if self.on_error is None:
+            logger.exception("UI update %s failed: %s", kind, error)
+        else:
+            self.on_error(f"UI update {kind} failed: {error}")
+
+    def start(self, root):
+        """Render the first frame after one interval"""
+        root.after(self.interval, self.pump, root)
+
+    def pump(self, root):
+        """Drain now and reschedule on the Tk event loop"""
+        self.drain()
+        root.after(self.interval, self.pump, root)
+
+
+class QueueSink(EventSink, UIPump):
+    """Forwards events to a GUI object; call pump() once from the Tk thread.
+
+    Each drain renders one frame: log lines and result rows are handed over
+    in batches (log_lines/add_results when the target has them), and state
+    updates such as progress keep only their latest value (per job for
+    running totals)."""
+
+    BATCHED = {'log_message': 'log_lines', 'add_result': 'add_results', 'add_task': 'add_tasks'}
+    LATEST = ('update_workers', 'update_task_progress', 'update_running_totals', 'update_status')
+
+    def __init__(self, target, interval: int = 50, max_events: int = 50000):
+        super().__init__(interval)
+        self.target = target
+        self.max_events = max_events  # Events drained per frame; the rest wait for the next one
+
+    def log_message(self, message: str):
+        # Stamped when it happens, not when the frame renders
+        self.queue.put(('log_message', (f"{time.strftime('%H:%M:%S')}: {message}",)))
+
+    def drain(self):
+        """Deliver queued events to the target as one frame (Tk thread only)"""
+        batches: Dict[str, list] = {}
+        latest: Dict[tuple, tuple] = {}
+        for _ in range(self.max_events):
+            try:
+                name, args = self.queue.get_nowait()
+            except queue.Empty:
+                break
+            if name in self.BATCHED:
+                batches.setdefault(name, []).append(args)
+            elif name in self.LATEST:
+                key = (name, args[0].get('job_id') if args and isinstance(args[0], dict) else None)
+                latest.pop(key, None)
+                latest[key] = args
+            else:
+                # Barrier events (clear_results, final results) apply in order
+                self._flush(batches, latest)
+                self._deliver(name, args)
+        self._flush(batches, latest)
+
+    def _flush(self, batches: Dict[str, list], latest: Dict[tuple, tuple]):
+        for name, batch_name in self.BATCHED.items():  # Tasks before the results that complete them
+            items = batches.get(name)
+            if not items:
+                continue
+            if hasattr(self.target, batch_name):
+                self._deliver(batch_name, ([args[0] for args in items] if name == 'log_message' else items,))
+            else:
+                for args in items:
+                    self._deliver(name, args)
+        for (name, _), args in latest.items():
+            self._deliver(name, args)
+        batches.clear()
+        latest.clear()
+
+    def _deliver(self, name: str, args: tuple):
+        try:
+            getattr(self.target, name)(*args)
+        except Exception as e:
+            self.report(name, e)
+
+
+def append_lines(widget, lines: List[str], max_lines: int):
+    """Append lines to a text widget in one insert, keeping only the last max_lines"""
+    if not lines:
+        return
+    lines = lines[-max_lines:]
+    widget.configure(state="normal")
+    widget.insert("end", "\n".join(lines) + "\n")
+    excess = int(widget.index("end-1c").split(".")[0]) - 1 - max_lines
+    if excess > 0:
+        widget.delete("1.0", f"{excess + 1}.0")
+    widget.see("end")
+    widget.configure(state="disabled")
+
+
+def _forwarder(name: str):
+    def forward(self, *args):
+        self.queue.put((name, args))
+    forward.__name__ = name
+    return forward
+
+
+for _name in EVENTS:
+    if _name not in QueueSink.__dict__:
+        setattr(QueueSink, _name, _forwarder(_name))
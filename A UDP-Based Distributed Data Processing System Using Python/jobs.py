@@ -0,0 +1,123 @@
+import threading
+import time
+from array import array
+from collections import deque
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import dataset
+
+# Jobs submitted to the coordinator.
+#
+# A job owns its dataset, its chunk ids, the tasks in flight for it and its
+# running accumulator, so several jobs can share one worker pool without
+# touching each other's state. TASK and RESULT messages carry the job id next
+# to the chunk id. The coordinator decides which job feeds each free worker
+# credit: higher priority first, then the job with the fewest elements in
+# flight (fair share), then the oldest.
+
+
+class Job:
+    """A dataset and an operation being processed by the worker pool"""
+
+    def __init__(self, job_id: int, operation: str, params: Optional[Dict[str, Any]] = None, priority: int = 0):
+        self.job_id = job_id
+        self.operation = operation
+        self.params = dict(params or {})
+        self.priority = priority
+        self.dataset = memoryview(array('i'))  # Sliced into zero-copy chunk views
+        self.typecode = 'i'
+        self.cursor = 0  # Start of the part of the dataset not yet carved into chunks
+        self.chunks: Dict[int, Tuple[int, int]] = {}  # chunk_id -> (offset, length)
+        self.task_queue = deque()  # (chunk_id, worker it last timed out on)
+        self.pending_tasks: Dict[int, dict] = {}  # chunk_id -> copies in flight, size and attempts
+        self.chunk_keys: Dict[int, str] = {}  # chunk_id -> result cache key, for chunks the cache missed
+        self.task_counter = 0
+        self.inflight_elements = 0  # Elements currently on workers, for fair sharing
+        self.accumulator: Optional[dict] = None  # Running merge of every completed chunk's partial
+        self.completed_count = 0
+        self.completed_elements = 0
+        self.retransmits = 0
+        self.cache_hits = 0  # Chunks folded from the result cache instead of dispatched
+        self.source: Optional[Dict[str, Any]] = None  # Where the dataset came from, recorded in checkpoints
+        self.checkpoint = None  # JobCheckpoint logging progress, if the job is resumable
+        self.unlogged_spans: List[Tuple[int, int]] = []  # Spans completed since the last checkpoint record
+        self.skipped = deque()  # Spans a previous run completed, not to be carved again
+        self.start = 0.0  # When the job was admitted to the worker pool
+        self.summary: Optional[dict] = None
+        self.error: Optional[str] = None
+        self.done = threading.Event()
+        self.callbacks: List[Callable[['Job'], None]] = []  # Called once the job finishes or fails
+        self.callback_lock = threading.Lock()
+
+    def load(self, data):
+        """Install the dataset: an array or a MappedDataset"""
+        self.dataset = memoryview(data) if isinstance(data, array) else data
+        self.typecode = data.typecode
+
+    def resume(self, spans: List[Tuple[int, int]], accumulator: Optional[dict], completed_count: int):
+        """Start from a checkpoint: skip the spans it completed and continue its accumulator"""
+        self.skipped = deque(sorted(spans))
+        self.accumulator = accumulator
+        self.completed_count = completed_count
+        self.completed_elements = sum(length for _, length in spans)
+        self.skip_completed()
+
+    def skip_completed(self):
+        while self.skipped and self.skipped[0][0] <= self.cursor:
+            offset, length = self.skipped.popleft()
+            self.cursor = max(self.cursor, offset + length)
+
+    def has_unassigned(self) -> bool:
+        """Chunks waiting for a worker, requeued or not yet carved"""
+        return bool(self.task_queue) or self.cursor < len(self.dataset)
+
+    def outstanding(self) -> int:
+        return len(self.pending_tasks) + len(self.task_queue) + (self.cursor < len(self.dataset))
+
+    def unqueue(self, chunk_id: int):
+        """Drop a chunk that completed while it was waiting to be reassigned"""
+        self.task_queue = deque(entry for entry in self.task_queue if entry[0] != chunk_id)
+
+    def split(self, length: int) -> int:
+        """Carve the next `length` elements into a chunk"""
+        if self.skipped:
+            length = min(length, self.skipped[0][0] - self.cursor)  # Chunks stop where completed spans begin
+        chunk_id = self.task_counter
+        self.task_counter += 1
+        self.chunks[chunk_id] = (self.cursor, length)
+        self.cursor += length
+        self.skip_completed()
+        return chunk_id
+
+    def chunk_data(self, chunk_id: int) -> memoryview:
+        """Zero-copy view of a chunk; only the datagram encoder copies the bytes"""
+        offset, length = self.chunks[chunk_id]
+        return self.dataset[offset:offset + length]
+
+    def finish(self, summary: Optional[dict] = None, error: Optional[str] = None):
+        """Record the outcome, release the dataset and wake join()"""
+        self.summary = summary
+        self.error = error
+        if isinstance(self.dataset, dataset.MappedDataset):
+            self.dataset.close()
+        if self.checkpoint is not None:
+            self.checkpoint.close()  # A failed job keeps its log for the next attempt
+        with self.callback_lock:
+            self.done.set()
+            callbacks, self.callbacks = self.callbacks, []
+        for callback in callbacks:
+            callback(self)
+
+    def add_done_callback(self, callback: Callable[['Job'], None]):
+        """Call callback(job) when the job finishes or fails (now, if it already has)"""
+        with self.callback_lock:
+            if not self.done.is_set():
+                self.callbacks.append(callback)
+                return
+        callback(self)
+
+    def join(self, timeout: Optional[float] = None) -> bool:
+        """Wait for the job to finish or fail"""
+        return self.done.wait(timeout)
+
+    def elapsed(self) -> float:
+        return time.time() - self.start if self.start else 0.0
@@ -0,0 +1,48 @@
+import math
+from collections import deque
+from typing import Optional
+
+# Failure detection for workers.
+#
+# Each worker gets a phi-accrual detector (Hayashibara et al.): instead of a
+# fixed "missed N heartbeats" rule it learns the distribution of the worker's
+# heartbeat intervals and reports phi = -log10(P(a heartbeat is still coming)).
+# phi grows continuously with silence, so the coordinator can stop assigning
+# work at a low threshold (suspect) and evict at a high one (dead), and slow
+# or jittery links automatically get more slack than quiet, regular ones.
+
+
+class PhiAccrualDetector:
+    """Suspicion level for one peer from the history of its heartbeat intervals"""
+
+    def __init__(self, expected_interval: float = 5.0, window: int = 100, min_std: float = 0.2,
+                 acceptable_pause: float = 1.0):
+        self.expected_interval = expected_interval  # Used until a couple of intervals are sampled
+        self.min_std = min_std
+        self.acceptable_pause = acceptable_pause  # Silence tolerated before phi starts to rise (GC, busy GIL)
+        self.intervals = deque(maxlen=window)
+        self.last_heartbeat: Optional[float] = None
+
+    def heartbeat(self, now: float):
+        """Record a heartbeat arrival"""
+        if self.last_heartbeat is not None:
+            self.intervals.append(now - self.last_heartbeat)
+        self.last_heartbeat = now
+
+    def stats(self):
+        """Mean and standard deviation of the heartbeat interval"""
+        if len(self.intervals) < 2:
+            return self.expected_interval, self.expected_interval / 4
+        mean = sum(self.intervals) / len(self.intervals)
+        variance = sum((interval - mean) ** 2 for interval in self.intervals) / len(self.intervals)
+        return mean, max(math.sqrt(variance), self.min_std)
+
+    def phi(self, now: float, last_seen: float) -> float:
+        """Suspicion that the peer is down, given the last time anything was heard from it"""
+        mean, std = self.stats()
+        elapsed = max(0.0, now - last_seen - self.acceptable_pause)
+        y = (elapsed - mean) / std
+        # Logistic approximation of the normal CDF (as used by Akka and Cassandra)
+        e = math.exp(min(700.0, -y * (1.5976 + 0.070566 * y * y)))
+        p = e / (1.0 + e) if elapsed > mean else 1.0 - 1.0 / (1.0 + e)
+        return -math.log10(p) if p > 0 else float('inf')
@@ -0,0 +1,184 @@
+import json
+import threading
+from bisect import bisect_left
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List, Optional, Tuple
+
+# Coordinator instrumentation.
+#
+# Metrics holds counters and fixed-bucket histograms that the coordinator
+# updates as tasks flow, plus collectors that read gauges (queue depths,
+# per-worker throughput, ...) straight from coordinator state when someone
+# looks. Everything can be rendered as Prometheus text exposition or as a
+# JSON document; MetricsServer serves both over HTTP:
+#   GET /metrics       Prometheus text format
+#   GET /metrics.json  the same samples, plus histogram quantiles, as JSON
+
+PREFIX = 'dataproc_'
+LATENCY_BUCKETS = tuple(0.0001 * 2 ** i for i in range(19))  # 0.1 ms .. ~26 s
+
+# A collected family: (name, 'counter' or 'gauge', help, [(labels, value), ...])
+Family = Tuple[str, str, str, List[Tuple[Dict[str, str], float]]]
+
+
+class Histogram:
+    """Cumulative-bucket histogram with approximate quantiles"""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self.counts = [0] * (len(self.buckets) + 1)  # Last slot is +Inf
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Estimate a quantile by interpolating inside its bucket"""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            if seen + count >= rank and count:
+                low = self.buckets[index - 1] if index else 0.0
+                high = self.buckets[index] if index < len(self.buckets) else self.buckets[-1]
+                return low + (high - low) * (rank - seen) / count
+            seen += count
+        return self.buckets[-1]
+
+    def snapshot(self) -> dict:
+        cumulative = 0
+        buckets = []
+        for bound, count in zip(self.buckets + (float('inf'),), self.counts):
+            cumulative += count
+            buckets.append([bound if bound != float('inf') else '+Inf', cumulative])
+        return {'count': self.count, 'sum': self.sum, 'p50': self.quantile(0.5), 'p90': self.quantile(0.9),
+                'p99': self.quantile(0.99), 'buckets': buckets}
+
+
+class Metrics:
+    """Counters, histograms and gauge collectors for one coordinator"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.help: Dict[str, str] = {}
+        self.counters: Dict[str, Dict[Tuple, float]] = {}  # name -> label items -> value
+        self.histograms: Dict[str, Histogram] = {}
+        self.collectors: List[Callable[[], List[Family]]] = []
+
+    def counter(self, name: str, help_text: str):
+        self.help[name] = help_text
+        self.counters.setdefault(name, {})
+
+    def histogram(self, name: str, help_text: str, buckets=LATENCY_BUCKETS):
+        self.help[name] = help_text
+        self.histograms.setdefault(name, Histogram(buckets))
+
+    def inc(self, name: str, amount: float = 1, **labels):
+        key = tuple(sorted(labels.items()))
+        with self.lock:
+            series = self.counters[name]
+            series[key] = series.get(key, 0) + amount
+
+    def observe(self, name: str, value: float):
+        with self.lock:
+            self.histograms[name].observe(value)
+
+    def add_collector(self, collector: Callable[[], List[Family]]):
+        """Register a callable returning gauge/counter families computed at scrape time"""
+        self.collectors.append(collector)
+
+    def families(self) -> List[Family]:
+        with self.lock:
+            families = [(name, 'counter', self.help[name], [(dict(key), value) for key, value in series.items()] or [({}, 0)])
+                        for name, series in self.counters.items()]
+        for collector in self.collectors:
+            families.extend(collector())
+        return families
+
+    def to_prometheus(self) -> str:
+        lines = []
+        for name, kind, help_text, samples in self.families():
+            lines.append(f"# HELP {PREFIX}{name} {help_text}")
+            lines.append(f"# TYPE {PREFIX}{name} {kind}")
+            for labels, value in samples:
+                lines.append(f"{PREFIX}{name}{_labels(labels)} {_number(value)}")
+        with self.lock:
+            histograms = {name: histogram.snapshot() for name, histogram in self.histograms.items()}
+        for name, snapshot in histograms.items():
+            lines.append(f"# HELP {PREFIX}{name} {self.help[name]}")
+            lines.append(f"# TYPE {PREFIX}{name} histogram")
+            for bound, count in snapshot['buckets']:
+                lines.append(f"{PREFIX}{name}_bucket{_labels({'le': bound})} {count}")
+            lines.append(f"{PREFIX}{name}_sum {_number(snapshot['sum'])}")
+            lines.append(f"{PREFIX}{name}_count {snapshot['count']}")
+        return "\n".join(lines) + "\n"
+
+    def to_dict(self) -> dict:
+        metrics = {}
+        for name, kind, _, samples in self.families():
+            if len(samples) == 1 and not samples[0][0]:
+                metrics[name] = samples[0][1]
+            else:
+                metrics[name] = [dict(labels, value=value) for labels, value in samples]
+        with self.lock:
+            for name, histogram in self.histograms.items():
+                metrics[name] = histogram.snapshot()
+        return metrics
+
+    def dump(self, path: str):
+        """Write the JSON document to a file"""
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.to_dict(), f, indent=1)
+
+
+def _labels(labels: Dict[str, object]) -> str:
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{key}="{_escape(value)}"' for key, value in labels.items()) + '}'
+
+
+def _escape(value: object) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _number(value: float) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class MetricsServer:
+    """Serves a Metrics registry over HTTP from a daemon thread"""
+
+    def __init__(self, metrics: Metrics, host: str = '127.0.0.1', port: int = 9100):
+        registry = metrics
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                path = self.path.split('?', 1)[0]
+                if path == '/metrics':
+                    body, content_type = registry.to_prometheus().encode('utf-8'), 'text/plain; version=0.0.4'
+                elif path == '/metrics.json':
+                    body, content_type = json.dumps(registry.to_dict()).encode('utf-8'), 'application/json'
+                else:
+                    self.send_error(404)
+                    return
+                self.send_response(200)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass  # Scrapes are not worth a log line
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+        self.address = self.server.server_address
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
@@ -0,0 +1,384 @@
+import heapq
+import math
+import struct
+from typing import Dict, List, Optional
+
+try:
+    import numpy as np
+except ImportError:  # Every operation has a pure-Python path
+    np = None
+
+# Operation registry shared by the coordinator and the workers.
+#
+# An operation turns a chunk into a small, JSON-serializable partial state
+# (map), combines two partials (merge) and turns the merged partial into the
+# final answer (finalize). Only partials cross the wire, so RESULT datagrams
+# stay small no matter how large the chunks are. Every partial carries
+# 'count' so the coordinator can report throughput for any operation.
+
+BLOCK_SIZE = 1 << 16  # Elements per block; keeps each block cache-resident across reductions
+_MASK64 = (1 << 64) - 1
+
+
+def _vectorized(data) -> bool:
+    return np is not None and isinstance(data, np.ndarray)
+
+
+def _check_number(name: str, value, low: float, high: float):
+    """Raise ValueError unless value is a number in [low, high]"""
+    if isinstance(value, bool) or not isinstance(value, (int, float)) or not low <= value <= high:
+        raise ValueError(f"{name} must be a number from {low} to {high}, not {value!r}")
+
+
+def _check_integer(name: str, value, low: int, high: int):
+    """Raise ValueError unless value is an integer in [low, high]"""
+    if isinstance(value, bool) or not isinstance(value, int) or not low <= value <= high:
+        raise ValueError(f"{name} must be an integer from {low} to {high}, not {value!r}")
+
+
+class Operation:
+    name = ''
+    defaults: Dict = {}
+
+    def params(self, params: Optional[dict]) -> dict:
+        """Parameters with defaults filled in; raises ValueError for ones the operation cannot run with"""
+        if params is not None and not isinstance(params, dict):
+            raise ValueError(f"{self.name} parameters must be an object, not {params!r}")
+        params = dict(self.defaults, **(params or {}))
+        self.validate(params)
+        return params
+
+    def validate(self, params: dict):
+        pass
+
+    def map(self, data, params: dict) -> dict:
+        raise NotImplementedError
+
+    def merge(self, a: dict, b: dict) -> dict:
+        raise NotImplementedError
+
+    def finalize(self, partial: dict, params: dict) -> dict:
+        return partial
+
+
+class SumAndStats(Operation):
+    """Sum, count, min and max"""
+    name = 'sum_and_stats'
+
+    def map(self, data, params):
+        if not len(data):
+            return {'sum': 0, 'count': 0, 'min': 0, 'max': 0}
+        if not _vectorized(data):
+            return {'sum': sum(data), 'count': len(data), 'min': min(data), 'max': max(data)}
+        accumulator = np.int64 if data.dtype.kind in 'iu' else np.float64
+        total = accumulator(0)
+        low, high = data[0], data[0]
+        # Block-wise so sum, min and max read each block while it is still in cache
+        for start in range(0, data.size, BLOCK_SIZE):
+            block = data[start:start + BLOCK_SIZE]
+            total += block.sum(dtype=accumulator)
+            low = min(low, block.min())
+            high = max(high, block.max())
+        return {'sum': total.item(), 'count': int(data.size), 'min': low.item(), 'max': high.item()}
+
+    def merge(self, a, b):
+        if not a['count']:
+            return b
+        if not b['count']:
+            return a
+        return {
+            'sum': a['sum'] + b['sum'],
+            'count': a['count'] + b['count'],
+            'min': min(a['min'], b['min']),
+            'max': max(a['max'], b['max'])
+        }
+
+    def finalize(self, partial, params):
+        return dict(partial, average=partial['sum'] / partial['count'] if partial['count'] else 0)
+
+
+class Histogram(Operation):
+    """Fixed-width histogram; sparse bins so chunks need not agree on a range"""
+    name = 'histogram'
+    defaults = {'width': 50}
+
+    def validate(self, params):
+        width = params['width']
+        if isinstance(width, bool) or not isinstance(width, (int, float)) or not 0 < width < math.inf:
+            raise ValueError(f"width must be a positive number, not {width!r}")
+
+    def map(self, data, params):
+        width = params['width']
+        if _vectorized(data):
+            bins, counts = np.unique(np.floor_divide(data, width).astype(np.int64), return_counts=True)
+            histogram = {str(b): int(c) for b, c in zip(bins.tolist(), counts.tolist())}
+        else:
+            histogram = {}
+            for value in data:
+                key = str(int(value // width))
+                histogram[key] = histogram.get(key, 0) + 1
+        return {'width': width, 'bins': histogram, 'count': len(data)}
+
+    def merge(self, a, b):
+        bins = dict(a['bins'])
+        for key, count in b['bins'].items():
+            bins[key] = bins.get(key, 0) + count
+        return {'width': a['width'], 'bins': bins, 'count': a['count'] + b['count']}
+
+    def finalize(self, partial, params):
+        width = partial['width']
+        bins = sorted((int(key), count) for key, count in partial['bins'].items())
+        return {
+            'count': partial['count'],
+            'histogram': [{'low': key * width, 'high': (key + 1) * width, 'count': count} for key, count in bins]
+        }
+
+
+class Variance(Operation):
+    """Mean, variance and standard deviation (Welford per chunk, Chan et al. to merge)"""
+    name = 'variance'
+
+    def map(self, data, params):
+        if not len(data):
+            return {'count': 0, 'mean': 0.0, 'm2': 0.0}
+        if _vectorized(data):
+            mean = float(data.mean(dtype=np.float64))
+            deviations = data - mean
+            return {'count': int(data.size), 'mean': mean, 'm2': float(np.dot(deviations, deviations))}
+        count, mean, m2 = 0, 0.0, 0.0
+        for value in data:
+            count += 1
+            delta = value - mean
+            mean += delta / count
+            m2 += delta * (value - mean)
+        return {'count': count, 'mean': mean, 'm2': m2}
+
+    def merge(self, a, b):
+        if not a['count']:
+            return b
+        if not b['count']:
+            return a
+        count = a['count'] + b['count']
+        delta = b['mean'] - a['mean']
+        return {
+            'count': count,
+            'mean': a['mean'] + delta * b['count'] / count,
+            'm2': a['m2'] + b['m2'] + delta * delta * a['count'] * b['count'] / count
+        }
+
+    def finalize(self, partial, params):
+        count = partial['count']
+        variance = partial['m2'] / count if count else 0.0
+        return {
+            'count': count,
+            'mean': partial['mean'],
+            'variance': variance,
+            'sample_variance': partial['m2'] / (count - 1) if count > 1 else 0.0,
+            'stddev': math.sqrt(variance)
+        }
+
+
+class TopK(Operation):
+    """The k largest values"""
+    name = 'top_k'
+    defaults = {'k': 10}
+    MAX_K = 1 << 16  # The values travel back in one RESULT
+
+    def validate(self, params):
+        _check_integer('k', params['k'], 1, self.MAX_K)
+
+    def map(self, data, params):
+        k = params['k']
+        if _vectorized(data):
+            top = np.partition(data, data.size - k)[data.size - k:] if data.size > k else data
+            values = np.sort(top)[::-1].tolist()
+        else:
+            values = heapq.nlargest(k, data)
+        return {'k': k, 'values': values, 'count': len(data)}
+
+    def merge(self, a, b):
+        return {'k': a['k'], 'values': heapq.nlargest(a['k'], a['values'] + b['values']), 'count': a['count'] + b['count']}
+
+
+class Quantiles(Operation):
+    """Approximate quantiles from a merging t-digest"""
+    name = 'quantiles'
+    defaults = {'compression': 100, 'quantiles': [0.01, 0.25, 0.5, 0.75, 0.99]}
+
+    @staticmethod
+    def _scale(q, compression):
+        # k1 scale function: small clusters near the tails, large ones in the middle
+        return compression / (2 * math.pi) * math.asin(2 * q - 1)
+
+    def validate(self, params):
+        _check_number('compression', params['compression'], 1, 100000)
+        quantiles = params['quantiles']
+        if not isinstance(quantiles, list):
+            raise ValueError(f"quantiles must be a list, not {quantiles!r}")
+        for q in quantiles:
+            _check_number('quantile', q, 0, 1)
+
+    def map(self, data, params):
+        compression = params['compression']
+        n = len(data)
+        if not n:
+            return {'compression': compression, 'centroids': [], 'count': 0, 'min': None, 'max': None}
+        k0 = self._scale(0, compression)
+        if _vectorized(data):
+            values = np.sort(data, kind='stable').astype(np.float64)
+            q = (np.arange(n) + 0.5) / n
+            cluster = np.floor(compression / (2 * math.pi) * np.arcsin(2 * q - 1) - k0).astype(np.int64)
+            starts = np.concatenate(([0], np.flatnonzero(np.diff(cluster)) + 1))
+            weights = np.diff(np.concatenate((starts, [n])))
+            means = np.add.reduceat(values, starts) / weights
+            centroids = [[m, int(w)] for m, w in zip(means.tolist(), weights.tolist())]
+            low, high = values[0].item(), values[-1].item()
+        else:
+            values = sorted(data)
+            centroids = []
+            current = None
+            for i, value in enumerate(values):
+                cluster = math.floor(self._scale((i + 0.5) / n, compression) - k0)
+                if centroids and cluster == current:
+                    mean, weight = centroids[-1]
+                    centroids[-1] = [mean + (value - mean) / (weight + 1), weight + 1]
+                else:
+                    centroids.append([float(value), 1])
+                    current = cluster
+            low, high = values[0], values[-1]
+        return {'compression': compression, 'centroids': centroids, 'count': n, 'min': low, 'max': high}
+
+    def merge(self, a, b):
+        if not a['count']:
+            return b
+        if not b['count']:
+            return a
+        compression = a['compression']
+        total = a['count'] + b['count']
+        merged = []
+        cumulative = 0
+        limit_q = None
+        for mean, weight in sorted(a['centroids'] + b['centroids']):
+            if merged and self._scale((cumulative + weight) / total, compression) - limit_q <= 1:
+                last_mean, last_weight = merged[-1]
+                new_weight = last_weight + weight
+                merged[-1] = [last_mean + (mean - last_mean) * weight / new_weight, new_weight]
+            else:
+                limit_q = self._scale(cumulative / total, compression)
+                merged.append([mean, weight])
+            cumulative += weight
+        return {
+            'compression': compression,
+            'centroids': merged,
+            'count': total,
+            'min': min(a['min'], b['min']),
+            'max': max(a['max'], b['max'])
+        }
+
+    def quantile(self, partial, q: float) -> float:
+        centroids = partial['centroids']
+        total = partial['count']
+        if len(centroids) == 1:
+            return centroids[0][0]
+        target = q * total
+        cumulative = 0.0
+        previous_center, previous_mean = 0.0, partial['min']
+        for mean, weight in centroids:
+            center = cumulative + weight / 2
+            if target < center:
+                span = center - previous_center
+                fraction = (target - previous_center) / span if span else 0.0
+                return previous_mean + fraction * (mean - previous_mean)
+            previous_center, previous_mean = center, mean
+            cumulative += weight
+        span = total - previous_center
+        fraction = (target - previous_center) / span if span else 1.0
+        return previous_mean + fraction * (partial['max'] - previous_mean)
+
+    def finalize(self, partial, params):
+        if not partial['count']:
+            return {'count': 0, 'quantiles': {}}
+        return {
+            'count': partial['count'],
+            'min': partial['min'],
+            'max': partial['max'],
+            'quantiles': {str(q): self.quantile(partial, q) for q in params['quantiles']}
+        }
+
+
+class DistinctCount(Operation):
+    """Approximate distinct count with HyperLogLog"""
+    name = 'distinct'
+    defaults = {'precision': 12}
+
+    def validate(self, params):
+        _check_integer('precision', params['precision'], 4, 16)
+
+    @staticmethod
+    def _mix(x: int) -> int:
+        # splitmix64 finalizer
+        x = (x + 0x9E3779B97F4A7C15) & _MASK64
+        x = ((x ^ (x >> 30)) * 0xBF58476D1CE4E5B9) & _MASK64
+        x = ((x ^ (x >> 27)) * 0x94D049BB133111EB) & _MASK64
+        return x ^ (x >> 31)
+
+    def map(self, data, params):
+        p = params['precision']
+        m = 1 << p
+        rest_bits = 64 - p
+        if _vectorized(data):
+            if data.dtype.kind == 'f':
+                keys = data.astype(np.float64).view(np.uint64)
+            else:
+                keys = data.astype(np.int64).view(np.uint64)
+            with np.errstate(over='ignore'):
+                x = keys + np.uint64(0x9E3779B97F4A7C15)
+                x = (x ^ (x >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+                x = (x ^ (x >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+                x = x ^ (x >> np.uint64(31))
+            index = (x >> np.uint64(rest_bits)).astype(np.int64)
+            rest = x & np.uint64((1 << rest_bits) - 1)
+            # bit_length via frexp, a 32-bit half at a time so each converts to float64 exactly
+            high = (rest >> np.uint64(32)).astype(np.float64)
+            low = (rest & np.uint64(0xFFFFFFFF)).astype(np.float64)
+            bit_length = np.where(high > 0, 32 + np.frexp(high)[1], np.frexp(low)[1])
+            rank = (rest_bits + 1 - bit_length).astype(np.uint8)
+            registers = np.zeros(m, dtype=np.uint8)
+            np.maximum.at(registers, index, rank)
+            registers = bytes(registers)
+        else:
+            registers = bytearray(m)
+            for value in data:
+                key = struct.unpack('<Q', struct.pack('<d', value))[0] if isinstance(value, float) else value & _MASK64
+                x = self._mix(key)
+                index = x >> rest_bits
+                rank = rest_bits + 1 - (x & ((1 << rest_bits) - 1)).bit_length()
+                if rank > registers[index]:
+                    registers[index] = rank
+        return {'precision': p, 'registers': bytes(registers).hex(), 'count': len(data)}
+
+    def merge(self, a, b):
+        registers = bytes(max(x, y) for x, y in zip(bytes.fromhex(a['registers']), bytes.fromhex(b['registers'])))
+        return {'precision': a['precision'], 'registers': registers.hex(), 'count': a['count'] + b['count']}
+
+    def finalize(self, partial, params):
+        registers = bytes.fromhex(partial['registers'])
+        m = len(registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / sum(2.0 ** -r for r in registers)
+        zeros = registers.count(0)
+        if estimate <= 2.5 * m and zeros:
+            estimate = m * math.log(m / zeros)  # Linear counting for small cardinalities
+        return {'count': partial['count'], 'distinct': round(estimate)}
+
+
+OPERATIONS: Dict[str, Operation] = {op.name: op for op in (
+    SumAndStats(), Histogram(), Variance(), TopK(), Quantiles(), DistinctCount()
+)}
+SUPPORTED_OPERATIONS: List[str] = list(OPERATIONS)
+
+
+def get_operation(name: str) -> Operation:
+    if name not in OPERATIONS:
+        raise ValueError(f"Unknown operation: {name}")
+    return OPERATIONS[name]
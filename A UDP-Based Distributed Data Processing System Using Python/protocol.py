@@ -0,0 +1,218 @@
+import json
+import struct
+import sys
+import time
+from array import array
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+import compression
+
+# Binary wire format shared by the coordinator and the workers.
+#
+# Every binary datagram starts with a fixed little-endian header:
+#   magic (2s) | version (B) | msg type (B) | dtype (c) | flags (B) | meta length (H) | chunk id (I) | job id (I)
+# followed by `meta length` bytes of compact JSON (operation, result fields, ...)
+# and finally the packed array payload, compressed with the codec named by the
+# low bits of flags if one was negotiated (see compression.py). JSON datagrams
+# always start with '{', so both formats can share a socket and are told apart
+# by the magic.
+# JSON TASK and RESULT messages carry the job id in a 'job_id' key.
+#
+# Peers that negotiated batching may pack several small messages (binary or
+# JSON) into one BATCH datagram to save a syscall per message:
+#   magic (2s) | version (B) | msg type (B) | count (H) | count x (length (H) | message)
+
+MAGIC = b'DP'
+WIRE_VERSION = 2  # 2: job id in TASK/RESULT, so several jobs can share the workers
+HEADER = struct.Struct('<2sBBcBHII')
+
+MSG_TASK = 1
+MSG_RESULT = 2
+MSG_BATCH = 6  # Codes 3-5 belong to the fragment layer (transport.py), 7 to sealed messages (integrity.py)
+MSG_NAMES = {MSG_TASK: 'TASK', MSG_RESULT: 'RESULT'}
+MSG_CODES = {name: code for code, name in MSG_NAMES.items()}
+
+BATCH_HEADER = struct.Struct('<2sBBH')
+BATCH_ENTRY = struct.Struct('<H')
+
+NO_PAYLOAD = b'-'
+DTYPES = {b'i': 'i', b'q': 'q', b'd': 'd'}  # int32, int64, float64
+
+FORMAT_BINARY = 'binary'
+FORMAT_JSON = 'json'
+SUPPORTED_FORMATS = [FORMAT_BINARY, FORMAT_JSON]
+
+MAX_DATAGRAM = 64000  # Approx. 64KB limit minus headers
+JSON_ELEMENTS = {'i': 10000, 'q': 3000, 'd': 2500}  # JSON digits are ~4-6 bytes per small int, up to ~24 per float
+MAX_FRAGMENTED_ELEMENTS = 1 << 20  # Elements per task once workers reassemble fragments
+JSON_ELEMENT_BYTES = 26  # Longest JSON float plus its separator
+_SWAP = sys.byteorder != 'little'
+
+
+def negotiate_format(offered) -> str:
+    """Pick the best wire format both sides understand (JSON is the fallback)"""
+    for fmt in SUPPORTED_FORMATS:
+        if fmt in (offered or []):
+            return fmt
+    return FORMAT_JSON
+
+
+def max_elements(typecode: str = 'i', wire_format: str = FORMAT_BINARY) -> int:
+    """Largest number of elements that fit a single task datagram"""
+    if wire_format == FORMAT_BINARY:
+        return (MAX_DATAGRAM - HEADER.size - 64) // array(typecode).itemsize
+    return JSON_ELEMENTS[typecode]
+
+
+def max_message_size(elements: int = MAX_FRAGMENTED_ELEMENTS) -> int:
+    """Upper bound on the size of a message carrying a task of that many elements, in any format"""
+    return elements * JSON_ELEMENT_BYTES + MAX_DATAGRAM
+
+
+def is_binary(datagram: bytes) -> bool:
+    return datagram[:2] == MAGIC
+
+
+def encode_binary(msg_type: str, chunk_id: int, meta: Optional[dict] = None, payload=None, job_id: int = 0,
+                  codecs: Iterable[str] = ()) -> bytes:
+    """Encode a binary message with an optional JSON meta block and array payload.
+
+    The payload is an array or a typed memoryview (e.g. a slice of a memory-mapped dataset).
+    It is compressed with the first applicable codec when that makes it smaller."""
+    meta_bytes = json.dumps(meta, separators=(',', ':')).encode('utf-8') if meta else b''
+    codec = compression.CODEC_NONE
+    if payload is None:
+        dtype, body = NO_PAYLOAD, b''
+    else:
+        typecode = payload.format if isinstance(payload, memoryview) else payload.typecode
+        dtype = typecode.encode('ascii')
+        if codecs:
+            codec, payload = compression.encode_payload(payload, typecode, codecs)
+        if _SWAP and not codec:
+            payload = array(typecode, payload)
+            payload.byteswap()
+        body = payload  # Joined straight into the datagram, without an intermediate copy
+    header = HEADER.pack(MAGIC, WIRE_VERSION, MSG_CODES[msg_type], dtype, codec, len(meta_bytes), chunk_id, job_id)
+    return b''.join((header, meta_bytes, body))
+
+
+def decode_binary(datagram: bytes, backend=None) -> Dict[str, Any]:
+    """Decode a binary datagram into the same dict shape as a JSON message.
+
+    With a compute backend the payload is decoded by it (zero-copy for NumPy)."""
+    magic, version, msg_code, dtype, flags, meta_len, chunk_id, job_id = HEADER.unpack_from(datagram)
+    if version != WIRE_VERSION:
+        raise ValueError(f"Unsupported wire version {version}")
+    if msg_code not in MSG_NAMES:
+        raise ValueError(f"Unknown message type {msg_code}")
+    offset = HEADER.size
+    message = json.loads(bytes(datagram[offset:offset + meta_len])) if meta_len else {}
+    message['type'] = MSG_NAMES[msg_code]
+    message['chunk_id'] = chunk_id
+    message['job_id'] = job_id
+    offset += meta_len
+    if dtype != NO_PAYLOAD:
+        if dtype not in DTYPES:
+            raise ValueError(f"Unknown dtype {dtype!r}")
+        payload = memoryview(datagram)[offset:]
+        codec = flags & compression.CODEC_MASK
+        if codec:
+            start = time.perf_counter()
+            raw = compression.decompress(codec, payload, DTYPES[dtype])
+            message['codec'] = compression.CODEC_NAMES[codec]
+            message['codec_time'] = time.perf_counter() - start
+            payload = memoryview(raw)
+        if backend is not None:
+            message['data'] = backend.decode(payload, DTYPES[dtype])
+            return message
+        data = array(DTYPES[dtype])
+        data.frombytes(payload)
+        if _SWAP:
+            data.byteswap()
+        message['data'] = data
+    return message
+
+
+def encode_task(chunk_id: int, data_chunk, operation: str, wire_format: str, params: Optional[dict] = None,
+                job_id: int = 0, codecs: Iterable[str] = ()) -> bytes:
+    """Encode a TASK in the worker's negotiated format"""
+    meta = {'operation': operation}
+    if params:
+        meta['params'] = params
+    if wire_format == FORMAT_BINARY:
+        if not isinstance(data_chunk, (array, memoryview)):
+            data_chunk = array('i', data_chunk)
+        return encode_binary('TASK', chunk_id, meta, data_chunk, job_id, codecs)
+    return json.dumps(dict(meta, type='TASK', chunk_id=chunk_id, job_id=job_id, data=list(data_chunk))).encode('utf-8')
+
+
+def encode_result(chunk_id: int, result: dict, wire_format: str, job_id: int = 0, **fields) -> bytes:
+    """Encode a RESULT in the negotiated format; extra fields are piggy-backed"""
+    if wire_format == FORMAT_BINARY:
+        return encode_binary('RESULT', chunk_id, dict(fields, result=result), job_id=job_id)
+    return json.dumps(dict(fields, type='RESULT', chunk_id=chunk_id, job_id=job_id, result=result)).encode('utf-8')
+
+
+def payload_codec(datagram: bytes) -> int:
+    """Codec id a binary message's payload was compressed with (CODEC_NONE if raw)"""
+    return datagram[5] & compression.CODEC_MASK if is_binary(datagram) else compression.CODEC_NONE
+
+
+def decode_message(datagram: bytes, backend=None) -> Dict[str, Any]:
+    """Decode either a binary or a JSON datagram"""
+    if is_binary(datagram):
+        return decode_binary(datagram, backend)
+    return json.loads(bytes(datagram))
+
+
+def is_batch(datagram) -> bool:
+    return len(datagram) >= BATCH_HEADER.size and datagram[:2] == MAGIC and datagram[3] == MSG_BATCH
+
+
+def encode_batch(messages: List[bytes]) -> bytes:
+    """Pack messages into one BATCH datagram"""
+    parts = [BATCH_HEADER.pack(MAGIC, WIRE_VERSION, MSG_BATCH, len(messages))]
+    for message in messages:
+        parts.append(BATCH_ENTRY.pack(len(message)))
+        parts.append(message)
+    return b''.join(parts)
+
+
+def split_batch(datagram) -> List[memoryview]:
+    """Messages carried by a datagram: the entries of a BATCH, or the datagram itself"""
+    if not is_batch(datagram):
+        return [datagram]
+    view = memoryview(datagram)
+    _, version, _, count = BATCH_HEADER.unpack_from(view)
+    if version != WIRE_VERSION:
+        raise ValueError(f"Unsupported wire version {version}")
+    messages = []
+    offset = BATCH_HEADER.size
+    for _ in range(count):
+        length, = BATCH_ENTRY.unpack_from(view, offset)
+        offset += BATCH_ENTRY.size
+        if offset + length > len(view):
+            raise ValueError("Truncated batch datagram")
+        messages.append(view[offset:offset + length])
+        offset += length
+    return messages
+
+
+def pack_batches(messages: Iterable[bytes], limit: int = MAX_DATAGRAM) -> Iterator[bytes]:
+    """Coalesce messages into as few datagrams as fit `limit`.
+
+    A lone message, or one too large to share a datagram, is yielded unchanged
+    (oversized ones go to the fragment layer)."""
+    pending: List[bytes] = []
+    size = BATCH_HEADER.size
+    for message in messages:
+        entry = BATCH_ENTRY.size + len(message)
+        if BATCH_HEADER.size + entry > limit:
+            yield message
+            continue
+        if size + entry > limit:
+            yield pending[0] if len(pending) == 1 else encode_batch(pending)
+            pending, size = [], BATCH_HEADER.size
+        pending.append(message)
+        size += entry
+    if pending:
+        yield pending[0] if len(pending) == 1 else encode_batch(pending)
@@ -1,226 +1,1292 @@
+import argparse
+import asyncio
 import socket
+import sys
 import threading
 import time
 import json
+import logging
+import os
 import random
-import customtkinter as ctk
-from tkinter import ttk, scrolledtext
-from typing import Dict, List, Tuple, Any
+from array import array
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple, Any
+try:
+    import customtkinter as ctk
+    from tkinter import ttk, scrolledtext, filedialog
+except ImportError:  # Headless nodes run without Tk
+    ctk = None
+import cache
+import checkpoint
+import client
+import compression
+import dataset
+import discovery
+import events
+import integrity
+import jobs
+import liveness
+import metrics
+import operations
+import protocol
+import shard
+import transport
 
 class DataCoordinator:
-    def __init__(self, gui):
-        self.host = self.get_local_ip()
-        self.port = 9999
+    # Worker-reported RESULT timings and the histograms they feed
+    TIMING_HISTOGRAMS = {'recv_time': 'worker_receive_seconds', 'compute_time': 'worker_compute_seconds',
+                         'codec_time': 'worker_decompress_seconds'}
+    MAX_DEPARTED_SESSIONS = 1024
+    
+    def __init__(self, events: events.EventSink, host: Optional[str] = None, port: int = 9999):
+        self.host = host or self.get_local_ip()
+        self.port = port
         self.socket = None
-        self.gui = gui
+        self.events = events
         try:
             self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-            self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 65536)  # Increase receive buffer
-            self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, 65536)  # Increase send buffer
-            self.socket.settimeout(5.0)
+            self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 1 << 20)  # Room for a burst of results from every worker (kernel may clamp)
+            self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, 1 << 20)  # Room for a burst of tasks to every worker (kernel may clamp)
+            self.socket.settimeout(0.2)  # Short timeout so the transport timers keep running
             self.socket.bind((self.host, self.port))
-            self.gui.log_message(f"Coordinator started on {self.host}:{self.port}")
+            self.transport = transport.FragmentTransport(self.socket)
+            self.reader = transport.DatagramReader(self.socket)
+            self.events.log_message(f"Coordinator started on {self.host}:{self.port}")
         except OSError as e:
-            self.gui.log_message(f"Error: Port {self.port} already in use. Try another port.")
+            self.events.log_message(f"Error: Port {self.port} already in use. Try another port.")
             return
         
-        # Track workers and tasks
-        self.workers: Dict[Tuple[str, int], dict] = {}
-        self.pending_tasks: Dict[int, dict] = {}
-        self.completed_tasks: Dict[int, Any] = {}
-        self.task_counter = 0
-        self.dataset_size = 100000
+        # Track workers and jobs
         self.lock = threading.Lock()
-        self.max_chunk_size = 10000  # Limit per task to avoid UDP size limit
+        self.membership = threading.Condition(self.lock)  # Notified when workers register
+        self.workers: Dict[Tuple[str, int], dict] = {}
+        self.transport.accept_peer = self.workers.__contains__  # Only registered workers may send fragmented messages
+        self.jobs: Dict[int, jobs.Job] = {}  # Admitted jobs sharing the worker pool, oldest first
+        self.job_queue: List[jobs.Job] = []  # Submitted jobs waiting to be admitted
+        self.next_job_id = 1
+        self.max_active_jobs = 2  # Admitted jobs that still have unassigned chunks; the next one is admitted as one runs dry
+        self.last_progress_report = 0.0
+        self.progress_interval = 0.5  # Seconds between running-total updates
+        self.work_event = threading.Event()  # Set on results, registrations and submissions so dispatch reacts immediately
+        self.min_workers = 1  # Registered workers a job waits for before starting; later ones join as they register
+        self.timeout_deadline = 0.0  # Earliest time a task can time out or straggle; no scan before it
+        self.worker_wait_timeout = 20.0  # Seconds a job waits for min_workers to register
+        self.task_counter = 0  # Chunks carved, over all jobs
+        self.retransmits = 0
+        self.max_chunk_size = protocol.max_elements('i', protocol.FORMAT_JSON)  # Limit per task to avoid UDP size limit
+        self.max_fragmented_chunk_size = protocol.MAX_FRAGMENTED_ELEMENTS  # Elements per task once workers reassemble fragments
+        self.min_chunk_size = 1024
+        self.probe_chunk_size = 16384  # First chunk for a worker whose throughput is unknown
+        self.gss_factor = 2  # Guided self-scheduling: hand out 1/(factor * workers) of what is left
+        self.initial_task_timeout = 5.0  # Before any RTT sample exists
+        self.min_task_timeout = 1.0
+        self.max_task_timeout = 30.0
+        self.speculation_factor = 2.0  # Duplicate tail tasks running this many SRTTs
+        self.suspect_phi = 3.0  # Failure-detector suspicion at which a worker gets no new tasks
+        self.dead_phi = 8.0  # ... and at which it is evicted and its tasks requeued
+        self.liveness_interval = 0.25  # Seconds between failure-detector sweeps
+        self.last_liveness_check = 0.0
+        self.batch_io = True  # Drain queued datagrams per wakeup and coalesce small tasks for workers that accept BATCH
+        self.compression = True  # Offer payload codecs to workers that support them
+        self.max_codec_backoff = 64  # Most tasks sent raw before compression is tried again
+        self.link_bandwidth = 100e6 / 8  # Bytes/second assumed on the wire when judging whether compression pays off
+        self.result_cache: Optional[cache.ResultCache] = None  # Off until enable_result_cache()
+        self.cache_chunk_size = 65536  # Fixed chunk size while caching, so chunk boundaries repeat between runs
+        self.checkpoint_interval = 5.0  # Seconds between checkpoint records of resumable jobs
+        self.announcer: Optional[discovery.Announcer] = None  # Off until start_announcer()
+        self.integrity_modes = list(integrity.SUPPORTED_MODES)  # Seal modes offered to workers, preferred first; empty: off
+        self.secret = integrity.secret_from_env()  # Shared cluster secret; when set, workers must prove they hold it
+        self.session_nonce = integrity.new_nonce()  # This coordinator's half of every session key
+        self.session_secret = integrity.new_key()  # Keys sessions when there is no shared secret
+        self.departed = OrderedDict()  # Sessions of workers that left or were evicted: their LEFT and REJOIN are sealed
+        self.datagrams_dropped = 0  # Worker datagrams inferred lost from gaps in their sequence numbers
+        self.datagrams_reordered = 0  # ... that turned up late after all
+        self.metrics = metrics.Metrics()
+        self.metrics.counter('tasks_dispatched_total', "Task copies sent, including retransmits and speculative duplicates")
+        self.metrics.counter('tasks_completed_total', "Chunks completed by workers")
+        self.metrics.counter('messages_rejected_total', "Worker messages dropped for failing their integrity check or lacking a seal")
+        self.metrics.histogram('task_latency_seconds', "Dispatch-to-result time of each completed task copy")
+        self.metrics.histogram('task_encode_seconds', "Time to serialize (and compress) a task")
+        self.metrics.histogram('result_decode_seconds', "Time to deserialize a result")
+        self.metrics.histogram('worker_receive_seconds', "Worker-reported time to receive and decode a task")
+        self.metrics.histogram('worker_compute_seconds', "Worker-reported time to run a task")
+        self.metrics.histogram('worker_decompress_seconds', "Worker-reported time to decompress a task payload")
+        self.metrics.add_collector(self.collect_metrics)
+        self.metrics_server: Optional[metrics.MetricsServer] = None
     
     def get_local_ip(self):
+        """This machine's LAN address, without probing the internet (localhost if there is none)"""
+        return discovery.local_ip()
+    
+    def start_announcer(self, cluster: Optional[str] = None, broadcast: bool = False):
+        """Announce this coordinator on the discovery multicast group so workers find it without an address"""
+        try:
+            self.announcer = discovery.Announcer(self.socket.getsockname()[1], self.host, cluster, broadcast=broadcast)
+        except OSError as e:
+            self.events.log_message(f"Error: Cannot announce on {discovery.MCAST_GROUP}:{discovery.MCAST_PORT}: {e}")
+            return
+        self.events.log_message(f"Announcing on {discovery.MCAST_GROUP}:{discovery.MCAST_PORT}"
+                                + (f" as cluster {cluster}" if cluster else ""))
+    
+    def generate_sample_data(self, size, seed: Optional[int] = None):
+        """Generate sample numerical data for processing; a seed makes it reproducible"""
+        rng = random.Random(seed) if seed is not None else random
+        return array('i', (rng.randint(1, 1000) for _ in range(size)))
+    
+    def enable_result_cache(self, capacity: int = 4096, path: Optional[str] = None):
+        """Serve chunks whose results are already known from an LRU cache, persisted to path if given"""
+        result_cache = cache.ResultCache(capacity, path)
         try:
-            s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-            s.connect(("8.8.8.8", 80))
-            ip = s.getsockname()[0]
-            s.close()
-            return ip
-        except:
-            return "127.0.0.1"  # Fallback to localhost if unable to get IP
-    
-    def generate_sample_data(self, size):
-        """Generate sample numerical data for processing"""
-        return [random.randint(1, 1000) for _ in range(size)]
-    
-    def split_data(self, data: List[int], num_chunks: int) -> List[List[int]]:
-        """Split data into smaller chunks to fit UDP limits"""
-        chunk_size = min(self.max_chunk_size, len(data) // num_chunks)
-        chunks = []
-        for i in range(0, len(data), chunk_size):
-            chunks.append(data[i:i + chunk_size])
-        return chunks
-    
-    def register_worker(self, worker_addr: Tuple[str, int]):
-        """Register a new worker"""
+            loaded = result_cache.load()
+        except (OSError, ValueError) as e:
+            self.events.log_message(f"Error loading result cache {path}: {e}")
+            loaded = 0
+        if path:
+            self.events.log_message(f"Result cache: {loaded} entries loaded from {path}")
+        self.result_cache = result_cache
+    
+    def chunk_limit(self, worker: dict, typecode: str) -> int:
+        """Largest chunk of typecode elements a worker can receive"""
+        if worker['fragments']:
+            return self.max_fragmented_chunk_size
+        if worker['format'] == protocol.FORMAT_BINARY:
+            return protocol.max_elements(typecode, protocol.FORMAT_BINARY)
+        return min(self.max_chunk_size, protocol.max_elements(typecode, protocol.FORMAT_JSON))
+    
+    def next_chunk_size(self, worker_addr: Tuple[str, int], job: jobs.Job) -> int:
+        """Size a worker's next chunk of a job in proportion to its measured throughput"""
+        worker = self.workers[worker_addr]
+        remaining = len(job.dataset) - job.cursor
+        if self.result_cache is not None:
+            return min(remaining, self.chunk_limit(worker, job.typecode), self.cache_chunk_size)
+        rates = [info['throughput'] for info in self.workers.values() if info['throughput']]
+        mean_rate = sum(rates) / len(rates) if rates else 1.0
+        total_rate = sum(info['throughput'] or mean_rate for info in self.workers.values())
+        share = (worker['throughput'] or mean_rate) / total_rate
+        # The worker holds `credits` chunks at once, so each one gets a slice of its share
+        size = int(remaining * share / (self.gss_factor * worker['credits']))
+        if worker['throughput'] is None:
+            size = min(size, self.probe_chunk_size)
+        return max(1, min(remaining, self.chunk_limit(worker, job.typecode), max(self.min_chunk_size, size)))
+    
+    def split_data(self, worker_addr: Tuple[str, int], job: jobs.Job) -> int:
+        """Carve a job's next chunk for a worker off its unassigned data (caller holds the lock)"""
+        self.task_counter += 1
+        return job.split(self.next_chunk_size(worker_addr, job))
+    
+    def register_worker(self, worker_addr: Tuple[str, int], wire_format: str = protocol.FORMAT_JSON, fragments: bool = False,
+                        credits: int = 1, cores: int = 1, supported_operations: List[str] = None, batch: bool = False,
+                        heartbeat_interval: float = 5.0, codecs: List[str] = None,
+                        session: Optional[integrity.Session] = None):
+        """Register a worker; returns False if it was already registered (restarted or lost our ACK)"""
+        now = time.time()
         with self.lock:
-            if worker_addr not in self.workers:
-                self.workers[worker_addr] = {
-                    'status': 'ready',
-                    'last_seen': time.time(),
-                    'tasks_completed': 0
-                }
-                self.gui.log_message(f"Worker registered: {worker_addr}")
-                self.gui.update_workers(list(self.workers.keys()))
-                return True
+            registered = worker_addr not in self.workers
+            if not registered:
+                self.evict_worker(worker_addr, "re-registered")  # A restarted worker has lost whatever it held
+            self.transport.forget(worker_addr)
+            self.departed.pop(worker_addr, None)
+            detector = liveness.PhiAccrualDetector(max(0.1, float(heartbeat_interval)))
+            detector.heartbeat(now)
+            self.workers[worker_addr] = {
+                'status': 'ready',
+                'last_seen': now,
+                'detector': detector,
+                'suspect': False,  # Silent long enough that no new tasks are assigned
+                'draining': False,  # Sent LEAVE: finishes its in-flight tasks, gets no new ones
+                'tasks_completed': 0,
+                'format': wire_format,
+                'fragments': fragments,
+                'batch': batch,  # Accepts BATCH datagrams
+                'credits': max(1, int(credits)),  # Tasks the worker can buffer
+                'cores': max(1, int(cores)),
+                'operations': set(supported_operations or ['sum_and_stats']),
+                'inflight': {},  # (job_id, chunk_id) -> elements
+                'srtt': None,  # Smoothed dispatch-to-result time
+                'rttvar': 0.0,
+                'backoff': 1,
+                'throughput': None,  # Elements/second, EWMA over completed tasks
+                'last_completion': 0.0,
+                'recv_time': 0.0,  # Worker-reported seconds spent receiving/decoding tasks
+                'compute_time': 0.0,  # Worker-reported seconds spent computing
+                'codecs': list(codecs or []),  # Negotiated payload codecs, preferred first
+                'session': session,  # Seals our messages to the worker and checks its replies (None: unsealed)
+                'codec_skip': 0,  # Tasks left to send raw after compression last failed to pay off
+                'codec_backoff': 0,
+                'raw_bytes': 0,  # Task payload bytes before compression ...
+                'wire_bytes': 0,  # ... and task bytes actually sent
+                'encode_time': 0.0,  # Seconds spent compressing this worker's tasks
+                'codec_time': 0.0,  # Worker-reported seconds spent decompressing
+                'decoded_tasks': 0,  # Results that reported a codec_time
+                'last_seq': None,  # Highest datagram sequence number seen from the worker
+                'dropped': 0  # Datagrams inferred lost from sequence gaps
+            }
+            self.events.log_message(f"Worker {'registered' if registered else 'rejoined'}: {worker_addr} "
+                                    f"({wire_format} format, {credits} credits, {cores} cores)")
+            self.events.update_workers(list(self.workers.keys()))
+            self.membership.notify_all()
+        self.notify_work()
+        return registered
+    
+    def evict_worker(self, worker_addr: Tuple[str, int], reason: str):
+        """Remove a worker and requeue the chunks only it was running (caller holds the lock)"""
+        worker = self.workers.pop(worker_addr, None)
+        if worker is None:
+            return
+        self.remember_session(worker_addr, worker['session'])
+        requeued = 0
+        for (job_id, chunk_id), size in worker['inflight'].items():
+            job = self.jobs.get(job_id)
+            task = job.pending_tasks.get(chunk_id) if job else None
+            if task is None:
+                continue
+            job.inflight_elements -= size
+            task['workers'].pop(worker_addr, None)
+            if not task['workers']:
+                job.task_queue.appendleft((chunk_id, worker_addr))
+                job.retransmits += 1
+                self.retransmits += 1
+                requeued += 1
+        self.events.log_message(f"Worker {worker_addr} evicted ({reason}); {requeued} tasks requeued")
+    
+    def retire_worker(self, worker_addr: Tuple[str, int]) -> bool:
+        """Remove a draining worker once its last in-flight task is done (caller holds the lock)"""
+        worker = self.workers.get(worker_addr)
+        if worker is None or not worker['draining'] or worker['inflight']:
+            return False
+        del self.workers[worker_addr]
+        self.remember_session(worker_addr, worker['session'])
+        self.events.log_message(f"Worker {worker_addr} left after draining ({worker['tasks_completed']} tasks completed)")
+        self.events.update_workers(list(self.workers.keys()))
+        return True
+    
+    def remember_session(self, worker_addr: Tuple[str, int], session: Optional[integrity.Session]):
+        """Keep a departed worker's session to seal what we still tell it (caller holds the lock)"""
+        if session is None:
+            return
+        self.departed[worker_addr] = session
+        self.departed.move_to_end(worker_addr)
+        if len(self.departed) > self.MAX_DEPARTED_SESSIONS:
+            self.departed.popitem(last=False)
+    
+    def send_control(self, worker_addr: Tuple[str, int], msg_type: str):
+        """Send LEFT or REJOIN, sealed with the worker's current or last session so it can trust it"""
+        worker = self.workers.get(worker_addr)
+        session = worker['session'] if worker is not None else self.departed.get(worker_addr)
+        message = json.dumps({'type': msg_type}).encode('utf-8')
+        self.transport.send(session.seal(message) if session is not None else message, worker_addr)
+    
+    def send_left(self, worker_addr: Tuple[str, int]):
+        """Confirm a LEAVE; the worker may shut down"""
+        self.send_control(worker_addr, 'LEFT')
+    
+    def check_workers(self):
+        """Run the failure detector: stop assigning to suspect workers, evict dead ones"""
+        now = time.time()
+        if now - self.last_liveness_check < self.liveness_interval:
+            return
+        self.last_liveness_check = now
+        evicted = False
+        retired = []
+        with self.lock:
+            for worker_addr, worker in list(self.workers.items()):
+                phi = worker['detector'].phi(now, worker['last_seen'])
+                if self.retire_worker(worker_addr):  # Its last task timed out rather than completed
+                    retired.append(worker_addr)
+                elif phi >= self.dead_phi:
+                    self.evict_worker(worker_addr, f"silent for {now - worker['last_seen']:.1f} s, phi {phi:.1f}")
+                    evicted = True
+                elif phi >= self.suspect_phi and not worker['suspect']:
+                    worker['suspect'] = True
+                    self.events.log_message(f"Worker {worker_addr} is suspect (phi {phi:.1f})")
+                elif phi < self.suspect_phi and worker['suspect']:
+                    worker['suspect'] = False
+                    self.events.log_message(f"Worker {worker_addr} is responsive again")
+            if evicted:
+                self.events.update_workers(list(self.workers.keys()))
+        for worker_addr in retired:
+            self.send_left(worker_addr)
+        if evicted:
+            self.notify_work()
+    
+    def task_timeout(self, worker: dict) -> float:
+        """Adaptive result timeout for a worker (Jacobson/Karels RTO)"""
+        if worker['srtt'] is None:
+            timeout = self.initial_task_timeout
+        else:
+            timeout = worker['srtt'] + 4 * worker['rttvar']
+        return min(self.max_task_timeout, max(self.min_task_timeout, timeout) * worker['backoff'])
+    
+    def update_throughput(self, worker: dict, data_size: int, sent_time: float, now: float):
+        """Fold a completed task into the worker's elements/second estimate"""
+        # With several tasks buffered, service starts when the previous one finished
+        elapsed = now - max(sent_time, worker['last_completion'])
+        worker['last_completion'] = now
+        if elapsed <= 0:
+            return
+        rate = data_size / elapsed
+        worker['throughput'] = rate if worker['throughput'] is None else 0.7 * worker['throughput'] + 0.3 * rate
+    
+    def update_rtt(self, worker: dict, sample: float):
+        """Fold a dispatch-to-result sample into the worker's RTT estimate"""
+        if worker['srtt'] is None:
+            worker['srtt'] = sample
+            worker['rttvar'] = sample / 2
+        else:
+            worker['rttvar'] = 0.75 * worker['rttvar'] + 0.25 * abs(worker['srtt'] - sample)
+            worker['srtt'] = 0.875 * worker['srtt'] + 0.125 * sample
+        worker['backoff'] = 1
+    
+    def has_credit(self, worker_addr: Tuple[str, int]) -> bool:
+        worker = self.workers[worker_addr]
+        if worker['suspect'] or worker['draining']:
+            return False
+        if worker['throughput'] is None and worker['inflight']:
+            return False  # One probe chunk until the worker's speed is known
+        return len(worker['inflight']) < worker['credits']
+    
+    def least_loaded_worker(self, job: jobs.Job, exclude=()) -> Tuple[str, int]:
+        """Pick the live worker that can run the job's operation with the fewest tasks in flight and credit left"""
+        # Older workers only know sum_and_stats
+        available = [addr for addr, worker in self.workers.items() if job.operation in worker['operations'] and self.has_credit(addr)]
+        candidates = [addr for addr in available if addr not in exclude] or available
+        if not candidates:
+            return None
+        return min(candidates, key=lambda addr: (len(self.workers[addr]['inflight']), self.workers[addr]['srtt'] or 0))
+    
+    def assign_task(self, job: jobs.Job, chunk_id: int, worker_addr: Tuple[str, int], now: float):
+        """Record that a chunk is in flight on a worker (caller holds the lock)"""
+        task = job.pending_tasks.setdefault(chunk_id, {
+            'workers': {},  # Copies in flight: worker -> sent time
+            'assigned': set(),  # Every worker ever sent the chunk; any of them may still return it late
+            'data_size': job.chunks[chunk_id][1],
+            'attempts': 0
+        })
+        task['workers'][worker_addr] = now
+        task['assigned'].add(worker_addr)
+        task['attempts'] += 1
+        self.metrics.inc('tasks_dispatched_total')
+        worker = self.workers[worker_addr]
+        self.timeout_deadline = min(self.timeout_deadline, self.task_deadline(worker, now))
+        worker['inflight'][(job.job_id, chunk_id)] = task['data_size']
+        worker['status'] = 'busy'
+        job.inflight_elements += task['data_size']
+    
+    def task_deadline(self, worker: dict, sent_time: float) -> float:
+        """When a copy sent at sent_time times out, or is first worth duplicating"""
+        deadline = sent_time + self.task_timeout(worker)
+        if worker['srtt'] is not None:
+            deadline = min(deadline, sent_time + self.speculation_factor * worker['srtt'])
+        return deadline
+    
+    def expire_tasks(self, now: float):
+        """Requeue timed-out copies and recompute timeout_deadline (caller holds the lock)"""
+        deadline = float('inf')
+        for job in self.jobs.values():
+            for chunk_id, task in list(job.pending_tasks.items()):
+                for worker_addr, sent_time in list(task['workers'].items()):
+                    worker = self.workers.get(worker_addr)
+                    if worker is not None and now - sent_time <= self.task_timeout(worker):
+                        deadline = min(deadline, self.task_deadline(worker, sent_time))
+                        continue
+                    # Timed-out copies go back to the front of the job's queue for another worker
+                    del task['workers'][worker_addr]
+                    self.release_task(job.job_id, chunk_id, worker_addr)
+                    if worker is not None:
+                        worker['backoff'] = min(worker['backoff'] * 2, 8)
+                    if not task['workers']:
+                        job.task_queue.appendleft((chunk_id, worker_addr))
+                        job.retransmits += 1
+                        self.retransmits += 1
+                        self.events.log_message(f"Task {job.job_id}/{chunk_id} timed out on {worker_addr}, reassigning...")
+        self.timeout_deadline = max(deadline, now + 0.01)  # Overdue straggler checks rescan at most every 10 ms
+    
+    def release_task(self, job_id: int, chunk_id: int, worker_addr: Tuple[str, int]):
+        """Drop a chunk from a worker's in-flight set (caller holds the lock)"""
+        worker = self.workers.get(worker_addr)
+        if worker is None:
+            return
+        size = worker['inflight'].pop((job_id, chunk_id), None)
+        if size is not None and job_id in self.jobs:
+            self.jobs[job_id].inflight_elements -= size
+        if not worker['inflight']:
+            worker['status'] = 'ready'
+    
+    def schedule(self) -> int:
+        """Expire timed-out tasks, dispatch queued chunks and speculate on stragglers"""
+        outstanding, data_chunks = self.plan_dispatch()
+        self.send_tasks(data_chunks)
+        return outstanding
+    
+    def plan_dispatch(self) -> Tuple[int, list]:
+        """Decide what to send; returns the outstanding work count and (worker, job, chunk_id, data) sends"""
+        sends = []
+        now = time.time()
+        with self.lock:
+            if now >= self.timeout_deadline:
+                self.expire_tasks(now)
+            self.admit_jobs(now)
+            self.assign_chunks(now, sends)
+            while self.admit_jobs(now):  # A job ran out of unassigned chunks: start the next queued one now
+                self.assign_chunks(now, sends)
+            # Near the tail of the last jobs, duplicate stragglers onto idle workers
+            unassigned = any(job.has_unassigned() for job in self.jobs.values())
+            pending = sum(len(job.pending_tasks) for job in self.jobs.values())
+            if not unassigned and 0 < pending <= len(self.workers):
+                idle = [addr for addr, info in self.workers.items()
+                        if not info['inflight'] and not info['suspect'] and not info['draining']]
+                for job in self.jobs.values():
+                    for chunk_id, task in job.pending_tasks.items():
+                        if not idle:
+                            break
+                        if len(task['workers']) != 1:
+                            continue
+                        (worker_addr, sent_time), = task['workers'].items()
+                        worker = self.workers.get(worker_addr)
+                        if worker is None or worker['srtt'] is None:
+                            continue
+                        if now - sent_time > self.speculation_factor * worker['srtt']:
+                            backup = next((addr for addr in idle if job.operation in self.workers[addr]['operations']), None)
+                            if backup is None:
+                                continue
+                            idle.remove(backup)
+                            self.assign_task(job, chunk_id, backup, now)
+                            sends.append((backup, job, chunk_id))
+                            self.events.log_message(f"Task {job.job_id}/{chunk_id} is straggling on {worker_addr}, duplicating on {backup}")
+            outstanding = sum(job.outstanding() for job in self.jobs.values()) + len(self.job_queue)
+            data_chunks = [(worker_addr, job, chunk_id, job.chunk_data(chunk_id)) for worker_addr, job, chunk_id in sends]
+        return outstanding, data_chunks
+    
+    def assign_chunks(self, now: float, sends: list):
+        """Hand out chunks until no worker that could take one has credit (caller holds the lock)"""
+        while True:
+            # Highest priority first, then the job with the least work in flight gets the credit
+            ready = sorted((job for job in self.jobs.values() if job.has_unassigned()),
+                           key=lambda job: (-job.priority, job.inflight_elements, job.job_id))
+            for job in ready:
+                # Requeued chunks go first, avoiding the worker they timed out on
+                previous = job.task_queue[0][1] if job.task_queue else None
+                worker_addr = self.least_loaded_worker(job, exclude=(previous,))
+                if worker_addr is not None:
+                    break
+            else:
+                return  # Every capable worker's buffer is full; wait for results to return credits
+            if job.task_queue:
+                chunk_id = job.task_queue.popleft()[0]
+                if chunk_id not in job.chunks:
+                    continue  # Completed by a late result since it was requeued
+            else:
+                chunk_id = self.split_data(worker_addr, job)
+                if self.serve_cached(job, chunk_id):
+                    continue
+            self.assign_task(job, chunk_id, worker_addr, now)
+            sends.append((worker_addr, job, chunk_id))
+    
+    def serve_cached(self, job: jobs.Job, chunk_id: int) -> bool:
+        """Fold a freshly carved chunk from the result cache instead of dispatching it (caller holds the lock)"""
+        if self.result_cache is None:
+            return False
+        key = cache.chunk_key(job.operation, job.params, job.chunk_data(chunk_id))
+        result = self.result_cache.get(key)
+        if result is None:
+            job.chunk_keys[chunk_id] = key  # Cached once a worker returns it
             return False
+        self.fold_result(job, result, job.chunks.pop(chunk_id))
+        job.cache_hits += 1
+        self.events.log_message(f"Task {job.job_id}/{chunk_id} served from the result cache")
+        self.events.add_result(chunk_id, result, None, None, job.job_id)
+        return True
     
-    def send_task(self, worker_addr: Tuple[str, int], chunk_id: int, data_chunk: List[int]):
+    def admit_jobs(self, now: float) -> bool:
+        """Move queued jobs into the pool while fewer than max_active_jobs still have chunks to hand out (caller holds the lock)"""
+        admitted = False
+        while self.job_queue and sum(job.has_unassigned() for job in self.jobs.values()) < self.max_active_jobs:
+            job = max(self.job_queue, key=lambda job: (job.priority, -job.job_id))
+            self.job_queue.remove(job)
+            job.start = now
+            self.jobs[job.job_id] = job
+            self.events.log_message(f"Job {job.job_id} started: {job.operation} over {len(job.dataset):,} elements "
+                                    f"(priority {job.priority}, {len(self.jobs)} running, {len(self.job_queue)} queued)")
+            admitted = True
+        return admitted
+    
+    def complete_jobs(self):
+        """Finalize and report every job whose chunks have all completed"""
+        with self.lock:
+            finished = [job for job in self.jobs.values() if not job.outstanding()]
+            for job in finished:
+                del self.jobs[job.job_id]
+        for job in finished:
+            self.finish_job(job)
+        if finished:
+            self.notify_work()  # Admit queued jobs
+    
+    def task_progress(self) -> Tuple[int, int]:
+        """(pending, completed) task counts over the running jobs"""
+        running = list(self.jobs.values())
+        return (sum(len(job.pending_tasks) + len(job.task_queue) for job in running),
+                sum(job.completed_count for job in running))
+    
+    def send_tasks(self, data_chunks: list):
+        """Send planned (worker, job, chunk_id, data) tasks, coalescing each batching worker's small tasks"""
+        by_worker: Dict[Tuple[str, int], list] = {}
+        for worker_addr, job, chunk_id, data_chunk in data_chunks:
+            by_worker.setdefault(worker_addr, []).append((job, chunk_id, data_chunk))
+        for worker_addr, tasks in by_worker.items():
+            worker = self.workers.get(worker_addr)
+            if len(tasks) == 1 or not (self.batch_io and worker and worker['batch']):
+                for job, chunk_id, data_chunk in tasks:
+                    self.send_task(worker_addr, job, chunk_id, data_chunk)
+                continue
+            messages = [self.encode_task_message(worker_addr, job, chunk_id, data_chunk) for job, chunk_id, data_chunk in tasks]
+            try:
+                for datagram in protocol.pack_batches(message for message in messages if message is not None):
+                    self.transport.send(datagram, worker_addr)
+            except Exception as e:
+                self.events.log_message(f"Error sending tasks to {worker_addr}: {e}")
+                continue
+            for (job, chunk_id, data_chunk), message in zip(tasks, messages):
+                if message is not None:
+                    self.events.log_message(f"Task {job.job_id}/{chunk_id} sent to {worker_addr} (data size: {len(data_chunk)})")
+            self.events.update_task_progress(*self.task_progress())
+    
+    def encode_task_message(self, worker_addr: Tuple[str, int], job: jobs.Job, chunk_id: int,
+                            data_chunk: memoryview) -> Optional[bytes]:
+        """Encode a task in the worker's format, or None if the worker could not receive it"""
+        with self.lock:
+            worker = self.workers.get(worker_addr)
+            if worker is None or (job.job_id, chunk_id) not in worker['inflight']:
+                self.unassign_task(job, chunk_id, worker_addr)  # Evicted or timed out since dispatch was planned
+                return None
+            wire_format = worker['format']
+            session = worker['session']
+            codecs = ()
+            if worker['codecs'] and wire_format == protocol.FORMAT_BINARY:
+                if worker['codec_skip']:
+                    worker['codec_skip'] -= 1
+                else:
+                    codecs = worker['codecs']
+        start = time.perf_counter()
+        message = protocol.encode_task(chunk_id, data_chunk, job.operation, wire_format, job.params, job.job_id, codecs)
+        if session is not None:
+            message = session.seal(message)
+        encode_time = time.perf_counter() - start
+        self.metrics.observe('task_encode_seconds', encode_time)
+        with self.lock:
+            if codecs:
+                worker['encode_time'] += encode_time
+                decode_time = worker['codec_time'] / worker['decoded_tasks'] if worker['decoded_tasks'] else encode_time
+                saved = memoryview(data_chunk).nbytes - len(message)
+                if protocol.payload_codec(message) and saved / self.link_bandwidth > encode_time + decode_time:
+                    worker['codec_backoff'] = 0
+                else:
+                    # Incompressible data, or a link fast enough that coding costs more than it saves:
+                    # send the next tasks raw, trying again after exponentially more of them
+                    worker['codec_backoff'] = min(self.max_codec_backoff, max(1, 2 * worker['codec_backoff']))
+                    worker['codec_skip'] = worker['codec_backoff']
+            worker['raw_bytes'] += memoryview(data_chunk).nbytes
+            worker['wire_bytes'] += len(message)
+        if len(message) > protocol.MAX_DATAGRAM and not worker['fragments']:
+            self.events.log_message(f"Error: Task {job.job_id}/{chunk_id} too large ({len(message)} bytes) and worker cannot reassemble fragments.")
+            return None
+        return message
+    
+    def unassign_task(self, job: jobs.Job, chunk_id: int, worker_addr: Tuple[str, int]):
+        """Take back a planned copy that was never sent, requeueing the chunk if no other copy is in flight (caller holds the lock)"""
+        task = job.pending_tasks.get(chunk_id)
+        if task is None or task['workers'].pop(worker_addr, None) is None:
+            return  # Completed, or already requeued when the worker was evicted or timed out
+        self.release_task(job.job_id, chunk_id, worker_addr)
+        if not task['workers']:
+            job.task_queue.appendleft((chunk_id, worker_addr))
+            self.events.log_message(f"Task {job.job_id}/{chunk_id} not sent: {worker_addr} is gone, requeued")
+    
+    def send_task(self, worker_addr: Tuple[str, int], job: jobs.Job, chunk_id: int, data_chunk: memoryview):
         """Send a task to a worker with size check"""
         if not self.socket:
-            self.gui.log_message("Error: Socket not initialized")
+            self.events.log_message("Error: Socket not initialized")
             return False
-        task_data = {
-            'type': 'TASK',
-            'chunk_id': chunk_id,
-            'data': data_chunk,
-            'operation': 'sum_and_stats'
-        }
-        message = json.dumps(task_data).encode('utf-8')
-        if len(message) > 64000:  # Approx. 64KB limit minus headers
-            self.gui.log_message(f"Error: Task {chunk_id} too large ({len(message)} bytes). Splitting not implemented.")
+        message = self.encode_task_message(worker_addr, job, chunk_id, data_chunk)
+        if message is None:
             return False
         try:
-            self.socket.sendto(message, worker_addr)
-            with self.lock:
-                self.pending_tasks[chunk_id] = {
-                    'worker': worker_addr,
-                    'data_size': len(data_chunk),
-                    'sent_time': time.time()
-                }
-                self.workers[worker_addr]['status'] = 'busy'
-            self.gui.log_message(f"Task {chunk_id} sent to {worker_addr} (data size: {len(data_chunk)})")
-            self.gui.update_task_progress(len(self.pending_tasks), len(self.completed_tasks))
+            self.transport.send(message, worker_addr)
+            self.events.log_message(f"Task {job.job_id}/{chunk_id} sent to {worker_addr} (data size: {len(data_chunk)})")
+            self.events.update_task_progress(*self.task_progress())
             return True
         except Exception as e:
-            self.gui.log_message(f"Error sending task to {worker_addr}: {e}")
+            self.events.log_message(f"Error sending task to {worker_addr}: {e}")
             return False
     
-    def handle_result(self, chunk_id: int, result: dict, worker_addr: Tuple[str, int]):
-        """Handle completed task result"""
+    def handle_result(self, job_id: int, chunk_id: int, result: dict, worker_addr: Tuple[str, int], credits: int = None,
+                      timings: dict = None):
+        """Handle completed task result; the first copy of a chunk to finish wins.
+        
+        Only a registered worker the chunk was sent to can complete it, even once its copy timed out."""
+        with self.lock:
+            worker = self.workers.get(worker_addr)
+            if worker is None:
+                self.reject_message(worker_addr, f"result {job_id}/{chunk_id} from an unregistered address")
+                return False
+            worker['last_seen'] = time.time()
+            if credits is not None:
+                worker['credits'] = max(1, int(credits))
+            for key, value in (timings or {}).items():
+                if value is not None:
+                    worker[key] += value
+                    self.metrics.observe(self.TIMING_HISTOGRAMS[key], value)
+            if (timings or {}).get('codec_time') is not None:
+                worker['decoded_tasks'] += 1
+            job = self.jobs.get(job_id)
+            task = job.pending_tasks.get(chunk_id) if job else None
+            if task is None:
+                self.release_task(job_id, chunk_id, worker_addr)
+                return False
+            if worker_addr not in task['assigned']:
+                self.reject_message(worker_addr, f"result {job_id}/{chunk_id} was never assigned to it")
+                return False
+            now = time.time()
+            sent_time = task['workers'].get(worker_addr)  # None for a copy that already timed out: still the first result
+            if sent_time is not None and task['attempts'] == 1:  # Karn: only unambiguous samples
+                self.update_rtt(worker, now - sent_time)
+            if sent_time is not None:
+                self.update_throughput(worker, task['data_size'], sent_time, now)
+                self.metrics.observe('task_latency_seconds', now - sent_time)
+            worker['tasks_completed'] += 1
+            worker['last_seen'] = now
+            self.fold_result(job, result, job.chunks[chunk_id])
+            self.metrics.inc('tasks_completed_total')
+            key = job.chunk_keys.pop(chunk_id, None)
+            if key is not None and self.result_cache is not None:
+                self.result_cache.put(key, result)
+            del job.pending_tasks[chunk_id]
+            del job.chunks[chunk_id]
+            if not task['workers']:
+                job.unqueue(chunk_id)  # Every copy had timed out: it was waiting for another worker
+            for assigned in list(task['workers']) + [worker_addr]:
+                self.release_task(job_id, chunk_id, assigned)
+            self.events.log_message(f"Task {job_id}/{chunk_id} completed by {worker_addr}")
+            self.events.add_result(chunk_id, result, worker_addr, worker['throughput'], job_id)
+            self.events.update_task_progress(*self.task_progress())
+            retired = self.retire_worker(worker_addr)
+        if retired:
+            self.send_left(worker_addr)
+        self.save_checkpoint(job)
+        self.notify_work()
+        return True
+    
+    def handle_task_error(self, job_id: int, chunk_id: int, error: str, worker_addr: Tuple[str, int]):
+        """A worker could not compute a chunk: fail its job rather than retry an operation that cannot run"""
         with self.lock:
-            if chunk_id in self.pending_tasks:
-                self.completed_tasks[chunk_id] = result
-                del self.pending_tasks[chunk_id]
-                if worker_addr in self.workers:
-                    self.workers[worker_addr]['status'] = 'ready'
-                    self.workers[worker_addr]['tasks_completed'] += 1
-                    self.workers[worker_addr]['last_seen'] = time.time()
-                self.gui.log_message(f"Task {chunk_id} completed by {worker_addr}")
-                self.gui.add_result(chunk_id, result)
-                self.gui.update_task_progress(len(self.pending_tasks), len(self.completed_tasks))
-                return True
-        return False
+            worker = self.workers.get(worker_addr)
+            if worker is None:
+                self.reject_message(worker_addr, f"task error {job_id}/{chunk_id} from an unregistered address")
+                return
+            job = self.jobs.get(job_id)
+            task = job.pending_tasks.get(chunk_id) if job else None
+            if task is None or worker_addr not in task['assigned']:
+                self.events.log_message(f"Ignored a task error for {job_id}/{chunk_id} from {worker_addr}: not assigned to it")
+                return
+            self.events.log_message(f"Error: Task {job_id}/{chunk_id} failed on {worker_addr}: {error}")
+            del self.jobs[job_id]
+            for pending_id, pending in job.pending_tasks.items():
+                for assigned in pending['workers']:
+                    self.release_task(job_id, pending_id, assigned)
+            job.pending_tasks.clear()
+            job.task_queue.clear()
+            self.events.update_task_progress(*self.task_progress())
+        job.finish(error=f"task {chunk_id} failed on {worker_addr[0]}:{worker_addr[1]}: {error}")
+        self.notify_work()  # Admit queued jobs
+    
+    def notify_work(self):
+        """Wake the dispatcher"""
+        self.work_event.set()
+    
+    def next_deadline(self) -> Optional[float]:
+        """Seconds until the next task timeout or straggler check, capped at the progress interval (None when idle)"""
+        if not self.jobs and not self.job_queue:
+            return None
+        now = time.time()
+        return max(0.001, min(self.timeout_deadline, now + self.progress_interval) - now)
+    
+    def fold_result(self, job: jobs.Job, result: dict, span: Tuple[int, int]):
+        """Merge the partial of the chunk at span (offset, length) into the job's running accumulator (caller holds the lock)"""
+        op = operations.get_operation(job.operation)
+        job.accumulator = result if job.accumulator is None else op.merge(job.accumulator, result)
+        job.completed_count += 1
+        job.completed_elements += result.get('count', span[1])
+        if job.checkpoint is not None:
+            job.unlogged_spans.append(span)
+    
+    def save_checkpoint(self, job: jobs.Job, force: bool = False):
+        """Log a job's newly completed spans and its accumulator, at most every checkpoint_interval seconds"""
+        if job.checkpoint is None or not (force or job.checkpoint.due(time.time())):
+            return
+        with self.lock:
+            spans, job.unlogged_spans = job.unlogged_spans, []
+            accumulator = job.accumulator  # Merges build new dicts, so this stays consistent with spans
+            completed_count = job.completed_count
+        if not spans:
+            return
+        try:
+            job.checkpoint.append(spans, accumulator, completed_count)
+        except OSError as e:
+            self.events.log_message(f"Error writing checkpoint {job.checkpoint.path}: {e}")
+    
+    def save_checkpoints(self):
+        """Log the progress of every running job now, e.g. before shutting down"""
+        for job in list(self.jobs.values()):
+            self.save_checkpoint(job, force=True)
+    
+    def running_totals(self, job: jobs.Job) -> dict:
+        """Snapshot of a job's finalized running result, rate and ETA"""
+        op = operations.get_operation(job.operation)
+        with self.lock:
+            accumulator = job.accumulator
+            processed = job.completed_elements
+            chunks = job.completed_count
+        elapsed = job.elapsed()
+        throughput = processed / elapsed if elapsed > 0 else 0
+        remaining = max(0, len(job.dataset) - processed)
+        return {
+            'job_id': job.job_id,
+            'operation': job.operation,
+            'result': op.finalize(accumulator, op.params(job.params)) if accumulator is not None else {'count': 0},
+            'processed': processed,
+            'total': len(job.dataset),
+            'chunks': chunks,
+            'elapsed': elapsed,
+            'throughput': throughput,
+            'eta': remaining / throughput if throughput > 0 else None
+        }
+    
+    def report_progress(self, force: bool = False):
+        """Push every running job's totals to the GUI at most every progress_interval seconds"""
+        now = time.time()
+        if not force and now - self.last_progress_report < self.progress_interval:
+            return
+        self.last_progress_report = now
+        for job in list(self.jobs.values()):
+            self.events.update_running_totals(self.running_totals(job))
+    
+    def start_dispatcher(self):
+        """Run dispatch_loop on its own thread"""
+        threading.Thread(target=self.dispatch_loop, daemon=True).start()
+    
+    def dispatch_loop(self):
+        """Finish completed jobs, hand out chunks, then sleep until a result, registration, submission or timeout"""
+        while True:
+            try:
+                self.complete_jobs()
+                self.schedule()
+                self.work_event.wait(self.next_deadline())
+                self.work_event.clear()
+                self.report_progress()
+            except Exception as e:
+                self.events.log_message(f"Error in dispatcher: {e}")
     
     def listen_for_messages(self):
         """Listen for messages from workers"""
         if not self.socket:
-            self.gui.log_message("Cannot listen: Socket not initialized")
+            self.events.log_message("Cannot listen: Socket not initialized")
             return
+        self.start_dispatcher()
         while True:
             try:
-                data, addr = self.socket.recvfrom(65536)  # Match buffer size
-                message = json.loads(data.decode('utf-8'))
-                msg_type = message.get('type')
-                if msg_type == 'REGISTER':
-                    if self.register_worker(addr):
-                        ack = json.dumps({'type': 'ACK', 'message': 'registered'})
-                        self.socket.sendto(ack.encode('utf-8'), addr)
-                elif msg_type == 'RESULT':
-                    chunk_id = message.get('chunk_id')
-                    result = message.get('result')
-                    self.handle_result(chunk_id, result, addr)
-                elif msg_type == 'HEARTBEAT':
-                    with self.lock:
-                        if addr in self.workers:
-                            self.workers[addr]['last_seen'] = time.time()
-                            self.gui.log_message(f"Heartbeat from {addr}")
+                self.transport.poll()
+                self.check_workers()
+                if self.batch_io:
+                    datagrams = self.reader.read()  # Everything queued, in reused buffers
+                else:
+                    datagrams = [self.socket.recvfrom(65536)]  # Match buffer size
+                for data, addr in datagrams:
+                    self.on_datagram(data, addr)
             except socket.timeout:
                 continue
             except Exception as e:
-                self.gui.log_message(f"Error handling message: {e}")
-    
-    def distribute_work(self, data: List[int]):
-        """Distribute work among available workers"""
-        self.gui.log_message(f"Starting work distribution for {len(data)} elements...")
-        attempts = 0
-        max_attempts = 10
-        while len(self.workers) < 2 and attempts < max_attempts:
-            self.gui.log_message(f"Waiting for 2 workers... ({len(self.workers)} registered)")
-            time.sleep(2)
-            attempts += 1
-        if len(self.workers) < 2:
-            self.gui.log_message(f"Error: Only {len(self.workers)} workers registered. Need 2.")
+                self.events.log_message(f"Error handling message: {e}")
+    
+    def on_datagram(self, data: bytes, addr: Tuple[str, int]):
+        """Feed a datagram through the fragment layer and handle every message it completes"""
+        try:
+            data = self.transport.handle(data, addr)
+            if data is None:
+                return
+            for message in protocol.split_batch(data):
+                self.handle_message(message, addr)
+        except Exception as e:
+            self.events.log_message(f"Error handling message: {e}")
+    
+    def handle_message(self, data: bytes, addr: Tuple[str, int]):
+        """Dispatch one complete message from a worker"""
+        decode_start = time.perf_counter()
+        worker = self.workers.get(addr)
+        session = worker['session'] if worker else None
+        sealed = integrity.is_sealed(data)
+        if sealed:
+            if session is None:
+                # Sealed under a registration we no longer hold: the worker left or was evicted, or we restarted
+                departed = self.departed.get(addr)
+                opened = departed.open(data) if departed is not None else None
+                if opened is not None and protocol.decode_message(opened).get('type') == 'LEAVE':
+                    self.send_left(addr)  # A repeated LEAVE whose LEFT was lost
+                else:
+                    self.send_control(addr, 'REJOIN')
+                return
+            data = session.open(data)
+            if data is None:
+                self.reject_message(addr, "failed its integrity check")
+                return
+        message = protocol.decode_message(data)
+        msg_type = message.get('type')
+        if worker is None and self.integrity_modes and msg_type != 'REGISTER':
+            # Nothing vouches for an unregistered sender; an evicted worker is only asked to register again
+            if msg_type == 'HEARTBEAT':
+                self.send_control(addr, 'REJOIN')
+            else:
+                self.reject_message(addr, f"{msg_type} from an unregistered address")
+            return
+        if session is not None and not sealed and msg_type != 'REGISTER':
+            self.reject_message(addr, f"{msg_type} was not sealed")
             return
-        self.gui.log_message(f"Found {len(self.workers)} workers")
-        num_workers = len(self.workers)
-        chunks = self.split_data(data, num_workers * (len(data) // self.max_chunk_size + 1))  # More chunks for smaller sizes
-        worker_addrs = list(self.workers.keys())
-        start_time = time.time()
-        for i, chunk in enumerate(chunks):
-            worker_addr = worker_addrs[i % len(worker_addrs)]
-            chunk_id = self.task_counter
-            self.task_counter += 1
-            self.send_task(worker_addr, chunk_id, chunk)
-        self.gui.log_message(f"Waiting for {len(chunks)} tasks to complete...")
-        while len(self.completed_tasks) < len(chunks):
-            time.sleep(0.5)
-            current_time = time.time()
+        if msg_type in ('RESULT', 'TASK_ERROR', 'HEARTBEAT'):
+            self.track_sequence(addr, message.get('seq'))
+        if msg_type == 'REGISTER':
+            # Replies echo the worker's nonce: it only believes ACKs and ERRORs that answer its own REGISTER
+            worker_nonce = message.get('nonce')
+            version = message.get('wire_version', 1)
+            if version != protocol.WIRE_VERSION:
+                # Older workers cannot tag results with a job id
+                self.events.log_message(f"Rejected worker {addr}: wire version {version}, need {protocol.WIRE_VERSION}")
+                error = json.dumps({'type': 'ERROR', 'message': f"wire version {protocol.WIRE_VERSION} required",
+                                    'worker_nonce': worker_nonce})
+                self.transport.send(error.encode('utf-8'), addr)
+                return
+            wire_format = protocol.negotiate_format(message.get('formats'))
+            fragments = bool(message.get('fragments'))
+            batch = self.batch_io and bool(message.get('batch'))
+            codecs = compression.negotiate_codecs(message.get('codecs')) if self.compression else []
+            try:
+                session, session_fields = self.new_session(message)
+            except ValueError as e:
+                self.events.log_message(f"Rejected worker {addr}: {e}")
+                error = json.dumps({'type': 'ERROR', 'message': str(e), 'worker_nonce': worker_nonce})
+                self.transport.send(error.encode('utf-8'), addr)
+                return
+            if worker is not None and worker['session'] is not None and (
+                    session is None or (worker['session'].keyed and not session.keyed)):
+                # Anyone can send a REGISTER from a worker's address; it may not weaken the seal the worker holds
+                self.reject_message(addr, f"REGISTER would downgrade the {worker['session'].mode} seal")
+                return
+            self.register_worker(addr, wire_format, fragments, message.get('credits', 1), message.get('cores', 1),
+                                 message.get('operations'), batch, message.get('heartbeat_interval', 5.0), codecs, session)
+            ack = json.dumps(dict(session_fields, type='ACK', message='registered', format=wire_format, fragments=fragments,
+                                  batch=batch, codecs=codecs, worker_nonce=worker_nonce))
+            self.transport.send(ack.encode('utf-8'), addr)
+        elif msg_type == 'RESULT':
+            chunk_id = message.get('chunk_id')
+            result = message.get('result')
+            timings = {'recv_time': message.get('recv_time'), 'compute_time': message.get('compute_time'),
+                       'codec_time': message.get('codec_time')}
+            self.metrics.observe('result_decode_seconds', time.perf_counter() - decode_start)
+            self.handle_result(message.get('job_id', 0), chunk_id, result, addr, message.get('credits'), timings)
+        elif msg_type == 'TASK_ERROR':
+            self.handle_task_error(message.get('job_id', 0), message.get('chunk_id'), str(message.get('error')), addr)
+        elif msg_type == 'HEARTBEAT':
+            now = time.time()
+            with self.lock:
+                worker = self.workers.get(addr)
+                if worker is not None:
+                    worker['last_seen'] = now
+                    worker['detector'].heartbeat(now)
+                    self.events.log_message(f"Heartbeat from {addr}")
+            if worker is None:
+                # Evicted (or the coordinator restarted): ask the worker to register again
+                self.send_control(addr, 'REJOIN')
+        elif msg_type == 'LEAVE':
             with self.lock:
-                for chunk_id, task_info in list(self.pending_tasks.items()):
-                    if current_time - task_info['sent_time'] > 30:
-                        self.gui.log_message(f"Task {chunk_id} timed out, reassigning...")
-                        self.send_task(task_info['worker'], chunk_id, task_info['data'])
-        end_time = time.time()
-        processing_time = end_time - start_time
-        self.aggregate_results(processing_time)
-    
-    def aggregate_results(self, processing_time: float):
-        """Aggregate results from all workers"""
-        total_sum = 0
-        total_count = 0
-        min_val = float('inf')
-        max_val = float('-inf')
-        for chunk_id in sorted(self.completed_tasks.keys()):
-            result = self.completed_tasks[chunk_id]
-            total_sum += result['sum']
-            total_count += result['count']
-            min_val = min(min_val, result['min'])
-            max_val = max(max_val, result['max'])
-        average = total_sum / total_count if total_count > 0 else 0
-        self.gui.update_final_result({
-            'total_sum': total_sum,
+                worker = self.workers.get(addr)
+                if worker is not None and not worker['draining']:
+                    worker['draining'] = True
+                    self.events.log_message(f"Worker {addr} is leaving; draining {len(worker['inflight'])} in-flight tasks")
+                left = worker is None or self.retire_worker(addr)
+            if left:
+                self.send_left(addr)  # Also answers repeated LEAVEs whose LEFT was lost
+    
+    def new_session(self, register: dict) -> Tuple[Optional[integrity.Session], dict]:
+        """Negotiate a worker's seal from its REGISTER: the session and the ACK fields that set it up.
+        
+        Keys depend only on the worker's nonce and ours, so a REGISTER retransmitted
+        after a lost ACK gets the same key. Raises ValueError to refuse the worker."""
+        mode = integrity.negotiate_mode(self.integrity_modes, register.get('integrity'))
+        nonce = register.get('nonce')
+        if self.secret is not None:
+            if mode not in integrity.KEYED_MODES or not isinstance(nonce, str):
+                raise ValueError("authentication required")
+            if not integrity.check_proof(self.secret, register.get('proof'), 'register', nonce):
+                raise ValueError("authentication failed")
+            key = integrity.derive_key(self.secret, nonce, self.session_nonce)
+            return integrity.Session(mode, key), {'integrity': mode, 'nonce': self.session_nonce,
+                                                  'proof': integrity.proof(key, 'ack', nonce, self.session_nonce)}
+        if mode in integrity.KEYED_MODES and isinstance(nonce, str):
+            key = integrity.derive_key(self.session_secret, nonce, self.session_nonce)
+            return integrity.Session(mode, key), {'integrity': mode, 'key': key.hex()}
+        if mode == 'crc32':
+            return integrity.Session(mode), {'integrity': mode}
+        return None, {}
+    
+    def reject_message(self, worker_addr: Tuple[str, int], reason: str):
+        """Drop a message that cannot be trusted"""
+        self.metrics.inc('messages_rejected_total')
+        self.events.log_message(f"Dropped a message from {worker_addr}: {reason}")
+    
+    def track_sequence(self, worker_addr: Tuple[str, int], seq: Optional[int]):
+        """Infer lost worker datagrams from gaps in their sequence numbers"""
+        if seq is None:
+            return  # Older workers do not number their datagrams
+        with self.lock:
+            worker = self.workers.get(worker_addr)
+            if worker is None:
+                return
+            last = worker['last_seq']
+            if last is None or seq > last:
+                gap = seq - last - 1 if last is not None else 0
+                worker['dropped'] += gap
+                self.datagrams_dropped += gap
+                worker['last_seq'] = seq
+            else:
+                # Counted as a gap when a later one overtook it
+                worker['dropped'] -= 1
+                self.datagrams_dropped -= 1
+                self.datagrams_reordered += 1
+    
+    def collect_metrics(self) -> List[metrics.Family]:
+        """Gauges and totals read from coordinator state at scrape time"""
+        with self.lock:
+            running = list(self.jobs.values())
+            workers = [(f"{host}:{port}", worker) for (host, port), worker in self.workers.items()]
+            families = [
+                ('chunks_total', 'counter', "Chunks carved from datasets", [({}, self.task_counter)]),
+                ('task_retransmits_total', 'counter', "Tasks requeued after a timeout or an eviction", [({}, self.retransmits)]),
+                ('fragment_retransmits_total', 'counter', "Fragments resent by the transport", [({}, self.transport.retransmits)]),
+                ('datagrams_dropped_total', 'counter', "Worker datagrams inferred lost from sequence gaps",
+                 [({}, self.datagrams_dropped)]),
+                ('datagrams_reordered_total', 'counter', "Worker datagrams that arrived after a later one",
+                 [({}, self.datagrams_reordered)]),
+                ('socket_reads_total', 'counter', "Datagrams read by the batched reader", [({}, self.reader.reads)]),
+                ('socket_wakeups_total', 'counter', "Blocking reads that returned data", [({}, self.reader.wakeups)]),
+                ('jobs_running', 'gauge', "Jobs admitted to the worker pool", [({}, len(running))]),
+                ('jobs_queued', 'gauge', "Jobs waiting to be admitted", [({}, len(self.job_queue))]),
+                ('tasks_inflight', 'gauge', "Chunks dispatched and awaiting a result",
+                 [({'job': str(job.job_id)}, len(job.pending_tasks)) for job in running]),
+                ('tasks_requeued', 'gauge', "Chunks waiting to be dispatched again",
+                 [({'job': str(job.job_id)}, len(job.task_queue)) for job in running]),
+                ('job_elements_remaining', 'gauge', "Elements not yet folded into the job's result",
+                 [({'job': str(job.job_id)}, len(job.dataset) - job.completed_elements) for job in running]),
+                ('workers', 'gauge', "Registered workers", [({}, len(workers))]),
+                ('worker_throughput_elements', 'gauge', "Worker elements/second (EWMA)",
+                 [({'worker': name}, worker['throughput'] or 0.0) for name, worker in workers]),
+                ('worker_inflight_tasks', 'gauge', "Tasks on the worker",
+                 [({'worker': name}, len(worker['inflight'])) for name, worker in workers]),
+                ('worker_srtt_seconds', 'gauge', "Smoothed dispatch-to-result time",
+                 [({'worker': name}, worker['srtt'] or 0.0) for name, worker in workers]),
+                ('worker_tasks_completed_total', 'counter', "Tasks completed by the worker",
+                 [({'worker': name}, worker['tasks_completed']) for name, worker in workers]),
+                ('worker_datagrams_dropped_total', 'counter', "Datagrams from the worker inferred lost",
+                 [({'worker': name}, worker['dropped']) for name, worker in workers]),
+            ]
+            if self.result_cache is not None:
+                families.append(('result_cache_hits_total', 'counter', "Chunks served from the result cache",
+                                 [({}, self.result_cache.hits)]))
+                families.append(('result_cache_misses_total', 'counter', "Chunks the result cache did not have",
+                                 [({}, self.result_cache.misses)]))
+        return families
+    
+    def start_metrics_server(self, port: int = 9100, host: str = '127.0.0.1'):
+        """Serve /metrics (Prometheus text) and /metrics.json over HTTP"""
+        try:
+            self.metrics_server = metrics.MetricsServer(self.metrics, host, port)
+        except OSError as e:
+            self.events.log_message(f"Error: Cannot serve metrics on {host}:{port}: {e}")
+            return
+        host, port = self.metrics_server.address[:2]
+        self.events.log_message(f"Metrics at http://{host}:{port}/metrics and /metrics.json")
+    
+    def process_file(self, job: jobs.Job, path: str, dtype: Optional[str] = None):
+        """Map a dataset file and submit it"""
+        try:
+            stat = os.stat(path)
+            data = dataset.open_dataset(path, dtype)
+        except (OSError, ValueError) as e:
+            self.events.log_message(f"Error opening dataset {path}: {e}")
+            job.finish(error=str(e))
+            return
+        self.events.log_message(f"Mapped {path} ({len(data):,} {data.typecode} elements)")
+        # A checkpoint only resumes over the same file contents, as far as size and mtime tell
+        job.source.update(size=stat.st_size, mtime_ns=stat.st_mtime_ns)
+        self.distribute_work(job, data)
+    
+    def distribute_work(self, job: jobs.Job, data):
+        """Queue a job for the worker pool once min_workers have registered; data is an array or a MappedDataset"""
+        self.events.log_message(f"Job {job.job_id}: {len(data):,} elements submitted ({job.operation}, priority {job.priority})")
+        job.load(data)
+        if job.checkpoint is not None and not self.resume_job(job):
+            return
+        with self.lock:
+            if len(self.workers) < self.min_workers:
+                self.events.log_message(f"Waiting for {self.min_workers} workers... ({len(self.workers)} registered)")
+            if not self.membership.wait_for(lambda: len(self.workers) >= self.min_workers, self.worker_wait_timeout):
+                self.events.log_message(f"Error: Only {len(self.workers)} workers registered. Need {self.min_workers}.")
+                error = f"only {len(self.workers)} of {self.min_workers} workers registered"
+            else:
+                error = None
+                idle = not self.jobs and not self.job_queue
+                self.job_queue.append(job)
+        if error:
+            job.finish(error=error)
+            return
+        if idle:
+            self.events.clear_results()
+        self.notify_work()
+    
+    def resume_job(self, job: jobs.Job) -> bool:
+        """Skip whatever the job's checkpoint already completed and start logging; False if the checkpoint is unusable"""
+        header = {'operation': job.operation, 'params': job.params, 'typecode': job.typecode,
+                  'length': len(job.dataset), 'source': job.source}
+        log = job.checkpoint
+        resuming = log.header is not None
+        source = log.header.get('source') if resuming else None
+        try:
+            if source and job.source and source.get('path') == job.source.get('path') and source != job.source:
+                raise ValueError(f"Dataset {job.source['path']} changed since checkpoint {log.path} was written")
+            log.start(header)
+        except (OSError, ValueError) as e:
+            self.events.log_message(f"Error: {e}")
+            job.finish(error=str(e))
+            return False
+        if resuming:
+            job.resume(log.spans, log.accumulator, log.completed_count)
+            self.events.log_message(f"Job {job.job_id} resumed from {log.path}: {job.completed_elements:,} of "
+                                    f"{len(job.dataset):,} elements already processed")
+        return True
+    
+    def finish_job(self, job: jobs.Job):
+        if job.checkpoint is not None:
+            try:
+                job.checkpoint.remove()
+            except OSError as e:
+                self.events.log_message(f"Error removing checkpoint {job.checkpoint.path}: {e}")
+        self.events.update_running_totals(self.running_totals(job))
+        job.finish(self.aggregate_results(job, job.elapsed()))
+        if self.result_cache is not None:
+            try:
+                with self.lock:
+                    self.result_cache.save()
+            except OSError as e:
+                self.events.log_message(f"Error saving result cache: {e}")
+    
+    def aggregate_results(self, job: jobs.Job, processing_time: float) -> dict:
+        """Finalize the running accumulator that handle_result folded every chunk of a job into"""
+        op = operations.get_operation(job.operation)
+        params = op.params(job.params)
+        with self.lock:
+            merged = job.accumulator
+        final = op.finalize(merged, params) if merged is not None else {'count': 0}
+        total_count = final['count']
+        summary = {
+            'job_id': job.job_id,
+            'operation': job.operation,
+            'result': final,
             'total_count': total_count,
-            'average': average,
-            'min_val': min_val,
-            'max_val': max_val,
             'processing_time': processing_time,
-            'throughput': total_count / processing_time if processing_time > 0 else 0
-        })
-        self.gui.log_message(f"Processing complete in {processing_time:.2f} seconds")
-    
-    def start_processing(self, dataset_size: int):
-        """Start processing in a separate thread"""
-        self.dataset_size = dataset_size
-        self.completed_tasks.clear()
-        self.pending_tasks.clear()
-        self.task_counter = 0
-        self.gui.clear_results()
-        threading.Thread(target=self.distribute_work, args=(self.generate_sample_data(self.dataset_size),), daemon=True).start()
+            'throughput': total_count / processing_time if processing_time > 0 else 0,
+            'cache_hits': job.cache_hits
+        }
+        if job.operation == 'sum_and_stats' and total_count:
+            summary.update({
+                'total_sum': final['sum'],
+                'average': final['average'],
+                'min_val': final['min'],
+                'max_val': final['max']
+            })
+        self.events.update_final_result(summary)
+        self.events.log_message(f"Job {job.job_id} complete in {processing_time:.2f} seconds ({job.retransmits} retransmits, {job.task_counter} chunks, {job.cache_hits} from cache)")
+        for worker_addr, worker in list(self.workers.items()):
+            if worker['throughput']:
+                self.events.log_message(f"Worker {worker_addr}: {worker['tasks_completed']} tasks, {worker['throughput']:.0f} elements/second "
+                                     f"(receive {worker['recv_time']:.3f} s, compute {worker['compute_time']:.3f} s)")
+            if worker['codecs'] and worker['wire_bytes']:
+                self.events.log_message(f"Worker {worker_addr}: tasks compressed {worker['raw_bytes'] / worker['wire_bytes']:.2f}x "
+                                        f"(encode {worker['encode_time']:.3f} s, decode {worker['codec_time']:.3f} s)")
+        return summary
+    
+    def start_processing(self, dataset_size: int, operation: str = 'sum_and_stats', params: Dict[str, Any] = None,
+                         path: Optional[str] = None, dtype: Optional[str] = None, priority: int = 0,
+                         checkpoint_path: Optional[str] = None) -> jobs.Job:
+        """Submit a job; with a path the dataset is memory-mapped from that file.
+        
+        Jobs already running are not disturbed: the new one is queued and shares the
+        worker pool with them. With a checkpoint_path the job logs its progress there
+        and, if the file is left over from an interrupted run of the same job, only
+        computes what that run had not. Returns the Job; join() waits for its summary."""
+        job = self.new_job(operation, params, priority)
+        seed = None
+        if checkpoint_path:
+            job.checkpoint = checkpoint.JobCheckpoint(checkpoint_path, self.checkpoint_interval)
+            job.checkpoint.load()
+            # Generated data is regenerated from the interrupted run's seed
+            seed = (job.checkpoint.header or {}).get('source', {}).get('seed', random.randrange(1 << 63))
+        if path:
+            job.source = {'path': os.path.abspath(path), 'dtype': dtype}
+            thread = threading.Thread(target=self.process_file, args=(job, path, dtype), daemon=True)
+        else:
+            job.source = {'size': dataset_size, 'seed': seed}
+            data = self.generate_sample_data(dataset_size, seed)
+            thread = threading.Thread(target=self.distribute_work, args=(job, data), daemon=True)
+        thread.start()
+        return job
+    
+    def submit(self, data, operation: str = 'sum_and_stats', params: Dict[str, Any] = None, priority: int = 0) -> jobs.Job:
+        """Submit an array (or MappedDataset) already in memory as a job"""
+        job = self.new_job(operation, params, priority)
+        threading.Thread(target=self.distribute_work, args=(job, data), daemon=True).start()
+        return job
+    
+    def new_job(self, operation: str, params: Dict[str, Any] = None, priority: int = 0) -> jobs.Job:
+        operations.get_operation(operation).params(params)  # Raises ValueError for unknown operations or bad parameters
+        with self.lock:
+            job = jobs.Job(self.next_job_id, operation, params, priority)
+            self.next_job_id += 1
+        return job
+
+class _CoordinatorProtocol(asyncio.DatagramProtocol):
+    def __init__(self, coordinator):
+        self.coordinator = coordinator
+    
+    def datagram_received(self, data: bytes, addr: Tuple[str, int]):
+        self.coordinator.on_datagram(data, addr)
+        self.coordinator.drain_socket()
+    
+    def error_received(self, exc: Exception):
+        self.coordinator.events.log_message(f"Socket error: {exc}")
+
+class AsyncDataCoordinator(DataCoordinator):
+    """Coordinator engine on one asyncio event loop.
+    
+    Datagrams are handled by a DatagramProtocol as they arrive, and dispatch,
+    task timeouts and transport retransmits run on loop timers, so no thread
+    blocks on the socket or sleep-polls. Messages are unchanged, so existing
+    workers interoperate with either engine."""
+    
+    def __init__(self, events: events.EventSink, host: Optional[str] = None, port: int = 9999):
+        super().__init__(events, host, port)
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.loop_thread: Optional[int] = None
+        self.wake: Optional[asyncio.Event] = None
+        self.ready = threading.Event()  # Set once the loop is serving
+        self.send_batch = 16  # Tasks sent before yielding so arriving results are read
+    
+    def listen_for_messages(self):
+        """Run the event loop in the calling thread"""
+        if not self.socket:
+            self.events.log_message("Cannot listen: Socket not initialized")
+            return
+        asyncio.run(self.serve())
+    
+    async def serve(self):
+        self.loop = asyncio.get_running_loop()
+        self.loop_thread = threading.get_ident()
+        self.wake = asyncio.Event()
+        endpoint, _ = await self.loop.create_datagram_endpoint(lambda: _CoordinatorProtocol(self), sock=self.socket)
+        self.transport.socket = endpoint  # Fragment sends go through the loop's buffered transport
+        self.poll_transport()
+        dispatcher = self.loop.create_task(self.dispatcher())
+        self.ready.set()
+        try:
+            await self.loop.create_future()  # Serve until the loop is stopped
+        finally:
+            dispatcher.cancel()
+            endpoint.close()
+    
+    def poll_transport(self):
+        self.transport.poll()
+        self.check_workers()
+        self.loop.call_later(self.transport.poll_interval, self.poll_transport)
+    
+    def drain_socket(self):
+        """Handle whatever else is queued now instead of one datagram per loop iteration"""
+        if not self.batch_io:
+            return
+        try:
+            datagrams = self.reader.drain()
+        except OSError as e:
+            self.events.log_message(f"Socket error: {e}")
+            return
+        for data, addr in datagrams:
+            self.on_datagram(data, addr)
+    
+    def notify_work(self):
+        if self.wake is None:
+            return
+        if threading.get_ident() == self.loop_thread:
+            self.wake.set()  # Results and registrations arrive on the loop thread
+        else:
+            self.loop.call_soon_threadsafe(self.wake.set)  # Job submissions do not
+    
+    async def wait_for_wake(self, timeout: Optional[float]):
+        try:
+            await asyncio.wait_for(self.wake.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+    
+    async def dispatcher(self):
+        """dispatch_loop on the event loop"""
+        while True:
+            try:
+                self.complete_jobs()
+                await self.dispatch()
+                await self.wait_for_wake(self.next_deadline())
+                self.report_progress()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.events.log_message(f"Error in dispatcher: {e}")
+    
+    async def dispatch(self) -> int:
+        """schedule() that yields to the loop every send_batch sends"""
+        self.wake.clear()  # Results read while we send wake the next wait
+        outstanding, data_chunks = self.plan_dispatch()
+        for start in range(0, len(data_chunks), self.send_batch):
+            if start:
+                await asyncio.sleep(0)
+            self.send_tasks(data_chunks[start:start + self.send_batch])
+        return outstanding
+
+ENGINES = {'asyncio': AsyncDataCoordinator, 'threads': DataCoordinator}
 
 class CoordinatorGUI:
-    def __init__(self, root):
+    MAX_LOG_LINES = 1000  # Older log lines and result rows are dropped
+    MAX_RESULT_ROWS = 500
+    
+    def __init__(self, root, engine: str = 'asyncio', args: Optional[argparse.Namespace] = None):
+        """With args (the parsed command line) the coordinator is set up as a headless one would be"""
         self.root = root
+        self.running_jobs: Dict[int, dict] = {}  # job_id -> latest running totals
         self.root.title("Distributed Data Processing - Coordinator")
         self.root.geometry("900x700")
         # Create widgets before initializing coordinator
         self.create_widgets()
-        # Initialize coordinator after GUI widgets are set up
-        self.coordinator = DataCoordinator(self)
+        # Initialize coordinator after GUI widgets are set up; its events reach the widgets through the Tk thread
+        self.events = events.QueueSink(self)
+        self.coordinator = ENGINES[engine](self.events, *((args.host, args.port) if args else ()))
+        self.events.pump(self.root)
+        self.checkpoint_path: Optional[str] = args.checkpoint if args else None  # Progress log for jobs started here
+        self.checkpoint_job: Optional[jobs.Job] = None  # The running job that holds it
+        if args:
+            self.min_workers_entry.delete(0, "end")
+            self.min_workers_entry.insert(0, str(args.min_workers))
+            if self.coordinator.socket:
+                configure(self.coordinator, args)  # Before the first REGISTER can arrive
         threading.Thread(target=self.coordinator.listen_for_messages, daemon=True).start()
     
     def create_widgets(self):
@@ -249,9 +1315,40 @@ class CoordinatorGUI:
         self.dataset_entry.insert(0, "100000")
         self.dataset_entry.pack(side="left", padx=5)
         
+        self.operation_label = ctk.CTkLabel(self.control_frame, text="Operation:")
+        self.operation_label.pack(side="left", padx=5)
+        self.operation_menu = ctk.CTkOptionMenu(self.control_frame, values=operations.SUPPORTED_OPERATIONS, width=150)
+        self.operation_menu.set('sum_and_stats')
+        self.operation_menu.pack(side="left", padx=5)
+        
+        self.min_workers_label = ctk.CTkLabel(self.control_frame, text="Min Workers:")
+        self.min_workers_label.pack(side="left", padx=5)
+        self.min_workers_entry = ctk.CTkEntry(self.control_frame, width=50)
+        self.min_workers_entry.insert(0, "1")
+        self.min_workers_entry.pack(side="left", padx=5)
+        
+        self.priority_label = ctk.CTkLabel(self.control_frame, text="Priority:")
+        self.priority_label.pack(side="left", padx=5)
+        self.priority_entry = ctk.CTkEntry(self.control_frame, width=50)
+        self.priority_entry.insert(0, "0")
+        self.priority_entry.pack(side="left", padx=5)
+        
         self.start_button = ctk.CTkButton(self.control_frame, text="Start Processing", command=self.start_processing)
         self.start_button.pack(side="left", padx=5)
         
+        # Dataset file frame (leave empty to generate random data)
+        self.file_frame = ctk.CTkFrame(self.main_frame)
+        self.file_frame.pack(pady=5, padx=5, fill="x")
+        self.file_label = ctk.CTkLabel(self.file_frame, text="Dataset File:")
+        self.file_label.pack(side="left", padx=5)
+        self.file_entry = ctk.CTkEntry(self.file_frame, width=350, placeholder_text="Optional .csv, .i32, .i64 or .f64 file")
+        self.file_entry.pack(side="left", padx=5)
+        self.browse_button = ctk.CTkButton(self.file_frame, text="Browse", command=self.browse_file, width=80)
+        self.browse_button.pack(side="left", padx=5)
+        self.dtype_menu = ctk.CTkOptionMenu(self.file_frame, values=["auto"] + list(dataset.DTYPE_NAMES), width=100)
+        self.dtype_menu.set("auto")
+        self.dtype_menu.pack(side="left", padx=5)
+        
         # Status log
         self.log_label = ctk.CTkLabel(self.main_frame, text="Status Log:")
         self.log_label.pack(pady=5)
@@ -268,16 +1365,20 @@ class CoordinatorGUI:
         self.progress_bar = ctk.CTkProgressBar(self.main_frame)
         self.progress_bar.set(0)
         self.progress_bar.pack(pady=5, padx=20, fill="x")
+        self.running_label = ctk.CTkLabel(self.main_frame, text="Running Totals: None")
+        self.running_label.pack(pady=5)
         
         # Results table
         self.results_frame = ctk.CTkFrame(self.main_frame)
         self.results_frame.pack(pady=5, padx=10, fill="both", expand=True)
-        self.results_tree = ttk.Treeview(self.results_frame, columns=("Chunk ID", "Sum", "Count", "Min", "Max"), show="headings")
-        self.results_tree.heading("Chunk ID", text="Chunk ID")
+        self.results_tree = ttk.Treeview(self.results_frame, columns=("Chunk ID", "Sum", "Count", "Min", "Max", "Worker", "Throughput"), show="headings")
+        self.results_tree.heading("Chunk ID", text="Job/Chunk")
         self.results_tree.heading("Sum", text="Sum")
         self.results_tree.heading("Count", text="Count")
         self.results_tree.heading("Min", text="Min")
         self.results_tree.heading("Max", text="Max")
+        self.results_tree.heading("Worker", text="Worker")
+        self.results_tree.heading("Throughput", text="Worker Elements/s")
         self.results_tree.pack(fill="both", expand=True)
         
         # Final results
@@ -299,10 +1400,11 @@ class CoordinatorGUI:
     
     def log_message(self, message: str):
         """Add message to status log"""
-        self.log_text.configure(state="normal")
-        self.log_text.insert("end", f"{time.strftime('%H:%M:%S')}: {message}\n")
-        self.log_text.see("end")
-        self.log_text.configure(state="disabled")
+        self.log_lines([f"{time.strftime('%H:%M:%S')}: {message}"])
+    
+    def log_lines(self, lines: List[str]):
+        """Append a frame's worth of timestamped log lines"""
+        events.append_lines(self.log_text, lines, self.MAX_LOG_LINES)
     
     def update_workers(self, workers: List[Tuple[str, int]]):
         """Update workers list"""
@@ -314,44 +1416,224 @@ class CoordinatorGUI:
         self.progress_label.configure(text=f"Tasks: {completed} completed / {total} total")
         self.progress_bar.set(completed / total if total > 0 else 0)
     
-    def add_result(self, chunk_id: int, result: dict):
+    def update_running_totals(self, stats: dict):
+        """Update a job's live running result, rate and ETA"""
+        self.running_jobs[stats.get('job_id', 0)] = stats
+        self.render_running_jobs()
+    
+    def render_running_jobs(self):
+        """One block per running job"""
+        blocks = []
+        for job_id, stats in sorted(self.running_jobs.items()):
+            percent = 100 * stats['processed'] / stats['total'] if stats['total'] else 0
+            eta = f"{stats['eta']:.1f} s" if stats['eta'] is not None else "-"
+            summary = ", ".join(f"{key}: {value:.6g}" if isinstance(value, float) else f"{key}: {value}"
+                                for key, value in stats['result'].items()
+                                if key != 'count' and isinstance(value, (int, float)))
+            blocks.append(
+                f"Job {job_id} ({stats['operation']}): {stats['processed']:,} / {stats['total']:,} elements ({percent:.1f}%), "
+                f"{stats['throughput']:,.0f} elements/s, ETA {eta}" + (f"\n{summary}" if summary else "")
+            )
+        self.running_label.configure(text="Running Totals: " + ("\n".join(blocks) if blocks else "None"))
+    
+    def add_result(self, chunk_id: int, result: dict, worker: Tuple[str, int] = None, throughput: float = None,
+                   job_id: int = 0):
         """Add result to table"""
-        self.results_tree.insert("", "end", values=(chunk_id, result['sum'], result['count'], result['min'], result['max']))
+        self.add_results([(chunk_id, result, worker, throughput, job_id)])
+    
+    def add_results(self, rows: List[tuple]):
+        """Add a frame's worth of results, keeping the newest MAX_RESULT_ROWS rows"""
+        for chunk_id, result, worker, throughput, job_id in rows[-self.MAX_RESULT_ROWS:]:
+            worker_text = f"{worker[0]}:{worker[1]}" if worker else "-"
+            throughput_text = f"{throughput:,.0f}" if throughput else "-"
+            self.results_tree.insert("", "end", values=(f"{job_id}/{chunk_id}", result.get('sum', '-'), result.get('count', '-'), result.get('min', '-'),
+                                                        result.get('max', '-'), worker_text, throughput_text))
+        items = self.results_tree.get_children()
+        if len(items) > self.MAX_RESULT_ROWS:
+            self.results_tree.delete(*items[:len(items) - self.MAX_RESULT_ROWS])
     
     def clear_results(self):
         """Clear results table"""
         for item in self.results_tree.get_children():
             self.results_tree.delete(item)
         self.final_result_label.configure(text="Final Results: None")
+        self.running_jobs.clear()
+        self.running_label.configure(text="Running Totals: None")
     
     def update_final_result(self, result: dict):
-        """Update final aggregated results"""
+        """Show a finished job's aggregated results"""
+        self.running_jobs.pop(result.get('job_id'), None)
+        self.render_running_jobs()
+        if 'total_sum' in result:
+            details = (
+                f"Total Sum: {result['total_sum']:,}\n"
+                f"Average: {result['average']:.2f}\n"
+                f"Minimum: {result['min_val']}\n"
+                f"Maximum: {result['max_val']}\n"
+            )
+        else:
+            details = "".join(f"{key.replace('_', ' ').title()}: {str(value)[:200]}\n"
+                              for key, value in result['result'].items() if key != 'count')
         text = (
-            f"Final Results:\n"
+            f"Final Results (job {result.get('job_id', '-')}, {result['operation']}):\n"
             f"Total Elements: {result['total_count']:,}\n"
-            f"Total Sum: {result['total_sum']:,}\n"
-            f"Average: {result['average']:.2f}\n"
-            f"Minimum: {result['min_val']}\n"
-            f"Maximum: {result['max_val']}\n"
+            f"{details}"
             f"Processing Time: {result['processing_time']:.2f} seconds\n"
             f"Throughput: {result['throughput']:.0f} elements/second"
         )
         self.final_result_label.configure(text=text)
     
+    def browse_file(self):
+        """Pick a dataset file"""
+        path = filedialog.askopenfilename(filetypes=[("Datasets", "*.csv *.txt *.i32 *.i64 *.f64 *.bin"), ("All files", "*")])
+        if path:
+            self.file_entry.delete(0, "end")
+            self.file_entry.insert(0, path)
+    
     def start_processing(self):
-        """Start processing with user-specified dataset size"""
+        """Start processing with user-specified dataset size or file"""
         try:
-            dataset_size = int(self.dataset_entry.get())
-            if dataset_size <= 0:
-                self.log_message("Error: Dataset size must be positive")
-                return
-            self.coordinator.start_processing(dataset_size)
-            self.log_message("Processing started...")
+            self.coordinator.min_workers = max(1, int(self.min_workers_entry.get()))
+            priority = int(self.priority_entry.get())
+        except ValueError:
+            self.log_message("Error: Invalid minimum worker count or priority")
+            return
+        # One job at a time logs to the checkpoint; jobs started while it runs are not checkpointed
+        checkpoint_path = self.checkpoint_path
+        if self.checkpoint_job is not None and not self.checkpoint_job.done.is_set():
+            checkpoint_path = None
+        try:
+            path = self.file_entry.get().strip()
+            dtype = self.dtype_menu.get()
+            if path:
+                job = self.coordinator.start_processing(0, self.operation_menu.get(), path=path,
+                                                        dtype=None if dtype == "auto" else dtype, priority=priority,
+                                                        checkpoint_path=checkpoint_path)
+            else:
+                dataset_size = int(self.dataset_entry.get())
+                if dataset_size <= 0:
+                    self.log_message("Error: Dataset size must be positive")
+                    return
+                job = self.coordinator.start_processing(dataset_size, self.operation_menu.get(), priority=priority,
+                                                        checkpoint_path=checkpoint_path)
+            if checkpoint_path:
+                self.checkpoint_job = job
+            self.log_message(f"Job {job.job_id} queued")
         except ValueError:
             self.log_message("Error: Invalid dataset size")
 
-if __name__ == "__main__":
+def configure(coordinator: DataCoordinator, args):
+    """Apply the command-line options every mode shares to a coordinator"""
+    coordinator.batch_io = args.batch_io
+    coordinator.min_workers = args.min_workers
+    coordinator.compression = args.compression
+    coordinator.link_bandwidth = args.link_mbps * 1e6 / 8
+    coordinator.integrity_modes = [] if args.integrity == 'none' else [args.integrity]
+    coordinator.checkpoint_interval = args.checkpoint_interval
+    if args.cache_size or args.cache_file:
+        coordinator.enable_result_cache(args.cache_size or 4096, args.cache_file)
+    if args.metrics_port:
+        coordinator.start_metrics_server(args.metrics_port)
+    if args.announce:
+        coordinator.start_announcer(args.cluster, args.broadcast)
+
+def run_headless(args) -> int:
+    """Run one job without the GUI and exit when it finishes"""
+    logging.basicConfig(level=args.log_level, format="%(asctime)s %(message)s", datefmt="%H:%M:%S")
+    sink = events.LogSink()
+    coordinator = ENGINES[args.engine](sink, args.host, args.port)
+    if not coordinator.socket:
+        return 1
+    configure(coordinator, args)
+    threading.Thread(target=coordinator.listen_for_messages, daemon=True).start()
+    try:
+        job = coordinator.start_processing(args.size, args.operation, json.loads(args.params), args.file, args.dtype,
+                                           args.priority, args.checkpoint)
+        job.join()
+    except (ValueError, OSError) as e:
+        logging.error("Stopped: %s", e)
+        return 1
+    except KeyboardInterrupt:
+        coordinator.save_checkpoints()  # Rerun with the same --checkpoint to resume
+        logging.error("Stopped: interrupted")
+        return 1
+    finally:
+        if args.metrics_dump:
+            coordinator.metrics.dump(args.metrics_dump)
+    if job.error:
+        logging.error("Job %s failed: %s", job.job_id, job.error)
+    return 0 if job.summary else 1
+
+def run_subcoordinator(args) -> int:
+    """Serve a worker pool as one worker of the root coordinator at --upstream until interrupted"""
+    logging.basicConfig(level=args.log_level, format="%(asctime)s %(message)s", datefmt="%H:%M:%S")
+    coordinator = ENGINES[args.engine](events.LogSink(), args.host, args.port)
+    if not coordinator.socket:
+        return 1
+    configure(coordinator, args)
+    threading.Thread(target=coordinator.listen_for_messages, daemon=True).start()
+    upstream = shard.upstream_worker(coordinator, client.parse_address(args.upstream), credits=args.upstream_credits)
+    thread = upstream.start_connect()
+    try:
+        while thread.is_alive():
+            thread.join(0.5)
+    except KeyboardInterrupt:
+        upstream.leave()  # Ctrl-C finishes the root's chunks we hold before exiting
+        return 0
+    finally:
+        if args.metrics_dump:
+            coordinator.metrics.dump(args.metrics_dump)
+    return 0 if upstream.left.is_set() else 1
+
+def main():
+    parser = argparse.ArgumentParser(description="Distributed data processing coordinator")
+    parser.add_argument("--headless", action="store_true", help="run one job without the GUI, then exit")
+    parser.add_argument("--host", help="address to bind (default: this machine's LAN address)")
+    parser.add_argument("--port", type=int, default=9999)
+    parser.add_argument("--engine", default="asyncio", choices=list(ENGINES), help="coordinator event loop (default: asyncio)")
+    parser.add_argument("--size", type=int, default=100000, help="number of random elements to generate")
+    parser.add_argument("--file", help="dataset file (.csv, .i32, .i64 or .f64) instead of random data")
+    parser.add_argument("--dtype", choices=list(dataset.DTYPE_NAMES))
+    parser.add_argument("--operation", default="sum_and_stats", choices=operations.SUPPORTED_OPERATIONS)
+    parser.add_argument("--params", default="{}", help='operation parameters as JSON, e.g. \'{"k": 5}\'')
+    parser.add_argument("--priority", type=int, default=0, help="job priority; higher runs first when jobs share workers")
+    parser.add_argument("--min-workers", type=int, default=1, help="workers to wait for before starting (others join mid-job)")
+    parser.add_argument("--no-batch-io", dest="batch_io", action="store_false",
+                        help="one recvfrom per datagram and no BATCH coalescing")
+    parser.add_argument("--no-compression", dest="compression", action="store_false",
+                        help="send task payloads uncompressed")
+    parser.add_argument("--link-mbps", type=float, default=100.0,
+                        help="network speed assumed when deciding whether compressing tasks pays off")
+    parser.add_argument("--cache-size", type=int, default=0,
+                        help="cache this many chunk results by content and skip recomputing them (0: off)")
+    parser.add_argument("--cache-file", help="persist the result cache to this file between runs")
+    parser.add_argument("--metrics-port", type=int, default=0,
+                        help="serve Prometheus /metrics and /metrics.json on this local port (0: off)")
+    parser.add_argument("--metrics-dump", help="write the metrics as JSON to this file on exit")
+    parser.add_argument("--no-announce", dest="announce", action="store_false",
+                        help="do not announce this coordinator to workers started without an address")
+    parser.add_argument("--cluster", help="announce under this cluster name; workers started with it ignore other coordinators")
+    parser.add_argument("--broadcast", action="store_true", help="also broadcast announcements, for networks that filter multicast")
+    parser.add_argument("--integrity", default=integrity.SUPPORTED_MODES[0], choices=integrity.SUPPORTED_MODES + ['none'],
+                        help=f"seal worker traffic with this mode (set {integrity.SECRET_ENV} to authenticate workers)")
+    parser.add_argument("--checkpoint", help="log job progress to this file; rerunning with it resumes an interrupted job")
+    parser.add_argument("--checkpoint-interval", type=float, default=5.0, help="seconds between checkpoint records")
+    parser.add_argument("--upstream", help="run as a sub-coordinator of the root coordinator at host[:port]")
+    parser.add_argument("--upstream-credits", type=int, default=4,
+                        help="root chunks a sub-coordinator buffers; each is split over its whole pool")
+    parser.add_argument("--log-level", default="INFO", choices=["DEBUG", "INFO", "WARNING", "ERROR"])
+    args = parser.parse_args()
+    if args.upstream:
+        sys.exit(run_subcoordinator(args))
+    if args.headless or ctk is None:
+        sys.exit(run_headless(args))
     ctk.set_default_color_theme("dark-blue")
     app = ctk.CTk()
-    gui = CoordinatorGUI(app)
-    app.mainloop()
\ No newline at end of file
+    gui = CoordinatorGUI(app, args.engine, args)
+    app.mainloop()
+    gui.coordinator.save_checkpoints()  # Restart with the same --checkpoint to resume
+    if args.metrics_dump:
+        gui.coordinator.metrics.dump(args.metrics_dump)
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
@@ -0,0 +1,60 @@
+from array import array
+from typing import Tuple
+import client
+import compute
+import protocol
+
+# Tiered coordination.
+#
+# A sub-coordinator is an ordinary DataCoordinator with its own worker pool
+# that also registers with a root coordinator as if it were one worker. Each
+# TASK the root sends it becomes a job on its own pool; when the job finishes,
+# the job's merged accumulator goes back up as the TASK's RESULT. The root
+# therefore receives one pre-merged partial per shard-sized chunk, however many
+# workers sit below each sub-coordinator, and the root's receive thread only
+# ever talks to a handful of peers. Tiers nest: a sub-coordinator's workers
+# may themselves be sub-coordinators.
+
+
+class PoolEngine:
+    """Worker engine that runs each task as a job on a coordinator's worker pool"""
+
+    def __init__(self, coordinator):
+        self.coordinator = coordinator
+        self.decoder = compute.PythonBackend()
+
+    def decode(self, payload: memoryview, typecode: str) -> array:
+        """Protocol decode hook: copy the payload out of the reused receive buffer"""
+        return self.decoder.decode(payload, typecode)
+
+    def stage(self, data) -> array:
+        """Stage a decoded sequence (JSON tasks arrive as lists)"""
+        if isinstance(data, array):
+            return data
+        return array('d' if any(isinstance(v, float) for v in data) else 'q', data)
+
+    def submit(self, chunk: array, operation: str, params, callback):
+        """Run a chunk as a job; callback(result, compute_time, error) fires once the job finishes"""
+        try:
+            job = self.coordinator.submit(chunk, operation, params)
+        except ValueError as e:  # Parameters the operation cannot run with
+            callback(None, 0.0, e)
+            return
+
+        def done(job):
+            if job.error is not None:
+                callback(None, 0.0, job.error)
+            elif job.accumulator is None:
+                callback(None, 0.0, "job produced no result")
+            else:
+                callback(job.accumulator, job.elapsed(), None)
+        job.add_done_callback(done)
+
+
+def upstream_worker(coordinator, root_addr: Tuple[str, int], port: int = 0, credits: int = 4) -> client.Worker:
+    """Worker that registers a coordinator with a root coordinator; start it with start_connect()"""
+    upstream = client.Worker(coordinator.events, port=port, formats=[protocol.FORMAT_BINARY])
+    upstream.engine = PoolEngine(coordinator)
+    upstream.credits = max(1, credits)  # Root chunks buffered here, each split over the whole pool
+    upstream.coordinator_addr = root_addr
+    return upstream
@@ -0,0 +1,316 @@
+import errno
+import os
+import socket
+import struct
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Tuple
+import protocol
+
+# Fragmentation layer used underneath the coordinator and the workers.
+#
+# Messages that fit one datagram are sent as-is. Larger ones are split into
+# sequence-numbered FRAG datagrams that share the binary magic/version prefix:
+#   FRAG: magic | version | type | msg id (I) | index (I) | count (I) | bytes
+#   FACK: magic | version | type | msg id (I) | contiguous (I)
+#   NACK: magic | version | type | msg id (I) | missing indices (I...)
+# The sender keeps at most `window` fragments beyond the receiver's
+# cumulative ack in flight; the receiver NACKs gaps selectively and drops
+# partial messages that stall longer than the reassembly timeout. FRAG headers
+# are not authenticated, so a receiver bounds what they can make it allocate:
+# the fragment count of a message, the reassemblies in progress per peer and
+# in total, and (through accept_peer) which peers may start one at all.
+
+FRAG_HEADER = struct.Struct('<2sBBIII')
+ACK_HEADER = struct.Struct('<2sBBII')
+NACK_HEADER = struct.Struct('<2sBBI')
+
+MSG_FRAG = 3
+MSG_FACK = 4
+MSG_NACK = 5
+
+FRAGMENT_SIZE = 8000  # Bytes of payload per fragment
+SEND_WINDOW = 8  # Fragments in flight per message (~64KB, the worker's SO_RCVBUF)
+MAX_NACK_ENTRIES = (protocol.MAX_DATAGRAM - NACK_HEADER.size) // 4
+MAX_PEER_REASSEMBLIES = 32  # Above any worker's credits, so every buffered task can be in transit
+MAX_REASSEMBLIES = 1024
+
+
+class _Outgoing:
+    __slots__ = ('addr', 'frames', 'acked', 'next_index', 'last_progress', 'retries')
+
+    def __init__(self, addr, frames):
+        self.addr = addr
+        self.frames = frames
+        self.acked = 0  # Receiver's cumulative ack
+        self.next_index = 0  # First fragment never sent
+        self.last_progress = time.time()
+        self.retries = 0
+
+
+class _Incoming:
+    __slots__ = ('parts', 'received', 'contiguous', 'highest', 'first_seen', 'last_seen', 'last_nack')
+
+    def __init__(self, count):
+        self.parts = [None] * count
+        self.received = 0
+        self.contiguous = 0
+        self.highest = 0
+        self.first_seen = self.last_seen = time.time()
+        self.last_nack = 0.0
+
+
+class FragmentTransport:
+    """Reliable fragmentation/reassembly for messages larger than one datagram"""
+
+    def __init__(self, sock: socket.socket, window: int = SEND_WINDOW, fragment_size: int = FRAGMENT_SIZE,
+                 retransmit_timeout: float = 0.2, reassembly_timeout: float = 10.0, max_retries: int = 20,
+                 poll_interval: float = 0.05, max_message_size: Optional[int] = None):
+        self.socket = sock
+        self.window = window
+        self.fragment_size = fragment_size
+        self.retransmit_timeout = retransmit_timeout
+        self.reassembly_timeout = reassembly_timeout
+        self.max_retries = max_retries
+        self.poll_interval = poll_interval
+        self.max_message_size = max_message_size or protocol.max_message_size()
+        self.max_peer_reassemblies = MAX_PEER_REASSEMBLIES
+        self.max_reassemblies = MAX_REASSEMBLIES
+        self.accept_peer: Optional[Callable[[Tuple[str, int]], bool]] = None  # May this peer start a reassembly?
+        self.last_poll = 0.0
+        self.lock = threading.Lock()
+        # Random start, so a restarted peer's ids do not collide with the ones a receiver saw before
+        self.next_msg_id = int.from_bytes(os.urandom(4), 'little') or 1
+        self.outgoing: Dict[Tuple[Tuple[str, int], int], _Outgoing] = {}
+        self.incoming: Dict[Tuple[Tuple[str, int], int], _Incoming] = {}
+        self.peer_reassemblies: Dict[Tuple[str, int], int] = {}  # Entries of incoming per peer
+        self.completed = OrderedDict()  # Recently reassembled messages, to re-ack duplicates
+        self.retransmits = 0
+        self.last_reassembly_time = 0.0  # First-to-last fragment time of the last message returned by handle()
+
+    def send(self, payload: bytes, addr: Tuple[str, int]):
+        """Send a message, fragmenting it if it does not fit one datagram"""
+        if len(payload) <= protocol.MAX_DATAGRAM:
+            self.socket.sendto(payload, addr)
+            return
+        view = memoryview(payload)
+        count = (len(payload) + self.fragment_size - 1) // self.fragment_size
+        with self.lock:
+            msg_id = self.next_msg_id
+            self.next_msg_id = (self.next_msg_id + 1) & 0xFFFFFFFF or 1
+            frames = [
+                FRAG_HEADER.pack(protocol.MAGIC, protocol.WIRE_VERSION, MSG_FRAG, msg_id, index, count)
+                + view[index * self.fragment_size:(index + 1) * self.fragment_size]
+                for index in range(count)
+            ]
+            state = _Outgoing(addr, frames)
+            self.outgoing[(addr, msg_id)] = state
+            self._fill_window(state)
+
+    @property
+    def max_fragments(self) -> int:
+        return -(-self.max_message_size // self.fragment_size)
+
+    def forget(self, addr: Tuple[str, int]):
+        """Drop receive state for a peer that restarted, so its new messages are not taken for duplicates"""
+        with self.lock:
+            for key in [key for key in self.completed if key[0] == addr]:
+                del self.completed[key]
+            for key in [key for key in self.incoming if key[0] == addr]:
+                self._drop_incoming(key)
+
+    def handle(self, datagram: bytes, addr: Tuple[str, int]) -> Optional[bytes]:
+        """Feed a received datagram through the layer.
+
+        Returns the datagram itself if it is not a fragment-layer frame, the
+        reassembled message once its last fragment arrives, or None."""
+        self.last_reassembly_time = 0.0
+        if len(datagram) < 4 or not protocol.is_binary(datagram):
+            return datagram
+        msg_type = datagram[3]
+        if msg_type == MSG_FRAG:
+            return self._on_fragment(datagram, addr)
+        if msg_type == MSG_FACK:
+            _, _, _, msg_id, contiguous = ACK_HEADER.unpack_from(datagram)
+            self._on_ack(addr, msg_id, contiguous)
+            return None
+        if msg_type == MSG_NACK:
+            _, _, _, msg_id = NACK_HEADER.unpack_from(datagram)
+            count = (len(datagram) - NACK_HEADER.size) // 4
+            self._on_nack(addr, msg_id, struct.unpack_from(f'<{count}I', datagram, NACK_HEADER.size))
+            return None
+        return datagram
+
+    def poll(self):
+        """Retransmit stalled sends, NACK stalled receives and expire old state"""
+        now = time.time()
+        if now - self.last_poll < self.poll_interval:
+            return
+        self.last_poll = now
+        with self.lock:
+            for key, state in list(self.outgoing.items()):
+                if now - state.last_progress < self.retransmit_timeout * (1 << min(state.retries, 5)):
+                    continue
+                state.retries += 1
+                if state.retries > self.max_retries:
+                    del self.outgoing[key]
+                    continue
+                # Probe with the last fragment sent; the receiver answers with its ack and gaps
+                self._send_frame(state, max(state.next_index - 1, state.acked))
+                self.retransmits += 1
+            for key, state in list(self.incoming.items()):
+                if now - state.last_seen > self.reassembly_timeout:
+                    self._drop_incoming(key)
+                elif now - state.last_seen > self.retransmit_timeout and now - state.last_nack > self.retransmit_timeout:
+                    self._send_nack(key, state, len(state.parts))
+
+    def _fill_window(self, state: _Outgoing):
+        limit = min(len(state.frames), state.acked + self.window)
+        while state.next_index < limit:
+            self._send_frame(state, state.next_index)
+            state.next_index += 1
+
+    def _send_frame(self, state: _Outgoing, index: int):
+        try:
+            self.socket.sendto(state.frames[index], state.addr)
+        except OSError:
+            pass  # Treated like a lost datagram; the retransmit timer recovers
+
+    def _on_ack(self, addr, msg_id: int, contiguous: int):
+        with self.lock:
+            state = self.outgoing.get((addr, msg_id))
+            if state is None:
+                return
+            if contiguous >= len(state.frames):
+                del self.outgoing[(addr, msg_id)]
+                return
+            if contiguous > state.acked:
+                state.acked = contiguous
+                state.last_progress = time.time()
+                state.retries = 0
+            self._fill_window(state)
+
+    def _on_nack(self, addr, msg_id: int, missing):
+        with self.lock:
+            state = self.outgoing.get((addr, msg_id))
+            if state is None:
+                return
+            for index in missing:
+                if index < state.next_index:
+                    self._send_frame(state, index)
+                    self.retransmits += 1
+            state.last_progress = time.time()
+
+    def _on_fragment(self, datagram: bytes, addr) -> Optional[bytes]:
+        _, _, _, msg_id, index, count = FRAG_HEADER.unpack_from(datagram)
+        if not 0 < count <= self.max_fragments or index >= count:
+            return None  # Larger than any legal message: never allocate for it
+        key = (addr, msg_id)
+        with self.lock:
+            if key in self.completed:
+                self._send_ack(key, count)
+                return None
+            state = self.incoming.get(key)
+            if state is None:
+                if self.accept_peer is not None and not self.accept_peer(addr):
+                    return None
+                if (len(self.incoming) >= self.max_reassemblies
+                        or self.peer_reassemblies.get(addr, 0) >= self.max_peer_reassemblies):
+                    return None  # Dropped like a lost fragment; the sender retransmits
+                state = self.incoming[key] = _Incoming(count)
+                self.peer_reassemblies[addr] = self.peer_reassemblies.get(addr, 0) + 1
+            if count != len(state.parts):
+                return None
+            state.last_seen = time.time()
+            previous = state.contiguous
+            if state.parts[index] is None:
+                state.parts[index] = bytes(datagram[FRAG_HEADER.size:])  # Datagrams may live in reused buffers
+                state.received += 1
+                while state.contiguous < count and state.parts[state.contiguous] is not None:
+                    state.contiguous += 1
+            state.highest = max(state.highest, index + 1)
+            if state.received == count:
+                self._drop_incoming(key)
+                self.completed[key] = True
+                if len(self.completed) > 1024:
+                    self.completed.popitem(last=False)
+                self._send_ack(key, count)
+                self.last_reassembly_time = state.last_seen - state.first_seen
+                return b''.join(state.parts)
+            if state.highest > state.contiguous + 1 and state.last_seen - state.last_nack > self.retransmit_timeout:
+                self._send_nack(key, state, state.highest)
+            elif state.contiguous - previous != 1 or state.contiguous % max(1, self.window // 2) == 0:
+                # Ack every half window, after a gap fills and on duplicates (sender probes)
+                self._send_ack(key, state.contiguous)
+            return None
+
+    def _drop_incoming(self, key):
+        del self.incoming[key]
+        addr = key[0]
+        remaining = self.peer_reassemblies.pop(addr) - 1
+        if remaining:
+            self.peer_reassemblies[addr] = remaining
+
+    def _send_ack(self, key, contiguous: int):
+        addr, msg_id = key
+        try:
+            self.socket.sendto(ACK_HEADER.pack(protocol.MAGIC, protocol.WIRE_VERSION, MSG_FACK, msg_id, contiguous), addr)
+        except OSError:
+            pass
+
+    def _send_nack(self, key, state: _Incoming, upto: int):
+        addr, msg_id = key
+        missing = [i for i in range(state.contiguous, upto) if state.parts[i] is None][:MAX_NACK_ENTRIES]
+        state.last_nack = time.time()
+        self._send_ack(key, state.contiguous)
+        if not missing:
+            return
+        try:
+            header = NACK_HEADER.pack(protocol.MAGIC, protocol.WIRE_VERSION, MSG_NACK, msg_id)
+            self.socket.sendto(header + struct.pack(f'<{len(missing)}I', *missing), addr)
+        except OSError:
+            pass
+
+
+class DatagramReader:
+    """Drains every queued datagram per wakeup into preallocated buffers.
+
+    read() blocks like recvfrom (honouring the socket timeout) for the first
+    datagram, then takes whatever else is already queued without blocking.
+    The returned memoryviews point into the reader's buffers and are only
+    valid until the next read()/drain() call."""
+
+    def __init__(self, sock: socket.socket, slots: int = 64, size: int = 65536):
+        self.socket = sock
+        self.buffers = [bytearray(size) for _ in range(slots)]
+        self.views = [memoryview(buffer) for buffer in self.buffers]
+        self.reads = 0  # recvfrom_into calls that returned a datagram
+        self.wakeups = 0
+
+    def read(self) -> List[Tuple[memoryview, Tuple[str, int]]]:
+        nbytes, addr = self.socket.recvfrom_into(self.buffers[0])
+        self.wakeups += 1
+        self.reads += 1
+        return [(self.views[0][:nbytes], addr)] + self.drain(1)
+
+    def drain(self, start: int = 0) -> List[Tuple[memoryview, Tuple[str, int]]]:
+        """Non-blocking reads into buffers[start:] until the socket queue is empty"""
+        batch = []
+        timeout = self.socket.gettimeout()
+        self.socket.settimeout(0.0)
+        try:
+            for slot in range(start, len(self.buffers)):
+                try:
+                    nbytes, addr = self.socket.recvfrom_into(self.buffers[slot])
+                except (BlockingIOError, InterruptedError):
+                    break
+                except OSError as e:
+                    if e.errno == errno.ECONNREFUSED:
+                        continue  # ICMP from a peer that went away; keep draining
+                    raise
+                batch.append((self.views[slot][:nbytes], addr))
+        finally:
+            self.socket.settimeout(timeout)
+        self.reads += len(batch)
+        return batch
@@ -1,8 +1,50 @@
 import socket
 import threading
+import queue
 import customtkinter as ctk
 from tkinter import messagebox
 
+MAX_LOG_LINES = 1000  # Older lines are dropped from the message and log areas
+UI_INTERVAL = 50  # Milliseconds between UI frames
+
+class UIPump:
+    """Collects UI updates from any thread and renders them once per frame on the Tk thread"""
+    def __init__(self, root, on_error, interval=UI_INTERVAL):
+        self.root = root
+        self.on_error = on_error
+        self.interval = interval
+        self.queue = queue.SimpleQueue()
+        self.renderers = {}
+        self.failing = set()  # Kinds whose last render failed
+
+    def register(self, kind, renderer):
+        self.renderers[kind] = renderer
+
+    def post(self, kind, item=None):
+        self.queue.put((kind, item))
+
+    def start(self):
+        self.root.after(self.interval, self._tick)
+
+    def _tick(self):
+        batches = {}
+        while True:
+            try:
+                kind, item = self.queue.get_nowait()
+            except queue.Empty:
+                break
+            batches.setdefault(kind, []).append(item)
+        for kind, items in batches.items():
+            try:
+                self.renderers[kind](items)
+            except Exception as e:
+                if kind not in self.failing:  # A broken log renderer must not report into itself every frame
+                    self.failing.add(kind)
+                    self.on_error(f"UI update {kind} failed: {e}")
+            else:
+                self.failing.discard(kind)
+        self.root.after(self.interval, self._tick)
+
 class ServerGUI:
     def __init__(self, root):
         self.root = root
@@ -84,6 +126,13 @@ class ServerGUI:
         self.running = False
         self.lock = threading.Lock()
 
+        # Updates from server threads are rendered in batches on the Tk thread
+        self.ui = UIPump(root, on_error=lambda message: self.log(message, "logs"))
+        self.ui.register("messages", lambda lines: self.append_lines(self.messages_area, lines))
+        self.ui.register("logs", lambda lines: self.append_lines(self.logs_area, lines))
+        self.ui.register("clients", lambda _: self._update_client_dropdown())
+        self.ui.start()
+
     def get_local_ip(self):
         try:
             s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
@@ -101,17 +150,23 @@ class ServerGUI:
 
     def log(self, message, area="both"):
         if area in ["messages", "both"]:
-            self.messages_area.configure(state="normal")
-            self.messages_area.insert("end", message + "\n")
-            self.messages_area.see("end")
-            self.messages_area.configure(state="disabled")
+            self.ui.post("messages", message)
         if area in ["logs", "both"]:
-            self.logs_area.configure(state="normal")
-            self.logs_area.insert("end", message + "\n")
-            self.logs_area.see("end")
-            self.logs_area.configure(state="disabled")
+            self.ui.post("logs", message)
+
+    def append_lines(self, area, lines):
+        area.configure(state="normal")
+        area.insert("end", "\n".join(lines[-MAX_LOG_LINES:]) + "\n")
+        excess = int(area.index("end-1c").split(".")[0]) - 1 - MAX_LOG_LINES
+        if excess > 0:
+            area.delete("1.0", f"{excess + 1}.0")
+        area.see("end")
+        area.configure(state="disabled")
 
     def update_client_dropdown(self):
+        self.ui.post("clients")
+
+    def _update_client_dropdown(self):
         with self.lock:
             client_ids = [f"{cid} ({info['type']} - {info['address']})" for cid, info in self.clients.items() if info["active"]]
             if not client_ids:
@@ -7,6 +7,7 @@ import logging
 import sys
 import os
 import json
+import queue
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -15,11 +16,51 @@ logger = logging.getLogger(__name__)
 # Server configuration
 PORT = 12345
 FILE_DIR = 'server_files'
+MAX_LOG_LINES = 1000  # Older log lines are dropped from the message log
+UI_INTERVAL = 50  # Milliseconds between UI frames
 
 # Thread-safe client storage
 clients = {}
 clients_lock = threading.Lock()
 
+class UIPump:
+    """Collects UI updates from any thread and renders them once per frame on the Tk thread"""
+    def __init__(self, root, on_error, interval=UI_INTERVAL):
+        self.root = root
+        self.on_error = on_error
+        self.interval = interval
+        self.queue = queue.SimpleQueue()
+        self.renderers = {}
+        self.failing = set()  # Kinds whose last render failed
+
+    def register(self, kind, renderer):
+        self.renderers[kind] = renderer
+
+    def post(self, kind, item=None):
+        self.queue.put((kind, item))
+
+    def start(self):
+        self.root.after(self.interval, self._tick)
+
+    def _tick(self):
+        batches = {}
+        while True:
+            try:
+                kind, item = self.queue.get_nowait()
+            except queue.Empty:
+                break
+            batches.setdefault(kind, []).append(item)
+        for kind, items in batches.items():
+            try:
+                self.renderers[kind](items)
+            except Exception as e:
+                if kind not in self.failing:  # A broken log renderer must not report into itself every frame
+                    self.failing.add(kind)
+                    self.on_error(f"UI update {kind} failed: {e}")
+            else:
+                self.failing.discard(kind)
+        self.root.after(self.interval, self._tick)
+
 class ServerGUI:
     def __init__(self, root):
         self.root = root
@@ -63,6 +104,12 @@ class ServerGUI:
         self.message_log = scrolledtext.ScrolledText(root, height=15, state='disabled')
         self.message_log.pack(pady=10, padx=10, fill=tk.BOTH, expand=True)
 
+        # Updates from client threads are rendered in batches on the Tk thread
+        self.ui = UIPump(root, on_error=self.log_message)
+        self.ui.register("log", self._log_messages)
+        self.ui.register("clients", lambda _: self._update_client_list())
+        self.ui.start()
+
         # Initialize server state
         self.server_socket = None
         self.running = False
@@ -85,17 +132,24 @@ class ServerGUI:
         self._log_message("Server IP copied to clipboard!")
 
     def log_message(self, message):
-        self.root.after(0, lambda: self._log_message(message))
+        self.ui.post("log", message)
 
     def _log_message(self, message):
+        self._log_messages([message])
+
+    def _log_messages(self, messages):
+        for message in messages:
+            logger.info(message)
         self.message_log.configure(state='normal')
-        self.message_log.insert(tk.END, message + '\n')
+        self.message_log.insert(tk.END, '\n'.join(messages[-MAX_LOG_LINES:]) + '\n')
+        excess = int(self.message_log.index('end-1c').split('.')[0]) - 1 - MAX_LOG_LINES
+        if excess > 0:
+            self.message_log.delete('1.0', f'{excess + 1}.0')
         self.message_log.configure(state='disabled')
         self.message_log.yview(tk.END)
-        logger.info(message)
 
     def update_client_list(self):
-        self.root.after(0, self._update_client_list)
+        self.ui.post("clients")
 
     def _update_client_list(self):
         self.client_list.delete(0, tk.END)